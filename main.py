@@ -1,12 +1,15 @@
 # main.py  — horoskop.one API v6.0 deep-reading (single-file)
-import os, re, json, datetime as dt
-from typing import Optional, Dict, Any, List
+import os, re, json, time, mmap, heapq, random, socket, struct, sqlite3, asyncio, hashlib, functools, threading, unicodedata, datetime as dt
+from urllib.parse import urlparse
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List, Callable, Awaitable, Tuple
 
 import httpx
 from fastapi import FastAPI, Body, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 from timezonefinder import TimezoneFinder
@@ -22,8 +25,20 @@ try:
 except ImportError:
     _HAS_SLOWAPI = False
 
-from openai import OpenAI
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+import openai as _openai_sdk
+from openai import AsyncOpenAI
+
+def _ratelimit_http(sdk: Any, provider: str, index: int) -> httpx.AsyncClient:
+    """httpx-Client für ein SDK, der die Rate-Limit-Header jeder Antwort
+    (auch der 429er, die das SDK selbst wiederholt) an den Key-Pool meldet."""
+    async def observe(response: httpx.Response) -> None:
+        lanes = _llm_pool(provider).lanes
+        if index < len(lanes):
+            lanes[index].observe(response.status_code, response.headers)
+    return sdk.DefaultAsyncHttpxClient(event_hooks={"response": [observe]})
+
+client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"),
+                     http_client=_ratelimit_http(_openai_sdk, "openai", 0))
 MODEL = os.getenv("OPENAI_MODEL", "gpt-5-mini")
 
 # --- LLM-Provider-Abstraktion ----------------------------------------------
@@ -35,7 +50,8 @@ LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai").strip().lower()
 ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-sonnet-5")
 try:
     import anthropic as _anthropic_sdk
-    _anthropic_client = _anthropic_sdk.Anthropic() if os.getenv("ANTHROPIC_API_KEY") else None
+    _anthropic_client = (_anthropic_sdk.AsyncAnthropic(http_client=_ratelimit_http(_anthropic_sdk, "anthropic", 0))
+                         if os.getenv("ANTHROPIC_API_KEY") else None)
 except ImportError:
     _anthropic_sdk = None
     _anthropic_client = None
@@ -47,6 +63,26 @@ def _llm_id(provider: Optional[str] = None) -> str:
     p = (provider or LLM_PROVIDER)
     return f"anthropic:{ANTHROPIC_MODEL}" if p == "anthropic" else f"openai:{MODEL}"
 
+# Beide Clients sind async: ein Completion-Call dauert Sekunden, und ein
+# synchroner Client hält in der Zeit den ganzen uvicorn-Event-Loop an
+# (/health, /board/today, statische Dateien). Damit ein Worker trotzdem nicht
+# beliebig viele Calls gleichzeitig aufmacht, hat jeder API-Key einen Deckel
+# (LLM_MAX_CONCURRENCY, je Provider per LLM_MAX_CONCURRENCY_OPENAI /
+# _ANTHROPIC übersteuerbar); darunter regelt der Key-Pool (siehe _KeyPool)
+# die tatsächliche Parallelität anhand der Rate-Limit-Header nach.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+
+def _loop_local(registry: Dict[str, tuple], key: str, factory: Callable[[], Any]) -> Any:
+    """Ein Objekt pro (Schlüssel, Event-Loop). asyncio-Primitive und
+    httpx-Clients sind an ihren Loop gebunden; in Produktion gibt es genau
+    einen, Tests und TestClient starten aber jeweils neue."""
+    loop = asyncio.get_running_loop()
+    entry = registry.get(key)
+    if entry is None or entry[0] is not loop:
+        entry = (loop, factory())
+        registry[key] = entry
+    return entry[1]
+
 app = FastAPI(title="horoskop.one API", version="v6.0-deep-reading")
 
 # CORS: Default ist eine restriktive Allowlist der bekannten horoskop.one-Domains.
@@ -410,6 +446,560 @@ def celtic_tree(d:dt.date)->str:
         if (s<=e and s<=d<=e) or (s>e and (d>=s or d<=e)): return name
     return "Birke"
 
+# ---------------------------------------------------------------------------
+# Infrastruktur: Caches, Single-Flight, Drosselung
+# Kleine Bausteine, die Geocoding, Reading-Cache und LLM-Schicht teilen.
+# ---------------------------------------------------------------------------
+
+_MISS = object()  # Sentinel: "nicht im Cache" (None ist ein gültiger Wert)
+
+# Zähler je Gruppe und Schlüssel, z. B. _METRICS["llmCache"]["board_move"]
+# ["hits"]; GET /metrics liefert sie als JSON. Pro Worker, seit Prozessstart.
+_METRICS: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+def _count(group: str, key: str, name: str, n: int = 1) -> None:
+    bucket = _METRICS.setdefault(group, {}).setdefault(key, {})
+    bucket[name] = bucket.get(name, 0) + n
+
+class _LRUCache:
+    """In-Process-LRU mit Ablaufzeit pro Eintrag und optionalem Byte-Budget.
+    OrderedDict hält die Zugriffsreihenfolge, damit Lesen und Verdrängen
+    O(1) bleiben; die Größe eines Eintrags gibt der Aufrufer mit."""
+
+    def __init__(self, max_entries: int, ttl: float, max_bytes: int = 0):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(0, max_bytes)  # 0 = nur nach Anzahl begrenzen
+        self.ttl = ttl
+        self.bytes = 0
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires, value, _size = entry
+        if expires < time.time():
+            self.pop(key)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None, size: int = 0) -> None:
+        self.pop(key)
+        self._data[key] = (time.time() + (self.ttl if ttl is None else ttl), value, size)
+        self.bytes += size
+        while len(self._data) > self.max_entries or (
+                self.max_bytes and self.bytes > self.max_bytes and len(self._data) > 1):
+            _key, (_exp, _value, old_size) = self._data.popitem(last=False)
+            self.bytes -= old_size
+
+    def pop(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+_SQLITE_SWEEP_EVERY = 256  # Schreibzugriffe je Worker zwischen zwei Aufräumläufen
+
+class _SqliteKV:
+    """Schlüssel/Wert-Tabelle mit Ablaufzeit in einer SQLite-Datei (WAL).
+
+    Mehrere uvicorn-Worker und Neustarts teilen sich so denselben Bestand.
+    Die Verbindung entsteht erst beim ersten Zugriff; SQLite-Fehler werden
+    geloggt und wie ein Cache-Miss behandelt — ein Cache darf nie eine
+    Anfrage scheitern lassen.
+
+    Beim Öffnen und danach alle _SQLITE_SWEEP_EVERY Schreibzugriffe löscht
+    sweep() abgelaufene Zeilen und kürzt die Tabelle auf `max_rows` Zeilen
+    bzw. `max_bytes` Bytes an Werten (0 = keine Grenze); zuerst gehen die
+    Einträge, die am frühesten ablaufen.
+
+    Aus Request-Pfaden nur über aget()/aput(): die laufen in einem Thread,
+    damit eine gesperrte Datei (busy timeout 5 s) nicht den Event-Loop
+    anhält. Die eine Verbindung schützt ein Lock.
+    """
+
+    def __init__(self, path: str, table: str, max_rows: int = 0, max_bytes: int = 0):
+        self.path, self.table = path, table
+        self.max_rows, self.max_bytes = max(0, max_rows), max(0, max_bytes)
+        self._puts = 0
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} "
+                         "(k TEXT PRIMARY KEY, v BLOB NOT NULL, exp REAL NOT NULL, "
+                         "size INTEGER NOT NULL DEFAULT 0)")
+            if "size" not in {row[1] for row in conn.execute(f"PRAGMA table_info({self.table})")}:
+                # Datei aus der Zeit ohne Größenspalte: alte Zeilen zählen 0 Bytes, bis sie ablaufen
+                conn.execute(f"ALTER TABLE {self.table} ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_exp ON {self.table} (exp)")
+            self._conn = conn
+            self.sweep()
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with self._lock:
+                row = self._db().execute(
+                    f"SELECT v, exp FROM {self.table} WHERE k = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if row[1] < time.time():
+                    self._db().execute(f"DELETE FROM {self.table} WHERE k = ?", (key,))
+                    return None
+                return row[0]
+        except sqlite3.Error as e:
+            print(f"sqlite cache {self.table} read failed: {e}")
+            return None
+
+    def put(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            try:
+                self._db().execute(
+                    f"INSERT OR REPLACE INTO {self.table} (k, v, exp, size) VALUES (?, ?, ?, ?)",
+                    (key, value, time.time() + ttl, len(value.encode("utf-8"))))
+            except sqlite3.Error as e:
+                print(f"sqlite cache {self.table} write failed: {e}")
+                return
+            self._puts += 1
+            if self._puts % _SQLITE_SWEEP_EVERY == 0:
+                self.sweep()
+
+    async def aget(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, value: str, ttl: float) -> None:
+        await asyncio.to_thread(self.put, key, value, ttl)
+
+    def sweep(self) -> int:
+        """Abgelaufenes löschen und auf max_rows/max_bytes kürzen → gelöschte Zeilen."""
+        t = self.table
+        with self._lock:
+            try:
+                db = self._db()
+                n = db.execute(f"DELETE FROM {t} WHERE exp < ?", (time.time(),)).rowcount
+                if self.max_rows:
+                    n += db.execute(f"DELETE FROM {t} WHERE k IN (SELECT k FROM {t} "
+                                    "ORDER BY exp DESC LIMIT -1 OFFSET ?)", (self.max_rows,)).rowcount
+                if self.max_bytes:
+                    # laufende Summe von der spätesten Ablaufzeit her; was darüber liegt, fliegt
+                    n += db.execute(f"DELETE FROM {t} WHERE k IN (SELECT k FROM (SELECT k, SUM(size) "
+                                    f"OVER (ORDER BY exp DESC, k) AS total FROM {t}) WHERE total > ?)",
+                                    (self.max_bytes,)).rowcount
+            except sqlite3.Error as e:
+                print(f"sqlite cache {t} sweep failed: {e}")
+                return 0
+        if n:
+            _count("sqliteCache", t, "evicted", n)
+        return n
+
+    def clear(self) -> None:
+        try:
+            with self._lock:
+                self._db().execute(f"DELETE FROM {self.table}")
+        except sqlite3.Error as e:
+            print(f"sqlite cache {self.table} clear failed: {e}")
+
+# --- Leader-Wahl für Hintergrund-Jobs ---------------------------------------
+# Mit `uvicorn --workers N` läuft jeder Startup-Hook N-mal. Geplante Jobs
+# (Morgen-Push) dürfen aber nur einmal laufen: wer die Lease in der
+# gemeinsamen SQLite-Datei hält, führt sie aus und verlängert sie alle
+# TTL/3 Sekunden. Stirbt der Prozess, läuft die Lease ab und ein anderer
+# Worker übernimmt spätestens nach TTL + TTL/3.
+SCHEDULER_LEASE_PATH = os.getenv("SCHEDULER_LEASE_PATH", "scheduler.sqlite3")
+SCHEDULER_LEASE_TTL = float(os.getenv("SCHEDULER_LEASE_TTL", "30"))
+
+class _Lease:
+    """Zeitlich begrenzte Führerschaft `name`, gehalten von `owner`."""
+
+    def __init__(self, path: str, name: str, ttl: float, owner: Optional[str] = None):
+        self.path, self.name, self.ttl = path, name, ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{random.getrandbits(32):08x}"
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases "
+                         "(name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def acquire(self) -> bool:
+        """Holt oder verlängert die Lease; False, solange ein anderer sie
+        gültig hält. Ein einziges UPSERT — atomar über alle Prozesse."""
+        now = time.time()
+        try:
+            cur = self._db().execute(
+                "INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.owner = excluded.owner OR leases.expires < ?",
+                (self.name, self.owner, now + self.ttl, now))
+            return cur.rowcount == 1
+        except sqlite3.Error as e:
+            # Im Zweifel abgeben: lieber kurz niemand als zwei gleichzeitig.
+            print(f"lease {self.name} failed: {e}")
+            return False
+
+    def release(self) -> None:
+        try:
+            self._db().execute("DELETE FROM leases WHERE name = ? AND owner = ?",
+                               (self.name, self.owner))
+        except sqlite3.Error as e:
+            print(f"lease {self.name} release failed: {e}")
+
+async def _run_as_leader(lease: _Lease, job: Callable[[], Awaitable[Any]]) -> None:
+    """Führt `job` aus, solange dieser Prozess die Lease hält; verliert er
+    sie (Heartbeat gescheitert, Uhr/Platte hing), wird der Job abgebrochen."""
+    task: Optional[asyncio.Task] = None
+    try:
+        while True:
+            if lease.acquire():
+                if task is None or task.done():
+                    print(f"leader for {lease.name}: {lease.owner}")
+                    task = asyncio.create_task(job())
+            elif task is not None:
+                print(f"lost lease {lease.name}, stopping job")
+                task.cancel()
+                task = None
+            await asyncio.sleep(lease.ttl / 3)
+    finally:
+        if task is not None:
+            task.cancel()
+        lease.release()
+
+def _single_flight(registry: Dict[str, "asyncio.Future"], key: str,
+                   factory: Callable[[], Awaitable[Any]]) -> Tuple[Awaitable[Any], bool]:
+    """Gleichzeitige Anfragen mit demselben Schlüssel teilen sich eine Arbeit.
+
+    Liefert (awaitable, joined): `joined` ist True, wenn bereits jemand
+    rechnet. Die Arbeit läuft als eigener Task; bricht ein Wartender ab
+    (Client weg), rechnet sie für die übrigen trotzdem zu Ende.
+    """
+    task = registry.get(key)
+    joined = task is not None and not task.done()
+    if not joined:
+        task = asyncio.ensure_future(factory())
+        registry[key] = task
+
+        def _forget(t, key=key):
+            if registry.get(key) is t:
+                registry.pop(key, None)
+        task.add_done_callback(_forget)
+    return asyncio.shield(task), joined
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-Rank-Perzentil einer sortierten Liste (0.0 bei leerer Liste)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[min(len(sorted_values), int(rank)) - 1]
+
+class _TokenBucket:
+    """Drossel auf `rate` Anfragen/Sekunde (Burst `burst`). Wartende
+    reservieren ihren Slot sofort, damit die Reihenfolge fair bleibt."""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate, self.burst = max(rate, 1e-6), max(burst, 1.0)
+        self._tokens, self._stamp = self.burst, time.monotonic()
+        self._reserved = 0  # Anzahl Reservierungen bisher, für die Rückgabe
+
+    def reserve(self) -> float:
+        """Nimmt ein Token und gibt die nötige Wartezeit in Sekunden zurück."""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        self._tokens -= 1
+        self._reserved += 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            mine = self._reserved
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # Noch nicht gesendet → Token zurückgeben, aber nur, wenn nach
+                # uns niemand reserviert hat: Sonst bekäme der Nächste einen
+                # Slot, den ein anderer Wartender schon hält.
+                if self._reserved == mine:
+                    self._tokens = min(self.burst, self._tokens + 1)
+                raise
+
+# Ein geteilter, gepoolter HTTP-Client für die ganze App-Laufzeit — spart je
+# Anfrage den TLS-Handshake zu Nominatim. Beim Shutdown wird er geschlossen.
+_HTTP_CLIENTS: Dict[str, tuple] = {}
+
+def _http_client() -> httpx.AsyncClient:
+    return _loop_local(_HTTP_CLIENTS, "default", lambda: httpx.AsyncClient(
+        timeout=10, limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)))
+
+@app.on_event("shutdown")
+async def _close_http_clients():
+    loop = asyncio.get_running_loop()
+    for key, (owner, cli) in list(_HTTP_CLIENTS.items()):
+        if owner is loop:
+            await cli.aclose()
+        _HTTP_CLIENTS.pop(key, None)
+
+# --- Geocoding (Nominatim) --------------------------------------------------
+# Nominatim erlaubt höchstens 1 Anfrage/Sekunde; daher drei Schichten davor:
+# LRU im Prozess, SQLite auf der Platte (überlebt Neustarts, geteilt von allen
+# Workern) und eine Drossel, hinter der gleichzeitige Anfragen für denselben
+# Ort zu einem Request zusammengelegt werden. Orte ändern ihre Koordinaten
+# nicht — die TTL ist entsprechend lang; Fehlschläge merken wir uns kürzer.
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+NOMINATIM_RATE = float(os.getenv("NOMINATIM_RATE", "1"))  # Anfragen/Sekunde
+NOMINATIM_BURST = float(os.getenv("NOMINATIM_BURST", "1"))
+# Parallel-Modus: DACH- und Welt-Pass starten gleichzeitig, DACH gewinnt,
+# sobald es etwas liefert, der Verlierer wird abgebrochen. Halbiert die
+# Latenz für Orte außerhalb von DE/AT/CH — aber nur, wenn die Drossel zwei
+# Anfragen direkt nacheinander zulässt (NOMINATIM_BURST=2); sonst wartet der
+# Welt-Pass ohnehin auf sein Token und wird meist vor dem Senden verworfen.
+GEOCODE_PARALLEL = os.getenv("GEOCODE_PARALLEL", "0").strip().lower() in ("1", "true", "yes")
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "geocode_cache.sqlite3")  # "" = nur RAM
+GEOCODE_CACHE_TTL = int(os.getenv("GEOCODE_CACHE_TTL", str(180 * 86400)))
+GEOCODE_CACHE_MAX_ROWS = int(os.getenv("GEOCODE_CACHE_MAX_ROWS", "200000"))  # auch Tippfehler/Fehlschläge
+GEOCODE_NEGATIVE_TTL = int(os.getenv("GEOCODE_NEGATIVE_TTL", "86400"))
+_NOMINATIM_HEADERS = {
+    "User-Agent": "horoskop.one/1.0 (contact: kontakt@horoskop.one)",
+    "Accept-Language": "de,en",
+}
+_GEOCODE_LRU = _LRUCache(int(os.getenv("GEOCODE_LRU_MAX", "4096")), GEOCODE_CACHE_TTL)
+_GEOCODE_DISK: Optional[_SqliteKV] = (
+    _SqliteKV(GEOCODE_CACHE_PATH, "geocode", max_rows=GEOCODE_CACHE_MAX_ROWS) if GEOCODE_CACHE_PATH else None)
+_GEOCODE_INFLIGHT: Dict[str, "asyncio.Future"] = {}
+_NOMINATIM_BUCKET = _TokenBucket(NOMINATIM_RATE, NOMINATIM_BURST)
+
+def _place_key(place: str) -> str:
+    """Normalisierter Cache-Schlüssel: Groß/klein, Mehrfach-Leerzeichen und
+    Leerraum um Kommas spielen keine Rolle ("berlin ,  DE" == "Berlin, de")."""
+    s = " ".join((place or "").casefold().split())
+    return re.sub(r"\s*,\s*", ", ", s).strip(" ,")
+
+# --- Offline-Ortsindex (Gazetteer) -----------------------------------------
+# Die meisten Geburtsorte sind ein paar tausend DACH-Orte. Ein aus GeoNames
+# gebauter Index (scripts/build_gazetteer.py) beantwortet sie per mmap und
+# Binärsuche in Mikrosekunden; Nominatim fragen wir nur noch bei Lücken.
+# Fehlt die Datei, ist der Index einfach leer.
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", os.path.join(os.path.dirname(__file__), "data", "gazetteer.bin"))
+_GAZ_HEADER = struct.Struct("<4sIII")     # Format: siehe scripts/build_gazetteer.py
+_GAZ_ENTRY = struct.Struct("<IHHIiiI2s")
+_GAZ_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+_GAZ_DACH_SUFFIXES = {
+    "de": "DE", "deutschland": "DE", "germany": "DE", "brd": "DE",
+    "at": "AT", "oesterreich": "AT", "austria": "AT",
+    "ch": "CH", "schweiz": "CH", "switzerland": "CH", "suisse": "CH", "svizzera": "CH",
+}
+
+def _gazetteer_norm(name: str) -> str:
+    """Umlaute ausschreiben, Akzente weg, Satzzeichen/Bindestriche zu
+    Leerzeichen (identisch zu `norm` im Build-Skript)."""
+    s = (name or "").casefold().translate(_GAZ_UMLAUTS)
+    s = "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", s).split())
+
+class _Gazetteer:
+    """Lesender Zugriff auf den mmap-Index; öffnet die Datei beim ersten Lookup."""
+
+    PREFIX_SCAN = 256  # so viele Präfix-Kandidaten prüfen wir höchstens
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mm: Optional[mmap.mmap] = None
+        self._n = self._blob = 0
+        self._tried = False
+
+    def _ready(self) -> bool:
+        if not self._tried:
+            self._tried = True
+            try:
+                with open(self.path, "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, n, blob, _ = _GAZ_HEADER.unpack_from(mm, 0)
+                if magic != b"HGZ1":
+                    raise ValueError(f"unbekanntes Format {magic!r}")
+                self._mm, self._n, self._blob = mm, n, blob
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, struct.error) as e:
+                print(f"gazetteer {self.path} unusable: {e}")
+        return self._mm is not None
+
+    def __len__(self) -> int:
+        return self._n if self._ready() else 0
+
+    def _entry(self, i: int) -> tuple:
+        return _GAZ_ENTRY.unpack_from(self._mm, _GAZ_HEADER.size + i * _GAZ_ENTRY.size)
+
+    def _key(self, i: int) -> bytes:
+        off, klen = self._entry(i)[:2]
+        return self._mm[self._blob + off:self._blob + off + klen]
+
+    def _lower_bound(self, key: bytes) -> int:
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _record(self, i: int) -> Dict[str, Any]:
+        _off, _klen, dlen, doff, lat, lon, _pop, cc = self._entry(i)
+        display = self._mm[self._blob + doff:self._blob + doff + dlen].decode("utf-8")
+        return {"lat": lat / 1e5, "lon": lon / 1e5, "display": display,
+                "countryCode": cc.decode("ascii").strip() or None}
+
+    def exact(self, key: str) -> Optional[Dict[str, Any]]:
+        kb = key.encode("utf-8")
+        i = self._lower_bound(kb)
+        return self._record(i) if i < self._n and self._key(i) == kb else None
+
+    def prefix(self, key: str) -> Optional[Dict[str, Any]]:
+        """Bester Ort, dessen Name mit `key` als ganzem Wort beginnt
+        („Frankfurt“ → „Frankfurt am Main“): DACH vor Welt, dann Einwohner."""
+        kb = (key + " ").encode("utf-8")
+        i = self._lower_bound(kb)
+        best, best_rank = None, None
+        for j in range(i, min(i + self.PREFIX_SCAN, self._n)):
+            if not self._key(j).startswith(kb):
+                break
+            entry = self._entry(j)
+            rank = (entry[7] in (b"DE", b"AT", b"CH"), entry[6])
+            if best_rank is None or rank > best_rank:
+                best, best_rank = j, rank
+        return self._record(best) if best is not None else None
+
+    def lookup(self, place: str) -> Optional[Dict[str, Any]]:
+        """Ort auflösen: ganzer String, dann ohne Länderzusatz, dann
+        Stadtteil bzw. Stadt eines „Stuttgart-Weilimdorf“, dann „Bad …“,
+        zuletzt Präfix. Ein Länderzusatz außerhalb DACH geht an Nominatim."""
+        if not place or not self._ready():
+            return None
+        head, _, tail = place.partition(",")
+        full, name = _gazetteer_norm(place), _gazetteer_norm(head)
+        if not name:
+            return None
+        hit = self.exact(full)
+        if hit:
+            return hit
+        want_cc = None
+        if tail.strip():
+            want_cc = _GAZ_DACH_SUFFIXES.get(_gazetteer_norm(tail.split(",")[-1]))
+            if want_cc is None:
+                return None
+        candidates = [name]
+        parts = [p for p in re.split(r"\s*-\s*", head.strip()) if p]
+        if len(parts) > 1:
+            candidates += [_gazetteer_norm(parts[-1]), _gazetteer_norm(parts[0])]
+        if not name.startswith("bad "):
+            candidates.append("bad " + name)
+        for key in candidates:
+            hit = self.exact(key)
+            if hit and want_cc in (None, hit["countryCode"]):
+                return hit
+        hit = self.prefix(name)
+        return hit if hit and want_cc in (None, hit["countryCode"]) else None
+
+_GAZETTEER = _Gazetteer(GAZETTEER_PATH)
+
+@app.on_event("startup")
+async def _open_gazetteer():
+    # Nur mappen — die Seiten lädt das OS erst, wenn eine Suche sie berührt.
+    n = len(_GAZETTEER)
+    if n:
+        print(f"gazetteer: {n} Ortsnamen aus {GAZETTEER_PATH}")
+
+def _nominatim_pick(data: List[Dict[str, Any]], place: str) -> Optional[Dict[str, Any]]:
+    if not data:
+        return None
+    # Prefer administrative / populated-place hits over e.g. shops, bus stops.
+    preferred_classes = {"place", "boundary"}
+    ordered = sorted(
+        data,
+        key=lambda d: (0 if d.get("class") in preferred_classes else 1,
+                       -float(d.get("importance") or 0)),
+    )
+    hit = ordered[0]
+    addr = hit.get("address") or {}
+    return {
+        "lat": float(hit["lat"]),
+        "lon": float(hit["lon"]),
+        "display": hit.get("display_name") or place,
+        "countryCode": (addr.get("country_code") or "").upper() or None,
+    }
+
+async def _nominatim_search(place: str, countrycodes: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Ein gedrosselter Nominatim-Request über den geteilten Client.
+    Wirft httpx.HTTPError bei Transport- oder Statusfehlern."""
+    params = {"format": "jsonv2", "limit": "5", "addressdetails": "1", "q": place}
+    if countrycodes:
+        params["countrycodes"] = countrycodes
+    await _NOMINATIM_BUCKET.acquire()
+    r = await _http_client().get(NOMINATIM_URL, params=params, headers=_NOMINATIM_HEADERS)
+    r.raise_for_status()
+    return _nominatim_pick(r.json() or [], place)
+
+async def _geocode_remember(key: str, hit: Optional[Dict[str, Any]]) -> None:
+    ttl = GEOCODE_CACHE_TTL if hit else GEOCODE_NEGATIVE_TTL
+    _GEOCODE_LRU.put(key, hit, ttl)
+    if _GEOCODE_DISK is not None:
+        await _GEOCODE_DISK.aput(key, json.dumps(hit, ensure_ascii=False), ttl)
+
+async def _dach_pass(search: Awaitable[Optional[Dict[str, Any]]]) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """DACH-Pass abwarten. Ein Statusfehler (5xx, 429) fällt wie früher auf
+    den Welt-Pass durch; das zweite Feld sagt, ob der Pass geantwortet hat."""
+    try:
+        return await search, True
+    except httpx.HTTPStatusError as e:
+        print(f"nominatim DACH pass failed: {e.response.status_code}")
+        return None, False
+
+async def _nominatim_dach_first(place: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """Pass 1: DACH only, Pass 2: worldwide fallback — nacheinander oder, im
+    Parallel-Modus, gleichzeitig mit Abbruch des Welt-Passes bei DACH-Treffer.
+    Liefert (Treffer, cachebar): Fiel der DACH-Pass aus, könnte der Welt-
+    Treffer ein Namensvetter sein — dann gilt er nur für diese Anfrage."""
+    if not GEOCODE_PARALLEL:
+        hit, complete = await _dach_pass(_nominatim_search(place, "de,at,ch"))
+        return (hit, complete) if hit is not None else (await _nominatim_search(place), complete)
+    dach = asyncio.ensure_future(_nominatim_search(place, "de,at,ch"))
+    world = asyncio.ensure_future(_nominatim_search(place))
+    try:
+        hit, complete = await _dach_pass(dach)
+        return (hit, complete) if hit is not None else (await world, complete)
+    finally:
+        for t in (dach, world):
+            if not t.done():
+                t.cancel()
+            # Ergebnis/Fehler des Verlierers als abgeholt markieren.
+            t.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+async def _geocode_fetch(place: str, key: str) -> Optional[Dict[str, Any]]:
+    try:
+        hit, complete = await _nominatim_dach_first(place)
+    except (httpx.HTTPError, ValueError, KeyError, TypeError):
+        return None  # Netz-/Dienstfehler nicht cachen — nächstes Mal neu versuchen
+    if complete:
+        await _geocode_remember(key, hit)
+    return hit
+
 async def geocode(place: str) -> Optional[Dict[str, Any]]:
     """Resolve a free-text birthplace to coordinates via Nominatim.
 
@@ -418,66 +1008,34 @@ async def geocode(place: str) -> Optional[Dict[str, Any]]:
          town names (Neustadt, Stuttgart-Weilimdorf, Bad Saulgau, …) don't
          collide with homonyms in the US or elsewhere.
       2. If that yields nothing, retry worldwide so international users and
-         less common place names still work.
+         less common place names still work. With GEOCODE_PARALLEL both
+         passes run concurrently and the DACH hit still wins.
+
+    The offline gazetteer index answers first; Nominatim results (including
+    misses) are cached in-process and on disk, and concurrent lookups for
+    the same place share one request.
 
     Returns a dict with lat, lon, display (canonical label) and
     countryCode, or None if the place couldn't be resolved.
     """
-    if not place:
-        return None
-    headers = {
-        "User-Agent": "horoskop.one/1.0 (contact: kontakt@horoskop.one)",
-        "Accept-Language": "de,en",
-    }
-    base_params = {
-        "format": "jsonv2",
-        "limit": "5",
-        "addressdetails": "1",
-        "q": place.strip(),
-    }
-
-    def _pick(data: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-        if not data:
-            return None
-        # Prefer administrative / populated-place hits over e.g. shops, bus stops.
-        preferred_classes = {"place", "boundary"}
-        ordered = sorted(
-            data,
-            key=lambda d: (0 if d.get("class") in preferred_classes else 1,
-                           -float(d.get("importance") or 0)),
-        )
-        hit = ordered[0]
-        addr = hit.get("address") or {}
-        return {
-            "lat": float(hit["lat"]),
-            "lon": float(hit["lon"]),
-            "display": hit.get("display_name") or place,
-            "countryCode": (addr.get("country_code") or "").upper() or None,
-        }
-
-    try:
-        async with httpx.AsyncClient(timeout=10) as cli:
-            # Pass 1: DACH only
-            r = await cli.get(
-                "https://nominatim.openstreetmap.org/search",
-                params={**base_params, "countrycodes": "de,at,ch"},
-                headers=headers,
-            )
-            if r.status_code == 200:
-                hit = _pick(r.json() or [])
-                if hit:
-                    return hit
-            # Pass 2: worldwide fallback
-            r = await cli.get(
-                "https://nominatim.openstreetmap.org/search",
-                params=base_params,
-                headers=headers,
-            )
-            if r.status_code != 200:
-                return None
-            return _pick(r.json() or [])
-    except (httpx.HTTPError, ValueError, KeyError, TypeError):
+    key = _place_key(place)
+    if not key:
         return None
+    hit = _GAZETTEER.lookup(place)
+    if hit is not None:
+        return hit
+    hit = _GEOCODE_LRU.get(key, _MISS)
+    if hit is not _MISS:
+        return hit
+    if _GEOCODE_DISK is not None:
+        raw = await _GEOCODE_DISK.aget(key)
+        if raw is not None:
+            hit = json.loads(raw)
+            _GEOCODE_LRU.put(key, hit, GEOCODE_CACHE_TTL if hit else GEOCODE_NEGATIVE_TTL)
+            return hit
+    pending, _ = _single_flight(_GEOCODE_INFLIGHT, key,
+                                lambda: _geocode_fetch(" ".join(place.split()), key))
+    return await pending
 
 def find_timezone(lat:Optional[float], lon:Optional[float])->str:
     if lat is None or lon is None: return "Europe/Berlin"
@@ -498,36 +1056,71 @@ except Exception:
 ZOD_SIGNS=["Widder","Stier","Zwillinge","Krebs","Löwe","Jungfrau","Waage","Skorpion","Schütze","Steinbock","Wassermann","Fische"]
 def sign_from_deg(lon_deg:float)->str: return ZOD_SIGNS[int((lon_deg%360.0)//30)]
 
-def swe_compute(bdate:dt.date,btime:Optional[dt.time],lat:Optional[float],lon:Optional[float],tzname:str,house_sys:Optional[str]=None):
-    if not (HAS_SWE and btime and lat is not None and lon is not None): return None
-    house_sys=(house_sys or os.getenv("HOUSE_SYSTEM","P")).strip()[:1] or "P"
+# Ephemeriden-Engine: identische Geburtsdaten (Datum, Zeit, Koordinaten auf
+# ~10 m gerundet, Zeitzone, Häusersystem) ergeben immer dasselbe Horoskop —
+# deshalb rechnet swe.houses + 10× swe.calc_ut pro Eingabe nur einmal.
+SWE_CACHE_SIZE = int(os.getenv("SWE_CACHE_SIZE", "4096"))
+_SWE_COORD_DIGITS = 4
+_SWE_PLANETS: Tuple[Tuple[str, int], ...] = ((
+    ("Sonne", swe.SUN), ("Mond", swe.MOON), ("Merkur", swe.MERCURY), ("Venus", swe.VENUS),
+    ("Mars", swe.MARS), ("Jupiter", swe.JUPITER), ("Saturn", swe.SATURN),
+    ("Uranus", swe.URANUS), ("Neptun", swe.NEPTUNE), ("Pluto", swe.PLUTO),
+) if HAS_SWE else ())
+
+def _house_of(cusps: List[float], L: float) -> Optional[int]:
+    L=L%360.0
+    for i in range(12):
+        a=cusps[i]%360.0; b=cusps[(i+1)%12]%360.0
+        if (a<=b and a<=L<b) or (a>b and (L>=a or L<b)): return i+1
+    return None
+
+@functools.lru_cache(maxsize=SWE_CACHE_SIZE)
+def _swe_chart(bdate:dt.date,btime:dt.time,lat:float,lon:float,tzname:str,house_sys:str)->Dict[str, Any]:
     loc=dt.datetime.combine(bdate,btime).replace(tzinfo=ZoneInfo(tzname)); ut=loc.astimezone(dt.timezone.utc)
     jd=swe.julday(ut.year,ut.month,ut.day,ut.hour+ut.minute/60+ut.second/3600)
     raw_cusps,ascmc=swe.houses(jd,lat,lon,house_sys.encode()); asc,mc=ascmc[0],ascmc[1]
     # pyswisseph 2.x gibt 12 Cusps zurück, ältere Bindings 13 (Index 0 unbenutzt).
     cusps = [raw_cusps[i] for i in range(1, 13)] if len(raw_cusps) >= 13 else list(raw_cusps[:12])
-    planets={"Sonne":swe.SUN,"Mond":swe.MOON,"Merkur":swe.MERCURY,"Venus":swe.VENUS,"Mars":swe.MARS,"Jupiter":swe.JUPITER,"Saturn":swe.SATURN,
-             "Uranus":swe.URANUS,"Neptun":swe.NEPTUNE,"Pluto":swe.PLUTO}
     pos={}
-    for name,code in planets.items():
+    for name,code in _SWE_PLANETS:
         lonlat,_=swe.calc_ut(jd,code,swe.FLG_SWIEPH); pos[name]={"lon":lonlat[0],"sign":sign_from_deg(lonlat[0])}
-    def house_of(L):
-        L=L%360.0
-        for i in range(12):
-            a=cusps[i]%360.0; b=cusps[(i+1)%12]%360.0
-            if (a<=b and a<=L<b) or (a>b and (L>=a or L<b)): return i+1
-        return None
     return {
         "houseSystem":house_sys,
         "ascendant":{"deg":asc,"sign":sign_from_deg(asc)},
         "mc":{"deg":mc,"sign":sign_from_deg(mc)},
-        "cusps":list(cusps),
+        "cusps":cusps,
         "planets":pos,
-        "sunHouse":house_of(pos["Sonne"]["lon"]),
-        "moonHouse":house_of(pos["Mond"]["lon"]),
+        "sunHouse":_house_of(cusps,pos["Sonne"]["lon"]),
+        "moonHouse":_house_of(cusps,pos["Mond"]["lon"]),
         "utc":ut.isoformat()
     }
 
+def _swe_key(bdate:dt.date,btime:Optional[dt.time],lat:Optional[float],lon:Optional[float],tzname:str,house_sys:Optional[str]=None):
+    if not (HAS_SWE and btime and lat is not None and lon is not None): return None
+    house_sys=(house_sys or os.getenv("HOUSE_SYSTEM","P")).strip()[:1] or "P"
+    return (bdate, btime.replace(microsecond=0), round(float(lat), _SWE_COORD_DIGITS),
+            round(float(lon), _SWE_COORD_DIGITS), tzname, house_sys)
+
+def _swe_copy(chart: Dict[str, Any]) -> Dict[str, Any]:
+    """Flache Kopie bis in die Unter-Dicts: der Cache-Eintrag bleibt
+    unberührt, auch wenn ein Aufrufer das Ergebnis verändert."""
+    out = dict(chart)
+    out["ascendant"] = dict(chart["ascendant"]); out["mc"] = dict(chart["mc"])
+    out["cusps"] = list(chart["cusps"])
+    out["planets"] = {k: dict(v) for k, v in chart["planets"].items()}
+    return out
+
+def swe_compute(bdate:dt.date,btime:Optional[dt.time],lat:Optional[float],lon:Optional[float],tzname:str,house_sys:Optional[str]=None):
+    key=_swe_key(bdate,btime,lat,lon,tzname,house_sys)
+    return _swe_copy(_swe_chart(*key)) if key else None
+
+def swe_compute_many(items: List[Tuple]) -> List[Optional[Dict[str, Any]]]:
+    """Batch-Variante für Importe und Vorberechnung: nimmt Tupel mit den
+    Argumenten von swe_compute und liefert die Charts in Eingabereihenfolge.
+    Doppelte Eingaben (auch innerhalb des Batches) rechnet der LRU nur einmal;
+    ein vektorisiertes Swiss-Ephemeris-API gibt es in pyswisseph nicht."""
+    return [_swe_copy(_swe_chart(*k)) if k else None for k in (_swe_key(*item) for item in items)]
+
 def _chat_kwargs(model: str, temperature: float, seed: Optional[int] = None) -> Dict[str, Any]:
     """Modellbewusste Parameter für chat.completions.
 
@@ -566,43 +1159,836 @@ _LLM_DEFAULT_SYSTEM = (
     "keine erfundenen Adjektive, keine gestelzten Komposita. Im Zweifel wähle "
     "das einfache, gebräuchliche Wort.")
 
-def _anthropic_text(system: str, user: str) -> str:
+def _voice_system(tone: Optional[str]) -> str:
+    """Produktstimme plus Ton-Regler — der stabile Systemteil aller Kurztexte."""
+    return _LLM_DEFAULT_SYSTEM + "\n\nTon-Vorgabe: " + _tone_directive(tone)
+
+# Prompt-Caching beim Provider: Jeder Prompt besteht aus einem stabilen Teil
+# — System (Stimme, Ton) und `prefix` (Aufgabe, Regeln, JSON-Schema) — und
+# dem variablen Rest (Geburtsdaten, Tageslage, Mixer, Outline). Der stabile
+# Teil steht immer vorn: Anthropic bekommt hinter System und Aufgabe je
+# einen cache_control-Breakpoint, OpenAI cacht identische Präfixe ab 1024
+# Tokens automatisch; prompt_cache_key leitet gleiche Präfixe auf dieselbe
+# Maschine. Wie viel davon tatsächlich aus dem Cache kam, zählt
+# _llm_usage je Endpoint mit (/metrics, Log bei LLM_LOG_USAGE=1).
+LLM_LOG_USAGE = os.getenv("LLM_LOG_USAGE", "1").strip().lower() not in ("0", "false", "no", "")
+_CACHE_POINT = {"type": "ephemeral"}
+
+def _prefix_id(system: str, prefix: str) -> str:
+    return "h1-" + hashlib.sha1((system + "\x00" + prefix).encode("utf-8")).hexdigest()[:16]
+
+def _llm_usage(endpoint: str, provider: str, seconds: float, input_tokens: int, cached_tokens: int) -> None:
+    _count("llmTokens", endpoint, "calls")
+    _count("llmTokens", endpoint, "input", input_tokens)
+    _count("llmTokens", endpoint, "cached", cached_tokens)
+    _count("llmTokens", endpoint, "ms", int(seconds * 1000))
+    if LLM_LOG_USAGE:
+        print(f"llm {endpoint} {provider}: {input_tokens} input tokens, {cached_tokens} cached, {seconds:.2f}s")
+
+async def _anthropic_text(system: str, user: str, prefix: str = "",
+                          timeout: Optional[float] = None, sdk: Any = None) -> Tuple[str, int, int]:
     """Ein Text-Call gegen die Anthropic Messages API.
+    → (Text, Input-Tokens gesamt, davon aus dem Prompt-Cache).
 
     Claude Sonnet 5 lehnt Nicht-Default-Sampling-Parameter ab und denkt
     standardmäßig adaptiv; für kurze Deutungstexte reicht effort=low
     (schnell, günstig) — per ANTHROPIC_EFFORT übersteuerbar. max_tokens
     deckt Denken + Antwort gemeinsam ab, daher großzügig.
     """
-    resp = _anthropic_client.messages.create(
+    content = [{"type": "text", "text": prefix, "cache_control": _CACHE_POINT}] if prefix else []
+    content.append({"type": "text", "text": user})
+    resp = await (sdk or _anthropic_client).messages.create(
         model=ANTHROPIC_MODEL,
         max_tokens=4096,
         output_config={"effort": os.getenv("ANTHROPIC_EFFORT", "low")},
-        system=system,
-        messages=[{"role": "user", "content": user}],
+        system=[{"type": "text", "text": system, "cache_control": _CACHE_POINT}],
+        messages=[{"role": "user", "content": content}],
+        **({"timeout": timeout} if timeout is not None else {}),
     )
     text = next((b.text for b in resp.content if b.type == "text"), None)
     if text is None:
         raise RuntimeError(f"Anthropic-Antwort ohne Text (stop_reason={resp.stop_reason})")
+    usage = getattr(resp, "usage", None)
+    cached = getattr(usage, "cache_read_input_tokens", 0) or 0
+    written = getattr(usage, "cache_creation_input_tokens", 0) or 0
+    return text, (getattr(usage, "input_tokens", 0) or 0) + cached + written, cached
+
+async def _openai_text(system: str, user: str, prefix: str, params: Dict[str, Any],
+                       timeout: Optional[float] = None, sdk: Any = None) -> Tuple[str, int, int]:
+    """Chat-Completion mit stabilem Präfix vorn. → (Text, Input-Tokens, gecachte Tokens)."""
+    if timeout is not None:
+        params = dict(params, timeout=timeout)
+    resp = await (sdk or client).chat.completions.create(**params, messages=[
+        {"role": "system", "content": system},
+        {"role": "user", "content": f"{prefix}\n\n{user}" if prefix else user},
+    ], extra_body={"prompt_cache_key": _prefix_id(system, prefix)})
+    usage = getattr(resp, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (resp.choices[0].message.content, getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(details, "cached_tokens", 0) or 0)
+
+# LLM-Antwort-Cache: derselbe Prompt (Provider, Modell, System, User, Seed,
+# Sampling-Parameter) wird innerhalb von LLM_CACHE_TTL nur einmal bezahlt —
+# für alle Endpoints, nicht nur /reading. Gleichzeitige identische Calls
+# teilen sich einen Request. Mit LLM_CACHE_PATH liegt dahinter eine SQLite-
+# Datei, die alle Worker teilen ("" = nur RAM), gedeckelt auf
+# LLM_CACHE_DISK_MAX_BYTES an Texten.
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX = int(os.getenv("LLM_CACHE_MAX", "4096"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_DISK_MAX_BYTES = int(os.getenv("LLM_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+_LLM_CACHE = _LRUCache(LLM_CACHE_MAX, LLM_CACHE_TTL, LLM_CACHE_MAX_BYTES)
+_LLM_DISK: Optional[_SqliteKV] = (
+    _SqliteKV(LLM_CACHE_PATH, "llm_cache", max_bytes=LLM_CACHE_DISK_MAX_BYTES) if LLM_CACHE_PATH else None)
+_LLM_INFLIGHT: Dict[str, "asyncio.Future"] = {}
+
+def _llm_params(provider: str, temperature: float, seed: Optional[int]) -> Dict[str, Any]:
+    """Alles, was außer den Nachrichten an den Provider geht."""
+    if provider == "anthropic":
+        return {"model": ANTHROPIC_MODEL, "max_tokens": 4096,
+                "effort": os.getenv("ANTHROPIC_EFFORT", "low")}
+    return _chat_kwargs(MODEL, temperature, seed)
+
+def _llm_cache_key(provider: str, system: str, prefix: str, user: str, params: Dict[str, Any]) -> str:
+    raw = json.dumps([provider, params, system, prefix, user], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+# Hedging (LLM_HEDGE=1, Default aus): Hat der primäre Provider nach seiner
+# beobachteten p90-Latenz (je Provider und Endpoint) noch nicht geantwortet,
+# geht derselbe Prompt zusätzlich an den anderen Provider; die erste Antwort
+# gewinnt, der andere Call wird abgebrochen. Das kappt die p99 von /reading,
+# ohne den Median anzufassen — 90 % der Calls sind vor der Schwelle fertig.
+# Die Mehrkosten deckelt ein Budget je Endpoint: LLM_HEDGE_BUDGET (Anteil
+# der Calls, Default 0.1), einzeln per LLM_HEDGE_BUDGET_<ENDPOINT>.
+# /reading meldet seine Stufen getrennt (reading_outline, reading_longform,
+# reading_section, reading_single, reading_deep) — ein kurzer Sektions-Call
+# und ein langer Langtext hätten sonst eine gemeinsame, für beide falsche
+# p90. LLM_HEDGE_BUDGET_READING gilt für alle Stufen, die kein eigenes haben.
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0").strip().lower() in ("1", "true", "yes", "on")
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+_LLM_HEDGE_BURST = 3.0  # so viele Hedges darf ein Endpoint am Stück „ansparen“
+_LLM_LATENCY: Dict[str, deque] = {}
+_LLM_HEDGE_CREDIT: Dict[str, float] = {}
+
+def _llm_latency_note(provider: str, endpoint: str, seconds: float) -> None:
+    _LLM_LATENCY.setdefault(f"{provider}:{endpoint}", deque(maxlen=200)).append(seconds)
+
+def _llm_latency_p90(provider: str, endpoint: str) -> Optional[float]:
+    samples = _LLM_LATENCY.get(f"{provider}:{endpoint}")
+    if not samples or len(samples) < LLM_HEDGE_MIN_SAMPLES:
+        return None  # zu wenig gesehen — lieber gar nicht hedgen als blind
+    return _percentile(sorted(samples), 90)
+
+def _hedge_partner(provider: str) -> Optional[str]:
+    if provider == "openai":
+        return "anthropic" if _anthropic_client is not None else None
+    return "openai" if client is not None else None
+
+def _hedge_budget(endpoint: str) -> float:
+    family = endpoint.split("_")[0]
+    return float(os.getenv(f"LLM_HEDGE_BUDGET_{endpoint.upper()}",
+                           os.getenv(f"LLM_HEDGE_BUDGET_{family.upper()}", LLM_HEDGE_BUDGET)))
+
+def _hedge_credit(endpoint: str) -> None:
+    """Jeder primäre Call spart den Budget-Anteil eines Hedges an."""
+    credit = _LLM_HEDGE_CREDIT.get(endpoint, 1.0) + _hedge_budget(endpoint)
+    _LLM_HEDGE_CREDIT[endpoint] = min(_LLM_HEDGE_BURST, credit)
+
+def _hedge_take(endpoint: str) -> bool:
+    if _LLM_HEDGE_CREDIT.get(endpoint, 0.0) < 1.0:
+        return False
+    _LLM_HEDGE_CREDIT[endpoint] -= 1.0
+    return True
+
+# Circuit Breaker je Provider: Sind von den letzten Calls zu viele
+# gescheitert oder zu langsam gewesen, geht der Breaker auf und jeder weitere
+# Call scheitert sofort (_BreakerOpen) — die Endpoints liefern dann ohne
+# Wartezeit ihre deterministischen Fallback-Texte, statt Worker-Kapazität
+# bis zum SDK-Timeout zu binden. Nach LLM_BREAKER_COOLDOWN Sekunden darf ein
+# einzelner Probe-Call durch (half-open); gelingt er, schließt der Breaker.
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_SLOW_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "20"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+_BREAKER_WINDOW = 20     # betrachtete letzte Calls
+_BREAKER_MIN_CALLS = 10  # darunter entscheidet der Breaker nicht
+
+class _BreakerOpen(RuntimeError):
+    pass
+
+_BREAKER_CALL = object()  # Ticket eines gewöhnlichen Calls (kein Probe)
+
+class _CircuitBreaker:
+    """closed → open → half_open → closed (oder zurück auf open)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probe: Optional[object] = None  # Ticket des laufenden Probe-Calls
+        self._calls: deque = deque(maxlen=_BREAKER_WINDOW)  # (ok, langsam)
+
+    def allow(self) -> Optional[object]:
+        """Ticket für den Call oder None (Breaker offen). Im half-open-Zustand
+        bekommt genau ein Call ein Probe-Ticket; nur dessen Ergebnis
+        schließt den Breaker oder löst ihn erneut aus — ein Nachzügler von
+        vor dem Auslösen entscheidet nichts."""
+        if self.state == "closed":
+            return _BREAKER_CALL
+        if self.state == "open" and time.monotonic() - self.opened_at >= LLM_BREAKER_COOLDOWN:
+            self.state = "half_open"
+        if self.state == "half_open" and self.probe is None:
+            self.probe = object()
+            return self.probe
+        return None
+
+    def record(self, ok: Optional[bool], seconds: float = 0.0,
+               ticket: Optional[object] = _BREAKER_CALL) -> None:
+        """ok=None: Call wurde abgebrochen (Hedge-Verlierer) — zählt nicht."""
+        probe = ticket is not None and ticket is self.probe
+        if probe:
+            self.probe = None
+        if ok is None:
+            return
+        slow = seconds > LLM_BREAKER_SLOW_SECONDS
+        if probe:
+            if ok and not slow:
+                self.state = "closed"
+                self._calls.clear()
+                print(f"circuit breaker {self.name}: closed")
+            else:
+                self._trip()
+            return
+        self._calls.append((ok, slow))
+        if self.state == "closed" and len(self._calls) >= _BREAKER_MIN_CALLS:
+            errors = sum(1 for good, _ in self._calls if not good) / len(self._calls)
+            slows = sum(1 for _, lag in self._calls if lag) / len(self._calls)
+            if errors >= LLM_BREAKER_ERROR_RATE or slows >= LLM_BREAKER_ERROR_RATE:
+                self._trip()
+
+    def _trip(self) -> None:
+        self.state, self.opened_at = "open", time.monotonic()
+        print(f"circuit breaker {self.name}: open for {LLM_BREAKER_COOLDOWN:.0f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        n = len(self._calls)
+        return {"state": self.state, "calls": n,
+                "errorRate": round(sum(1 for ok, _ in self._calls if not ok) / n, 3) if n else 0.0,
+                "slowRate": round(sum(1 for _, slow in self._calls if slow) / n, 3) if n else 0.0}
+
+_LLM_BREAKERS: Dict[str, _CircuitBreaker] = {}
+
+def _llm_breaker(provider: str) -> _CircuitBreaker:
+    if provider not in _LLM_BREAKERS:
+        _LLM_BREAKERS[provider] = _CircuitBreaker(provider)
+    return _LLM_BREAKERS[provider]
+
+# Deadline je Request: der Endpoint setzt sie einmal (@_with_llm_deadline),
+# jeder LLM-Call darunter bekommt nur noch die Restzeit — als SDK-Timeout und
+# als harte Obergrenze (das SDK wiederholt sonst intern). Ist die Zeit um,
+# scheitert der Call sofort und der Endpoint nimmt seinen Fallback.
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "25"))
+READING_DEADLINE_SECONDS = float(os.getenv("READING_DEADLINE_SECONDS", "60"))
+_LLM_DEADLINE: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+def _with_llm_deadline(seconds: Callable[[], float]):
+    def wrap(fn):
+        @functools.wraps(fn)
+        async def inner(*args, **kwargs):
+            deadline = time.monotonic() + seconds()
+            outer = _LLM_DEADLINE.get()
+            token = _LLM_DEADLINE.set(deadline if outer is None else min(outer, deadline))
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _LLM_DEADLINE.reset(token)
+        return inner
+    return wrap
+
+def _llm_remaining() -> Optional[float]:
+    deadline = _LLM_DEADLINE.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+# Key-Pool: jeder konfigurierte API-Key (OPENAI_API_KEY plus weitere aus
+# OPENAI_API_KEYS, analog ANTHROPIC_*) ist eine Spur mit eigenem Budget. Die
+# Rate-Limit-Header jeder Antwort sagen, wie viele Requests und Tokens bis
+# zum nächsten Reset übrig sind; ist eine Spur leer oder nach einem 429
+# gesperrt (retry-after), nimmt der Pool eine andere. Die Parallelität je
+# Spur folgt AIMD: +1 je voller Runde erfolgreicher Calls bis zum Deckel,
+# halbiert bei 429. Ist gerade keine Spur frei, wartet der Aufrufer kurz
+# (höchstens LLM_QUEUE_SECONDS bzw. bis zur Deadline), statt den 429
+# durchzureichen.
+LLM_QUEUE_SECONDS = float(os.getenv("LLM_QUEUE_SECONDS", "10"))
+LLM_RATELIMIT_RETRIES = int(os.getenv("LLM_RATELIMIT_RETRIES", "2"))
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNIT = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def _reset_seconds(value: Optional[str]) -> Optional[float]:
+    """Sekunden bis zum Reset: "12" / "1.5" (retry-after), "6m0s" / "20ms"
+    (OpenAI) oder ein RFC-3339-Zeitpunkt (Anthropic)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        return sum(float(n) * _DURATION_UNIT[u] for n, u in parts)
+    try:
+        at = dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if at.tzinfo is None:
+        return None
+    return max(0.0, (at - dt.datetime.now(dt.timezone.utc)).total_seconds())
+
+def _header_int(headers: Any, *names: str) -> Optional[int]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return int(float(value))
+            except ValueError:
+                pass
+    return None
+
+class _KeyLane:
+    """Ein API-Key eines Providers: Client, Budget laut Headern, AIMD-Limit."""
+
+    def __init__(self, label: str, ceiling: int, sdk_client: Callable[[], Any]):
+        self.label = label
+        self.ceiling = max(1, ceiling)
+        self.limit = float(self.ceiling)
+        self.in_flight = 0
+        self.requests_left: Optional[int] = None
+        self.tokens_left: Optional[int] = None
+        self.requests_reset = 0.0  # monotonic; danach gilt das Budget als erneuert
+        self.tokens_reset = 0.0
+        self.blocked_until = 0.0   # nach 429 bis retry-after
+        self._client = sdk_client
+
+    @property
+    def client(self) -> Any:
+        return self._client()
+
+    def ready(self, now: float, tokens: int) -> bool:
+        if now < self.blocked_until or self.in_flight >= int(self.limit):
+            return False
+        if now >= self.requests_reset:
+            self.requests_left = None
+        if now >= self.tokens_reset:
+            self.tokens_left = None
+        if self.requests_left is not None and self.requests_left <= 0:
+            return False
+        return self.tokens_left is None or self.tokens_left >= tokens
+
+    def take(self, tokens: int) -> None:
+        """Budget vorab abziehen — die Header der eigenen Antwort kommen erst
+        Sekunden später, parallele Calls sollen das Budget nicht überziehen."""
+        self.in_flight += 1
+        if self.requests_left is not None:
+            self.requests_left -= 1
+        if self.tokens_left is not None:
+            self.tokens_left -= tokens
+
+    def observe(self, status: int, headers: Any) -> None:
+        """Rate-Limit-Header einer Antwort übernehmen (OpenAI: x-ratelimit-*,
+        Anthropic: anthropic-ratelimit-*)."""
+        now = time.monotonic()
+        requests = _header_int(headers, "x-ratelimit-remaining-requests",
+                               "anthropic-ratelimit-requests-remaining")
+        tokens = _header_int(headers, "x-ratelimit-remaining-tokens",
+                             "anthropic-ratelimit-input-tokens-remaining",
+                             "anthropic-ratelimit-tokens-remaining")
+        requests_reset = _reset_seconds(headers.get("x-ratelimit-reset-requests")
+                                        or headers.get("anthropic-ratelimit-requests-reset"))
+        tokens_reset = _reset_seconds(headers.get("x-ratelimit-reset-tokens")
+                                      or headers.get("anthropic-ratelimit-input-tokens-reset")
+                                      or headers.get("anthropic-ratelimit-tokens-reset"))
+        # Ohne Reset-Zeitpunkt wäre ein Budget von 0 eine Sperre ohne Ende.
+        if requests is not None and requests_reset is not None:
+            self.requests_left, self.requests_reset = requests, now + requests_reset
+        if tokens is not None and tokens_reset is not None:
+            self.tokens_left, self.tokens_reset = tokens, now + tokens_reset
+        if status == 429:
+            ms = _header_int(headers, "retry-after-ms")
+            self.throttle(ms / 1000 if ms is not None else _reset_seconds(headers.get("retry-after")))
+
+    def throttle(self, retry_after: Optional[float]) -> None:
+        """429: Parallelität halbieren, Spur bis retry-after (sonst 1 s) sperren.
+        Mehrere 429 derselben Welle halbieren nur einmal."""
+        now = time.monotonic()
+        if now >= self.blocked_until:
+            self.limit = max(1.0, self.limit / 2)
+        self.blocked_until = max(self.blocked_until, now + (1.0 if retry_after is None else retry_after))
+
+    def succeeded(self) -> None:
+        self.limit = min(float(self.ceiling), self.limit + 1.0 / self.limit)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"key": self.label, "limit": round(self.limit, 2), "inFlight": self.in_flight,
+                "requestsLeft": self.requests_left, "tokensLeft": self.tokens_left,
+                "blocked": self.blocked_until > time.monotonic()}
+
+class _KeyPool:
+    """Verteilt die Calls eines Providers auf seine Spuren."""
+
+    def __init__(self, provider: str, lanes: List[_KeyLane]):
+        self.provider, self.lanes = provider, lanes
+        self._events: Dict[str, tuple] = {}
+
+    def _pick(self, tokens: int) -> Optional[_KeyLane]:
+        now = time.monotonic()
+        ready = [lane for lane in self.lanes if lane.ready(now, tokens)]
+        if not ready:
+            return None
+        return min(ready, key=lambda lane: (lane.in_flight / lane.limit,
+                                            -(lane.requests_left if lane.requests_left is not None else 1 << 30)))
+
+    def _next_reset(self) -> Optional[float]:
+        now = time.monotonic()
+        waits = [t - now for lane in self.lanes
+                 for t in (lane.blocked_until, lane.requests_reset, lane.tokens_reset) if t > now]
+        return min(waits) if waits else None
+
+    async def acquire(self, tokens: int, timeout: float) -> _KeyLane:
+        changed = _loop_local(self._events, "changed", asyncio.Event)
+        lane = self._pick(tokens)
+        if lane is None:
+            _count("llmPool", self.provider, "queued")
+            t0 = time.monotonic()
+            deadline = t0 + timeout
+            while lane is None:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    _count("llmPool", self.provider, "queueTimeouts")
+                    raise asyncio.TimeoutError(f"no {self.provider} capacity within {timeout:.1f}s")
+                changed.clear()
+                reset = self._next_reset()
+                try:
+                    await asyncio.wait_for(changed.wait(), min(left, reset) if reset is not None else left)
+                except asyncio.TimeoutError:
+                    pass
+                lane = self._pick(tokens)
+            _count("llmPool", self.provider, "waitMs", int((time.monotonic() - t0) * 1000))
+        lane.take(tokens)
+        return lane
+
+    def release(self, lane: _KeyLane) -> None:
+        lane.in_flight -= 1
+        _loop_local(self._events, "changed", asyncio.Event).set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(_METRICS.get("llmPool", {}).get(self.provider, {}),
+                    lanes=[lane.snapshot() for lane in self.lanes])
+
+_LLM_POOLS: Dict[str, _KeyPool] = {}
+
+def _api_keys(provider: str) -> List[str]:
+    """Primärer Key zuerst, dann die zusätzlichen (ohne Dubletten)."""
+    env = provider.upper()
+    keys = [os.getenv(f"{env}_API_KEY", "")] + os.getenv(f"{env}_API_KEYS", "").split(",")
+    return list(dict.fromkeys(k.strip() for k in keys if k.strip()))
+
+def _llm_pool(provider: str) -> _KeyPool:
+    pool = _LLM_POOLS.get(provider)
+    if pool is None:
+        ceiling = int(os.getenv(f"LLM_MAX_CONCURRENCY_{provider.upper()}", LLM_MAX_CONCURRENCY))
+        sdk = _anthropic_sdk if provider == "anthropic" else _openai_sdk
+        # Spur 0 ist immer der Modul-Client (client / _anthropic_client).
+        lanes = [_KeyLane(f"{provider}#0", ceiling,
+                          (lambda: _anthropic_client) if provider == "anthropic" else (lambda: client))]
+        for i, key in enumerate(_api_keys(provider)[1:] if sdk is not None else [], start=1):
+            cls = sdk.AsyncAnthropic if provider == "anthropic" else sdk.AsyncOpenAI
+            extra = cls(api_key=key, http_client=_ratelimit_http(sdk, provider, i))
+            lanes.append(_KeyLane(f"{provider}#{i}", ceiling, lambda c=extra: c))
+        pool = _LLM_POOLS[provider] = _KeyPool(provider, lanes)
+    return pool
+
+def _llm_token_estimate(*parts: str) -> int:
+    """Grobe Input-Token-Schätzung (≈ 4 Zeichen je Token) für das Vorab-Budget."""
+    return sum(len(part) for part in parts) // 4 + 1
+
+def _rate_limited(exc: BaseException) -> bool:
+    return getattr(exc, "status_code", None) == 429
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    ms = _header_int(headers, "retry-after-ms")
+    return ms / 1000 if ms is not None else _reset_seconds(headers.get("retry-after"))
+
+async def _llm_provider_call(p: str, system: str, prefix: str, user: str,
+                             temperature: float, seed: Optional[int], endpoint: str) -> str:
+    """Ein Call an den Provider. Die Admission (siehe _Admission) gilt hier,
+    je echtem Call — ein Micro-Batch belegt einen Platz, nicht einen je
+    wartendem Prompt."""
+    breaker = _llm_breaker(p)
+    remaining = _llm_remaining()
+    if remaining is not None and remaining <= 0:
+        raise asyncio.TimeoutError(f"deadline exceeded before {p} call")
+    ticket = breaker.allow()
+    if ticket is None:
+        _count("llmBreaker", p, "rejected")
+        raise _BreakerOpen(f"circuit breaker {p} open")
+    admission = _admission() if LLM_ADMIT_MAX_INFLIGHT > 0 else None
+    if admission is not None:
+        load = _REQUEST_LOAD.get()
+        try:
+            await admission.acquire(load["client"] if load else "-", endpoint)
+        except BaseException:
+            breaker.record(None, ticket=ticket)  # abgewiesen, nicht gescheitert
+            raise
+    try:
+        return await _llm_provider_send(p, breaker, ticket, system, prefix, user,
+                                        temperature, seed, endpoint)
+    finally:
+        if admission is not None:
+            admission.release()
+
+async def _llm_provider_send(p: str, breaker: _CircuitBreaker, ticket: object, system: str,
+                             prefix: str, user: str, temperature: float, seed: Optional[int],
+                             endpoint: str) -> str:
+    remaining = _llm_remaining()
+    pool, tokens = _llm_pool(p), _llm_token_estimate(system, prefix, user)
+    attempt = 0
+    while True:
+        try:
+            lane = await pool.acquire(tokens, LLM_QUEUE_SECONDS if remaining is None
+                                      else min(LLM_QUEUE_SECONDS, remaining))
+        except asyncio.TimeoutError:
+            breaker.record(None, ticket=ticket)  # eigener Stau, nicht der des Providers
+            raise
+        try:
+            t0 = time.monotonic()
+            remaining = _llm_remaining()  # das Warten auf die Spur zählt mit
+            if remaining is not None and remaining <= 0:
+                breaker.record(None, ticket=ticket)
+                raise asyncio.TimeoutError(f"deadline exceeded waiting for a {p} slot")
+            try:
+                if p == "anthropic":
+                    call = _anthropic_text(system, user, prefix, timeout=remaining, sdk=lane.client)
+                else:
+                    call = _openai_text(system, user, prefix, _llm_params(p, temperature, seed),
+                                        timeout=remaining, sdk=lane.client)
+                text, input_tokens, cached_tokens = await asyncio.wait_for(call, remaining)
+            except asyncio.CancelledError:
+                # Abgebrochener Verlierer: mindestens so lange hätte er gebraucht.
+                _llm_latency_note(p, endpoint, time.monotonic() - t0)
+                breaker.record(None, ticket=ticket)
+                raise
+            except Exception as exc:
+                if _rate_limited(exc):
+                    lane.throttle(_retry_after(exc))
+                    _count("llmPool", p, "throttled")
+                    if attempt < LLM_RATELIMIT_RETRIES:
+                        attempt += 1
+                        continue  # nächste freie Spur, notfalls nach retry-after
+                breaker.record(False, time.monotonic() - t0, ticket)
+                raise
+            seconds = time.monotonic() - t0
+            lane.succeeded()
+            breaker.record(True, seconds, ticket)
+            _llm_latency_note(p, endpoint, seconds)
+            _llm_usage(endpoint, p, seconds, input_tokens, cached_tokens)
+            return text
+        finally:
+            pool.release(lane)
+
+async def _llm_hedged(p: str, system: str, prefix: str, user: str,
+                      temperature: float, seed: Optional[int], endpoint: str) -> Tuple[str, str]:
+    """→ (Text, Provider, der ihn geliefert hat)."""
+    primary = asyncio.ensure_future(_llm_provider_call(p, system, prefix, user, temperature, seed, endpoint))
+    partner = _hedge_partner(p)
+    delay = _llm_latency_p90(p, endpoint) if partner else None
+    _hedge_credit(endpoint)
+    if delay is None:
+        return await primary, p
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done:
+        return primary.result(), p
+    if not _hedge_take(endpoint):
+        _count("llmHedge", endpoint, "overBudget")
+        return await primary, p
+    _count("llmHedge", endpoint, "fired")
+    backup = asyncio.ensure_future(
+        _llm_provider_call(partner, system, prefix, user, temperature, seed, endpoint))
+    pending = {primary, backup}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        _count("llmHedge", endpoint, "backupWon")
+                        return task.result(), partner
+                    return task.result(), p
+        return primary.result(), p  # beide gescheitert: Fehler des primären Calls
+    finally:
+        for task in pending:
+            task.cancel()
+        for task in (primary, backup):
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+# Micro-Batching (LLM_MICROBATCH_MS > 0, Default aus): Kurztext-Prompts mit
+# gleichem Provider, System, Aufgabe und Temperatur, die innerhalb des
+# Fensters eintreffen, gehen als ein Call mit nummerierten Eingaben raus; die
+# JSON-Antwort wird wieder auf die wartenden Aufrufer verteilt. Was darin
+# fehlt oder nicht parst, geht einzeln nach. Spart zur 08:00-Spitze Request-
+# Overhead und Rate-Limit-Budget, kostet höchstens das Fenster an Latenz.
+# Vergleich: python3 scripts/bench_microbatch.py
+LLM_MICROBATCH_MS = float(os.getenv("LLM_MICROBATCH_MS", "0"))
+LLM_MICROBATCH_MAX = int(os.getenv("LLM_MICROBATCH_MAX", "16"))
+_MICROBATCH_ENDPOINTS = {"board_move", "resonanz", "compare"}
+_MICROBATCH_TASK = """Mehrere Anfragen auf einmal: Unten stehen nummerierte, voneinander unabhängige
+Eingaben zur selben Aufgabe. Bearbeite jede für sich, als wäre sie die einzige — nichts
+übertragen, nichts vergleichen. Antworte NUR mit einem JSON-Objekt, das jeder Nummer ihren
+Text zuordnet: {"1": "…", "2": "…"}.
+Die Aufgabe:"""
+_MICROBATCHERS: Dict[str, tuple] = {}
+
+class _MicroBatcher:
+    """Offene Sammel-Fenster je (Provider, System, Aufgabe, Temperatur)."""
+
+    def __init__(self):
+        self._open: Dict[tuple, list] = {}
+        self._tasks: set = set()
+
+    def submit(self, p: str, system: str, prefix: str, user: str, temperature: float,
+               seed: Optional[int], endpoint: str) -> "asyncio.Future":
+        loop = asyncio.get_running_loop()
+        key = (p, system, prefix, temperature)
+        fut = loop.create_future()
+        batch = self._open.get(key)
+        if batch is None:
+            batch = self._open[key] = []
+            loop.call_later(LLM_MICROBATCH_MS / 1000, self._flush, key, batch)
+        batch.append((user, seed, endpoint, fut))
+        if len(batch) >= LLM_MICROBATCH_MAX:
+            self._flush(key, batch)
+        return fut
+
+    def _flush(self, key: tuple, batch: list) -> None:
+        if self._open.get(key) is not batch:
+            return  # schon wegen Größe abgeschickt
+        del self._open[key]
+        task = asyncio.ensure_future(self._run(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: tuple, batch: list) -> None:
+        p, system, prefix, temperature = key
+        items = [item for item in batch if not item[3].done()]  # Aufrufer evtl. schon weg
+        answers: Dict[int, str] = {}
+        if len(items) > 1:
+            _count("llmBatch", p, "batches")
+            _count("llmBatch", p, "items", len(items))
+            user = "\n\n".join(f"[{i}]\n{item[0]}" for i, item in enumerate(items, 1))
+            try:
+                data = try_load_json(await _llm_provider_call(
+                    p, system, _MICROBATCH_TASK + "\n" + prefix, user, temperature, None, "batch"))
+                for i in range(1, len(items) + 1):
+                    text = data.get(str(i)) if isinstance(data, dict) else None
+                    if isinstance(text, str) and text.strip():
+                        answers[i] = text.strip()
+            except _Overloaded as e:
+                # Abgewiesen: nicht in N Einzel-Calls ausweichen — das wäre
+                # genau die Last, die die Admission gerade abwehrt.
+                for item in items:
+                    if not item[3].done():
+                        item[3].set_exception(e)
+                return
+            except Exception as e:
+                print(f"micro-batch {p} ({len(items)} prompts) failed: {e}")
+            if len(answers) < len(items):
+                _count("llmBatch", p, "fallbacks", len(items) - len(answers))
+
+        async def single(user: str, seed: Optional[int], endpoint: str, fut: "asyncio.Future") -> None:
+            try:
+                text = await _llm_provider_call(p, system, prefix, user, temperature, seed, endpoint)
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+                return
+            if not fut.done():
+                fut.set_result(text)
+
+        for i, (_user, _seed, _endpoint, fut) in enumerate(items, 1):
+            if i in answers and not fut.done():
+                fut.set_result(answers[i])
+        await asyncio.gather(*(single(*item) for i, item in enumerate(items, 1) if i not in answers))
+
+def _microbatch(p: str, system: str, prefix: str, user: str, temperature: float,
+                seed: Optional[int], endpoint: str) -> "asyncio.Future":
+    return _loop_local(_MICROBATCHERS, "default", _MicroBatcher).submit(
+        p, system, prefix, user, temperature, seed, endpoint)
+
+# Admission Control: slowapi deckelt Calls je IP, weiß aber nichts von der
+# Gesamtlast. Hier zählt jeder Worker seine laufenden LLM-Calls; über
+# LLM_ADMIT_MAX_INFLIGHT hinaus warten neue in einer fairen Schlange — je
+# Client eine FIFO, freie Plätze gehen reihum an die Clients, damit einer
+# mit vielen Requests die anderen nicht aushungert. Abgewiesen (_Overloaded)
+# wird, wer länger als LLM_ADMIT_MAX_WAIT warten müsste, wenn die Schlange
+# voll ist (LLM_ADMIT_MAX_QUEUE) oder die Wartezeit zuletzt im Mittel über
+# LLM_ADMIT_TARGET_WAIT lag — dann lohnt Anstellen nicht. Der Endpoint nimmt
+# seinen Fallback-Text und markiert die Antwort mit meta.degraded.
+LLM_ADMIT_MAX_INFLIGHT = int(os.getenv("LLM_ADMIT_MAX_INFLIGHT", "64"))  # 0 = aus
+LLM_ADMIT_MAX_QUEUE = int(os.getenv("LLM_ADMIT_MAX_QUEUE", "256"))
+LLM_ADMIT_MAX_WAIT = float(os.getenv("LLM_ADMIT_MAX_WAIT", "3"))
+LLM_ADMIT_TARGET_WAIT = float(os.getenv("LLM_ADMIT_TARGET_WAIT", "1"))
+_ADMISSIONS: Dict[str, tuple] = {}
+# Je Request: Client (für die faire Schlange) und ob ein LLM-Call abgewiesen
+# wurde. Ein veränderliches Dict, damit es auch aus gather()-Tasks heraus
+# beim Endpoint ankommt.
+_REQUEST_LOAD: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_load", default=None)
+
+class _Overloaded(RuntimeError):
+    pass
+
+class _Admission:
+    def __init__(self):
+        self.in_flight = 0
+        self.waiting = 0
+        self.wait_avg = 0.0  # gleitender Mittelwert der Wartezeit (s)
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+
+    def _note_wait(self, seconds: float) -> None:
+        self.wait_avg = 0.8 * self.wait_avg + 0.2 * seconds
+
+    def _shed(self, endpoint: str, reason: str) -> None:
+        _count("llmAdmission", endpoint, reason)
+        raise _Overloaded(f"LLM overloaded ({reason})")
+
+    async def acquire(self, client: str, endpoint: str) -> None:
+        if self.in_flight < LLM_ADMIT_MAX_INFLIGHT and not self.waiting:
+            self.in_flight += 1
+            self._note_wait(0.0)
+            _count("llmAdmission", endpoint, "admitted")
+            return
+        if self.waiting >= LLM_ADMIT_MAX_QUEUE:
+            self._shed(endpoint, "shedQueueFull")
+        if self.wait_avg > LLM_ADMIT_TARGET_WAIT:
+            self._shed(endpoint, "shedSlow")
+        fut = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append(fut)
+        self.waiting += 1
+        _count("llmAdmission", endpoint, "queued")
+        t0 = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), LLM_ADMIT_MAX_WAIT)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done():  # Platz kam im selben Moment
+                if isinstance(e, asyncio.CancelledError):
+                    self.release()
+                    raise
+            else:
+                self._dequeue(client, fut)
+                self._note_wait(time.monotonic() - t0)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self._shed(endpoint, "shedTimeout")
+        self._note_wait(time.monotonic() - t0)
+        _count("llmAdmission", endpoint, "admitted")
+
+    def _dequeue(self, client: str, fut: "asyncio.Future") -> None:
+        queue = self._queues.get(client)
+        if queue is not None and fut in queue:
+            queue.remove(fut)
+            self.waiting -= 1
+            if not queue:
+                del self._queues[client]
+
+    def release(self) -> None:
+        """Platz direkt an den nächsten Client in der Runde weitergeben."""
+        while self._queues:
+            client, queue = next(iter(self._queues.items()))
+            fut = queue.popleft()
+            self.waiting -= 1
+            if queue:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"inFlight": self.in_flight, "waiting": self.waiting, "clients": len(self._queues),
+                "waitAvgMs": round(self.wait_avg * 1000, 1)}
+
+def _admission() -> _Admission:
+    return _loop_local(_ADMISSIONS, "default", _Admission)
+
+def _llm_degraded() -> bool:
+    load = _REQUEST_LOAD.get()
+    return bool(load and load["degraded"])
+
+@app.middleware("http")
+async def track_llm_load(request: Request, call_next):
+    token = _REQUEST_LOAD.set({"client": request.client.host if request.client else "-",
+                               "degraded": False})
+    try:
+        return await call_next(request)
+    finally:
+        _REQUEST_LOAD.reset(token)
+
+async def _llm_call(p: str, system: str, prefix: str, user: str, temperature: float,
+                    seed: Optional[int], key: str, endpoint: str, hedge: bool) -> str:
+    answered = p
+    if LLM_MICROBATCH_MS > 0 and endpoint in _MICROBATCH_ENDPOINTS:
+        text = await _microbatch(p, system, prefix, user, temperature, seed, endpoint)
+    elif hedge:
+        text, answered = await _llm_hedged(p, system, prefix, user, temperature, seed, endpoint)
+    else:
+        text = await _llm_provider_call(p, system, prefix, user, temperature, seed, endpoint)
+    if answered != p:
+        # Backup hat gewonnen: unter dem Schlüssel seines Providers ablegen,
+        # sonst stünde der Text bis LLM_CACHE_TTL als Antwort des Primären da.
+        key = _llm_cache_key(answered, system, prefix, user, _llm_params(answered, temperature, seed))
+    if text:  # leere Antworten nicht festschreiben
+        _LLM_CACHE.put(key, text, size=len(text.encode("utf-8")))
+        if _LLM_DISK is not None:
+            await _LLM_DISK.aput(key, text, LLM_CACHE_TTL)
     return text
 
-def llm_text(system: str, user: str, temperature: float = 0.8,
-             seed: Optional[int] = None, provider: Optional[str] = None) -> str:
+async def llm_text(system: str, user: str, temperature: float = 0.8,
+                   seed: Optional[int] = None, provider: Optional[str] = None,
+                   endpoint: str = "other", prefix: str = "") -> str:
     """Provider-neutraler Text-Call. `provider` übersteuert LLM_PROVIDER
-    (genutzt vom /compare-Blindtest)."""
+    (genutzt vom /compare-Blindtest, dann ohne Hedging); `endpoint` ordnet
+    Cache-Treffer und -Fehlschläge in /metrics zu. `prefix` ist der stabile
+    Aufgabenteil, der vor `user` steht und beim Provider gecacht werden kann."""
     p = (provider or LLM_PROVIDER)
-    if p == "anthropic":
-        if _anthropic_client is None:
-            raise RuntimeError("Anthropic nicht konfiguriert (ANTHROPIC_API_KEY fehlt)")
-        return _anthropic_text(system, user)
-    kwargs = dict(_chat_kwargs(MODEL, temperature, seed), messages=[
-        {"role": "system", "content": system},
-        {"role": "user", "content": user},
-    ])
-    return client.chat.completions.create(**kwargs).choices[0].message.content
+    if p == "anthropic" and _anthropic_client is None:
+        raise RuntimeError("Anthropic nicht konfiguriert (ANTHROPIC_API_KEY fehlt)")
+    params = _llm_params(p, temperature, seed)
+    key = _llm_cache_key(p, system, prefix, user, params)
+    text = _LLM_CACHE.get(key)
+    if text is None and _LLM_DISK is not None:
+        text = await _LLM_DISK.aget(key)
+        if text is not None:
+            _LLM_CACHE.put(key, text, size=len(text.encode("utf-8")))
+    if text is not None:
+        _count("llmCache", endpoint, "hits")
+        return text
+    pending, joined = _single_flight(_LLM_INFLIGHT, key,
+                                     lambda: _llm_call(p, system, prefix, user, temperature, seed,
+                                                       key, endpoint, hedge=LLM_HEDGE and provider is None))
+    _count("llmCache", endpoint, "coalesced" if joined else "misses")
+    try:
+        return await pending
+    except _Overloaded:
+        load = _REQUEST_LOAD.get()
+        if load is not None:
+            load["degraded"] = True
+        raise
 
-def oa_text(prompt:str, seed:Optional[int]=None, temperature:float=0.8)->str:
-    return llm_text(_LLM_DEFAULT_SYSTEM, prompt, temperature, seed)
+async def oa_text(prompt:str, seed:Optional[int]=None, temperature:float=0.8,
+                  endpoint:str="other", prefix:str="", tone:Optional[str]=None)->str:
+    return await llm_text(_voice_system(tone), prompt, temperature, seed, endpoint=endpoint, prefix=prefix)
 
 def try_load_json(maybe:str)->Any:
     m=re.search(r"```json([\s\S]*?)```", maybe)
@@ -815,123 +2201,105 @@ def _deep_system_prompt(rtype: str) -> str:
     }
     return base + "\n\n" + specifics.get(rtype, "")
 
-def _deep_user_prompt(rtype: str, ctx: Dict[str, Any]) -> str:
-    """Build the user prompt for a deep reading, incorporating all astrological context."""
-    # Shared context block used by all reading types
-    context_block = f"""
-Geburtsdaten:
-- Datum: {ctx['bdate_str']} · Tagesabschnitt: {ctx['dpart']}
-- Ort: {ctx['place']} (lat={ctx['lat']}, lon={ctx['lon']}, Zeitzone={ctx['tzname']})
-- Saison / Hemisphäre: {ctx['season']} / {ctx['hemisphere']}
-
-Astrologisches Profil:
-- Sternzeichen (Sonne): {ctx['sun_sign']}
-- Mondphase: {ctx['moon']} (Zyklus: {ctx['moon_frac']:.1%})
-{ctx['swe_line']}
-
-Numerologie:
-- Lebenszahl: {ctx['lifepath']} — {ctx.get('lifepath_arch','')}
-- Geburtstagszahl: {ctx.get('bday_num','–')}
-- Aktueller Zyklus: Persönliches Jahr {ctx.get('personal_year','–')} · Monat {ctx.get('personal_month','–')} · Tag {ctx.get('personal_day','–')}
-
-Symbolische Karten:
-- Chinesisches Tierzeichen: {ctx['cn_animal']} (Jahr {ctx['birth_year']})
-- Keltischer Baum: {ctx['tree']}
-- I-Ging Hexagramm {ctx['hex_idx']} — **{ctx.get('hex_name','')}**: {ctx.get('hex_core','')}
-- Tarot (deterministisch gezogen): **{ctx.get('tarot_name','')}** — {ctx.get('tarot_core','')}
-"""
-
-    instructions = {
-        "blueprint": f"""
-{context_block}
-Erstelle eine tiefgehende Lebensplan-Analyse als JSON:
-{{
+# Aufgaben der Deep Readings (JSON-Schema + Ableitungshinweis) — stabil je
+# Reading-Typ und damit der cachebare Präfix; die Geburtsdaten folgen danach.
+_DEEP_TASKS: Dict[str, str] = {
+    "blueprint": """Erstelle eine tiefgehende Lebensplan-Analyse als JSON:
+{
   "persoenlichkeit": "3-4 Sätze: Kernpersönlichkeit basierend auf Sternzeichen, Lebenszahl und chinesischem Zeichen",
   "staerken": "3-4 verborgene Stärken als Fließtext, poetisch aber klar",
   "schwaechen": "3-4 ehrliche Schwächen/Wachstumsfelder als Fließtext",
   "lebensaufgabe": "Die eine große Lebensaufgabe, 3-4 Sätze, tiefgründig und motivierend",
   "tagesimpuls": "Ein konkreter Impuls für heute (1-2 Sätze, Imperativ)"
-}}
-Leite alles spezifisch aus den Geburtsdaten ab. Keine generischen Phrasen.
-""",
-        "soul_purpose": f"""
-{context_block}
-Erstelle eine Seelenaufgaben-Analyse als JSON:
-{{
+}
+Leite alles spezifisch aus den Geburtsdaten ab. Keine generischen Phrasen.""",
+    "soul_purpose": """Erstelle eine Seelenaufgaben-Analyse als JSON:
+{
   "kernmission": "3-4 Sätze: Die zentrale Lebensaufgabe der Seele",
   "lektionen": "3-4 Sätze: Die wichtigsten Lektionen, die zu lernen sind",
   "weltbeitrag": "3-4 Sätze: Der einzigartige Beitrag für die Welt",
   "alltagsausrichtung": "3 konkrete, sofort umsetzbare Schritte (als Fließtext), um ab heute das Leben auf die Seelenaufgabe auszurichten",
   "affirmation": "Ein kraftvoller Leitsatz (1 Satz)"
-}}
-Leite alles spezifisch aus den Geburtsdaten ab.
-""",
-        "career": f"""
-{context_block}
-Erstelle eine Berufungs-Analyse als JSON:
-{{
+}
+Leite alles spezifisch aus den Geburtsdaten ab.""",
+    "career": """Erstelle eine Berufungs-Analyse als JSON:
+{
   "talente": "3-4 Sätze: Natürliche Talente und Entscheidungsstil",
-  "pfad_1": {{"titel": "Karrierepfad-Name", "beschreibung": "2-3 Sätze warum dieser Pfad ideal ist"}},
-  "pfad_2": {{"titel": "Karrierepfad-Name", "beschreibung": "2-3 Sätze"}},
-  "pfad_3": {{"titel": "Karrierepfad-Name", "beschreibung": "2-3 Sätze"}},
-  "meiden": {{"feld": "Berufsfeld-Name", "grund": "2-3 Sätze warum dieses Feld gemieden werden sollte"}},
+  "pfad_1": {"titel": "Karrierepfad-Name", "beschreibung": "2-3 Sätze warum dieser Pfad ideal ist"},
+  "pfad_2": {"titel": "Karrierepfad-Name", "beschreibung": "2-3 Sätze"},
+  "pfad_3": {"titel": "Karrierepfad-Name", "beschreibung": "2-3 Sätze"},
+  "meiden": {"feld": "Berufsfeld-Name", "grund": "2-3 Sätze warum dieses Feld gemieden werden sollte"},
   "naechster_schritt": "Ein konkreter Schritt für diese Woche (1-2 Sätze)"
-}}
-Leite Talente und Pfade spezifisch aus Sternzeichen, Lebenszahl und chinesischem Zeichen ab.
-""",
-        "relationship": f"""
-{context_block}
-Erstelle eine Beziehungs-Analyse als JSON:
-{{
+}
+Leite Talente und Pfade spezifisch aus Sternzeichen, Lebenszahl und chinesischem Zeichen ab.""",
+    "relationship": """Erstelle eine Beziehungs-Analyse als JSON:
+{
   "liebesstil": "3-4 Sätze: Wie diese Person liebt und geliebt werden möchte",
   "kompatibilitaet": "3-4 Sätze: Welche Sternzeichen/Typen am besten passen und warum",
   "liebeslektionen": "3-4 Sätze: Die wichtigsten Beziehungslektionen",
   "idealer_partner": "3-4 Sätze: Exakte Beschreibung des Partners, der zum höchsten Selbst führt",
   "beziehungsimpuls": "Ein konkreter Impuls für die Partnerschaft oder Partnersuche (1-2 Sätze)"
-}}
-Leite alles aus dem astrologischen Profil ab, besonders Venus-bezogene Aspekte und Mondphase.
-""",
-        "wealth": f"""
-{context_block}
-Erstelle eine Wohlstands-Analyse als JSON:
-{{
+}
+Leite alles aus dem astrologischen Profil ab, besonders Venus-bezogene Aspekte und Mondphase.""",
+    "wealth": """Erstelle eine Wohlstands-Analyse als JSON:
+{
   "geld_persoenlichkeit": "3-4 Sätze: Die natürliche Beziehung zu Geld und Ressourcen",
   "blockaden": "3-4 Sätze: Welche Muster und Fehler finanzielles Wachstum blockieren",
   "wohlstandsstrategie": "3-4 Sätze: Die individuelle Strategie zur Fülle, die zum wahren Selbst passt",
   "chancen_zeitfenster": "2-3 Sätze: Aktuelle kosmische Chancen-Fenster für Wohlstand",
   "geld_ritual": "Ein konkretes tägliches Ritual für Fülle-Bewusstsein (1-2 Sätze)"
-}}
+}
 Keine generischen Finanztipps. Aus dem astrologischen Profil ableiten.
-Hinweis: Dies ist keine Finanzberatung, sondern achtsame Selbstreflexion.
-""",
-        "timeline": f"""
-{context_block}
-Erstelle einen Zukunfts-Zeitstrahl als JSON:
-{{
+Hinweis: Dies ist keine Finanzberatung, sondern achtsame Selbstreflexion.""",
+    "timeline": """Erstelle einen Zukunfts-Zeitstrahl als JSON:
+{
   "vergangene_phase": "3-4 Sätze: Die prägendste Phase der Vergangenheit und was sie gelehrt hat",
   "aktuelle_phase": "3-4 Sätze: Wo die Person gerade steht und welche Energie gerade wirkt",
   "wendepunkt": "2-3 Sätze: Der nächste große Wendepunkt (wann und warum)",
   "jahr_1_2": "3-4 Sätze: Die nächsten 1-2 Jahre – Fokus, Chancen, Herausforderungen",
   "jahr_3_5": "3-4 Sätze: Jahre 3-5 – wohin die Reise geht, Transformation",
   "vision": "Ein kraftvolles Zukunftsbild (2-3 Sätze, poetisch und konkret)"
-}}
-Nutze Saturn-Zyklen, Lebenszahl-Phasen und I-Ging für die Zeitstruktur.
-""",
-        "genius": f"""
-{context_block}
-Erstelle eine Inneres-Genie-Analyse als JSON:
-{{
+}
+Nutze Saturn-Zyklen, Lebenszahl-Phasen und I-Ging für die Zeitstruktur.""",
+    "genius": """Erstelle eine Inneres-Genie-Analyse als JSON:
+{
   "einzigartiges_talent": "3-4 Sätze: Das eine Talent oder die eine Fähigkeit, die diese Person von 99% der Menschen abhebt",
   "warum_dieses_talent": "2-3 Sätze: Warum gerade dieses Talent im astrologischen Profil verankert ist",
-  "schritt_1": {{"titel": "Morgenroutine-Titel", "beschreibung": "2-3 Sätze: Konkreter erster Tagesschritt"}},
-  "schritt_2": {{"titel": "Tagesübung-Titel", "beschreibung": "2-3 Sätze: Konkreter zweiter Schritt"}},
-  "schritt_3": {{"titel": "Abendritual-Titel", "beschreibung": "2-3 Sätze: Konkreter dritter Schritt"}},
+  "schritt_1": {"titel": "Morgenroutine-Titel", "beschreibung": "2-3 Sätze: Konkreter erster Tagesschritt"},
+  "schritt_2": {"titel": "Tagesübung-Titel", "beschreibung": "2-3 Sätze: Konkreter zweiter Schritt"},
+  "schritt_3": {"titel": "Abendritual-Titel", "beschreibung": "2-3 Sätze: Konkreter dritter Schritt"},
   "meisterschafts_vision": "2-3 Sätze: Wie sich Meisterschaft und Anerkennung entfalten werden"
-}}
-Leite das Talent spezifisch aus Sternzeichen + Lebenszahl + chinesischem Zeichen ab.
-""",
-    }
-    return instructions.get(rtype, "")
+}
+Leite das Talent spezifisch aus Sternzeichen + Lebenszahl + chinesischem Zeichen ab.""",
+}
+
+def _deep_context_block(ctx: Dict[str, Any]) -> str:
+    """Geburtsdaten und Symbole — der variable Teil des Deep-Reading-Prompts."""
+    return f"""Geburtsdaten:
+- Datum: {ctx['bdate_str']} · Tagesabschnitt: {ctx['dpart']}
+- Ort: {ctx['place']} (lat={ctx['lat']}, lon={ctx['lon']}, Zeitzone={ctx['tzname']})
+- Saison / Hemisphäre: {ctx['season']} / {ctx['hemisphere']}
+
+Astrologisches Profil:
+- Sternzeichen (Sonne): {ctx['sun_sign']}
+- Mondphase: {ctx['moon']} (Zyklus: {ctx['moon_frac']:.1%})
+{ctx['swe_line']}
+
+Numerologie:
+- Lebenszahl: {ctx['lifepath']} — {ctx.get('lifepath_arch','')}
+- Geburtstagszahl: {ctx.get('bday_num','–')}
+- Aktueller Zyklus: Persönliches Jahr {ctx.get('personal_year','–')} · Monat {ctx.get('personal_month','–')} · Tag {ctx.get('personal_day','–')}
+
+Symbolische Karten:
+- Chinesisches Tierzeichen: {ctx['cn_animal']} (Jahr {ctx['birth_year']})
+- Keltischer Baum: {ctx['tree']}
+- I-Ging Hexagramm {ctx['hex_idx']} — **{ctx.get('hex_name','')}**: {ctx.get('hex_core','')}
+- Tarot (deterministisch gezogen): **{ctx.get('tarot_name','')}** — {ctx.get('tarot_core','')}
+"""
+
+def _deep_task_prompt(rtype: str) -> str:
+    task = _DEEP_TASKS.get(rtype, "")
+    return task + "\nDie Geburtsdaten und Symbole stehen unten." if task else ""
 
 def _deep_section_map() -> Dict[str, List[Dict[str, str]]]:
     """Map reading types to their section definitions (title + JSON key)."""
@@ -1010,6 +2378,23 @@ def _extract_sections(rtype: str, data: Dict[str, Any], why_chips: List[str]) ->
         sections.append({"title": title, "text": text, "chips": chips_for})
     return sections
 
+def _degrade_sections(meta: Dict[str, Any], sections: List["Section"]) -> None:
+    """Überlast (meta.degraded): leer gebliebene Sektionen bekommen einen
+    deterministischen Kurztext aus Tarot, I-Ging, Zahl und Mond."""
+    meta["degraded"] = True
+    mini = meta["mini"]
+    tarot = mini.get("tarot") or {}
+    texts = [
+        f"Die Karte des Zeitraums ist {tarot.get('name')}: {tarot.get('core')}",
+        f"Hexagramm {mini['iChing']} „{mini['iChingName']}“: {mini['iChingCore']}",
+        f"Lebenszahl {mini['lifePath']}{' – ' + mini['lifePathArchetype'] if mini['lifePathArchetype'] else ''}; "
+        f"deine persönliche Tageszahl ist {mini['personalDay']}.",
+        f"Der Mond steht in der Phase „{mini['moonPhase']}“ — richte deine Kraft danach aus.",
+    ]
+    for i, sec in enumerate(sections):
+        if not sec.text:
+            sec.text = texts[i % len(texts)]
+
 # ---------------------------------------------------------------------------
 # Request / Response models
 # ---------------------------------------------------------------------------
@@ -1044,7 +2429,39 @@ class ReadingResponse(BaseModel):
 
 @app.get("/health")
 @app.get("/healthz")
-def health(): return {"ok": True, "provider": LLM_PROVIDER, "model": _llm_id()}
+def health():
+    return {"ok": True, "provider": LLM_PROVIDER, "model": _llm_id(),
+            "breakers": {p: _llm_breaker(p).snapshot() for p in ("openai", "anthropic")
+                         if p == "openai" or _anthropic_client is not None}}
+
+@app.get("/metrics")
+def metrics():
+    """Zähler dieses Workers (Cache-Treffer je Endpoint u. a.)."""
+    return {"llmCache": {
+        "entries": len(_LLM_CACHE), "bytes": _LLM_CACHE.bytes,
+        "endpoints": {ep: dict(c, hitRate=round(c.get("hits", 0) / max(1, sum(c.values())), 3))
+                      for ep, c in sorted(_METRICS.get("llmCache", {}).items())},
+    }, "llmTokens": {  # Provider-Prompt-Cache: Anteil gecachter Input-Tokens
+        ep: dict(c, cachedShare=round(c.get("cached", 0) / max(1, c.get("input", 0)), 3))
+        for ep, c in sorted(_METRICS.get("llmTokens", {}).items())
+    }, "llmHedge": {
+        "enabled": LLM_HEDGE,
+        "p90Ms": {k: round(_percentile(sorted(v), 90) * 1000, 1) for k, v in sorted(_LLM_LATENCY.items())},
+        "endpoints": {ep: dict(c) for ep, c in sorted(_METRICS.get("llmHedge", {}).items())},
+    }, "llmPool": {p: pool.snapshot() for p, pool in sorted(_LLM_POOLS.items())},
+        "readingCache": dict(
+            entries=len(_READING_CACHE.local), mixerStep=CACHE_MIXER_STEP, coordDigits=CACHE_COORD_DIGITS,
+            endpoints={ep: dict(c, hitRate=round((c.get("hits", 0) + c.get("coalesced", 0)) / max(1, sum(c.values())), 3))
+                       for ep, c in sorted(_METRICS.get("readingCache", {}).items())}),
+        "stageCache": {stage: dict(c, entries=len(_OUTLINE_CACHE))
+                       for stage, c in sorted(_METRICS.get("stageCache", {}).items())},
+        "llmBatch": {"windowMs": LLM_MICROBATCH_MS,
+                     "providers": {p: dict(c) for p, c in sorted(_METRICS.get("llmBatch", {}).items())}},
+        "sqliteCache": {t: dict(c) for t, c in sorted(_METRICS.get("sqliteCache", {}).items())},
+        "llmAdmission": dict(
+            _ADMISSIONS["default"][1].snapshot() if "default" in _ADMISSIONS else {},
+            maxInFlight=LLM_ADMIT_MAX_INFLIGHT,
+            endpoints={ep: dict(c) for ep, c in sorted(_METRICS.get("llmAdmission", {}).items())})}
 
 @app.get("/reading-types")
 def reading_types():
@@ -1060,57 +2477,323 @@ def reading_types():
 # This cuts Railway + OpenAI cost dramatically for users who click through
 # Heute → Woche → Monat or refresh the page repeatedly.
 # ---------------------------------------------------------------------------
-import time
 
-_READING_CACHE: Dict[str, tuple] = {}
+# Backend: READING_CACHE_BACKEND=memory (Default) hält die Antworten nur im
+# Prozess — gedeckelt nach Anzahl *und* Bytes (READING_CACHE_MAX_BYTES).
+# Mit READING_CACHE_BACKEND=sqlite liegt dahinter zusätzlich eine SQLite-
+# Datei (READING_CACHE_PATH), die alle uvicorn-Worker und Neustarts teilen:
+# ein Text, den ein Worker bezahlt hat, bekommen alle anderen gratis. Die
+# Datei räumt Abgelaufenes selbst ab und bleibt unter
+# READING_CACHE_DISK_MAX_BYTES.
 _READING_CACHE_TTL = int(os.getenv("READING_CACHE_TTL", "86400"))  # 24 h default
 _READING_CACHE_MAX = int(os.getenv("READING_CACHE_MAX", "512"))
+_READING_CACHE_MAX_BYTES = int(os.getenv("READING_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+READING_CACHE_BACKEND = os.getenv("READING_CACHE_BACKEND", "memory").strip().lower()
+READING_CACHE_PATH = os.getenv("READING_CACHE_PATH", "reading_cache.sqlite3")
+READING_CACHE_DISK_MAX_BYTES = int(os.getenv("READING_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+
+class _ReadingCache:
+    """LRU im Prozess, optional mit geteiltem SQLite-Backend dahinter."""
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int,
+                 shared: Optional[_SqliteKV] = None):
+        self.ttl = ttl
+        self.local = _LRUCache(max_entries, ttl, max_bytes)
+        self.shared = shared
+
+    async def get(self, key: str) -> Optional["ReadingResponse"]:
+        resp = self.local.get(key)
+        if resp is None and self.shared is not None:
+            raw = await self.shared.aget(key)
+            if raw is not None:
+                try:
+                    resp = ReadingResponse.model_validate_json(raw)
+                except ValueError as e:
+                    print(f"reading cache entry unreadable: {e}")
+                    return None
+                self.local.put(key, resp, size=len(raw))
+        return resp
 
-def _cache_key(req: "ReadingRequest") -> str:
-    mixer_items = tuple(sorted((req.mixer or {}).items()))
+    async def put(self, key: str, resp: "ReadingResponse") -> None:
+        raw = resp.model_dump_json()
+        self.local.put(key, resp, size=len(raw))
+        if self.shared is not None:
+            await self.shared.aput(key, raw, self.ttl)
+
+    def clear(self) -> None:
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+_READING_CACHE = _ReadingCache(
+    _READING_CACHE_TTL, _READING_CACHE_MAX, _READING_CACHE_MAX_BYTES,
+    _SqliteKV(READING_CACHE_PATH, "reading_cache", max_bytes=READING_CACHE_DISK_MAX_BYTES)
+    if READING_CACHE_BACKEND == "sqlite" else None)
+
+# Kanonischer Schlüssel: „Berlin“ und „Berlin, Deutschland“, „1.2.1980“ und
+# „01.02.1980“ oder ein Mixer mit 33,4 statt 33,6 % ergeben dasselbe Reading.
+# In den Schlüssel gehen deshalb ISO-Datum und -Zeit, der Ort als auf
+# CACHE_COORD_DIGITS Nachkommastellen gerundete Koordinaten (2 ≈ 1 km; ohne
+# Auflösung der normalisierte Name) und der Mixer in CACHE_MIXER_STEP-
+# Prozentschritten. Gerechnet wird mit genau diesem Mixer und diesen
+# Koordinaten, damit der Text zum Schlüssel passt.
+# Trefferquote alt/neu auf Mitschnitten: scripts/replay_cache_keys.py
+CACHE_MIXER_STEP = max(1, int(os.getenv("CACHE_MIXER_STEP", "5")))
+CACHE_COORD_DIGITS = int(os.getenv("CACHE_COORD_DIGITS", "2"))
+
+def _round_coords(lat: float, lon: float) -> Dict[str, float]:
+    # + 0.0 macht aus -0.0 eine 0.0, sonst gäbe es zwei Schlüssel für den Nullmeridian
+    return {"lat": round(float(lat), CACHE_COORD_DIGITS) + 0.0,
+            "lon": round(float(lon), CACHE_COORD_DIGITS) + 0.0}
+
+def _has_coords(req: "ReadingRequest") -> bool:
+    return bool(req.coords) and req.coords.get("lat") is not None and req.coords.get("lon") is not None
+
+def _canonical_birth(req: "ReadingRequest", coords: Optional[Dict[str, float]]) -> List[str]:
+    """ISO-Datum, Ort und ISO-Zeit für Cache-Schlüssel. `coords` ist der
+    aufgelöste Geburtsort, falls der Request selbst keine Koordinaten
+    mitbringt; ohne beides zählt der normalisierte Ortsname."""
+    bdate = parse_birth_date(req.birthDate)
+    btime = parse_birth_time(req.birthTime)
+    if _has_coords(req):
+        coords = _round_coords(req.coords["lat"], req.coords["lon"])
+    place = (f"@{coords['lat']:.{CACHE_COORD_DIGITS}f},{coords['lon']:.{CACHE_COORD_DIGITS}f}"
+             if coords else _gazetteer_norm(req.birthPlace))
+    return [bdate.isoformat() if bdate else (req.birthDate or "").strip(),
+            place,
+            btime.strftime("%H:%M") if btime else ""]
+
+def _cache_key(req: "ReadingRequest", coords: Optional[Dict[str, float]] = None) -> str:
+    """Schlüssel aus den kanonischen Eingaben (siehe _canonical_birth)."""
+    mixer = _quantize_mixer(_normalize_mixer(req.mixer), CACHE_MIXER_STEP) if req.mixer else {}
     return "|".join([
-        (req.birthDate or "").strip(),
-        (req.birthPlace or "").strip().lower(),
-        (req.birthTime or "").strip(),
+        *_canonical_birth(req, coords),
         (req.approxDaypart or "").strip().lower(),
         (req.period or "day").strip().lower(),
         (req.tone or "").strip().lower(),
         (req.readingType or "classic").strip().lower(),
         str(req.seed or ""),
-        repr(mixer_items),
+        json.dumps(mixer, sort_keys=True),
         _period_bucket(req.period),
         _llm_id(),  # Provider-Wechsel darf keine gecachten Fremdtexte liefern
     ])
 
-def _cache_get(key: str):
-    entry = _READING_CACHE.get(key)
-    if not entry:
-        return None
-    ts, resp = entry
-    if (time.time() - ts) > _READING_CACHE_TTL:
-        _READING_CACHE.pop(key, None)
-        return None
-    return resp
+def _form_seed(s: str) -> int:
+    """stableSeed() aus src/main.ts: FNV-1a über UTF-16-Einheiten, 32 Bit."""
+    h = 2166136261
+    raw = s.encode("utf-16-le")
+    for i in range(0, len(raw), 2):
+        h = ((h ^ (raw[i] | raw[i + 1] << 8)) * 16777619) & 0xFFFFFFFF
+    return h
+
+def _is_form_seed(req: "ReadingRequest") -> bool:
+    """Kommt der Seed vom Web-Formular? Das hasht die rohen Eingaben
+    (Datum wie getippt, ggf. ISO aus dem Datumsfeld, und den Ort)."""
+    place = (req.birthPlace or "").strip()
+    dates = {(req.birthDate or "").strip()}
+    bdate = parse_birth_date(req.birthDate)
+    if bdate:
+        dates.add(bdate.isoformat())
+    return any(req.seed == _form_seed(f"{d}|{place}") for d in dates)
+
+async def _canonical_reading(req: "ReadingRequest") -> Tuple["ReadingRequest", str]:
+    """Request mit quantisiertem Mixer und gerundeten Koordinaten plus
+    dessen Cache-Key. Ohne Koordinaten löst geocode() den Ort auf — meist
+    aus Gazetteer oder Cache; denselben Treffer nutzt danach die Rechnung.
+    Ein Seed des Web-Formulars ist nur ein Hash der rohen Eingaben und
+    würde jede Schreibweise zu einem eigenen Reading machen; er wird aus
+    den kanonischen Geburtsdaten neu abgeleitet. Eigene Seeds bleiben."""
+    update: Dict[str, Any] = {}
+    coords = None
+    if req.mixer:
+        update["mixer"] = _quantize_mixer(_normalize_mixer(req.mixer), CACHE_MIXER_STEP)
+    if _has_coords(req):
+        update["coords"] = _round_coords(req.coords["lat"], req.coords["lon"])
+    elif (req.birthPlace or "").strip():
+        geo = await geocode(req.birthPlace)
+        if geo:
+            coords = _round_coords(geo["lat"], geo["lon"])
+    if req.seed is not None and _is_form_seed(req):
+        update["seed"] = _det_hash(*_canonical_birth(req, coords))
+    canon = req.model_copy(update=update) if update else req
+    return canon, _cache_key(canon, coords)
+
+def _reading_for(req: "ReadingRequest", resp: "ReadingResponse", marker: str) -> "ReadingResponse":
+    """Geteiltes Reading (Cache-Treffer oder mitgenommen) für diesen Aufrufer:
+    Der Text gehört dem kanonischen Schlüssel, Datum, Ort und Zeit im Echo
+    bleiben so, wie er sie eingegeben hat."""
+    meta = dict(resp.meta, birthDate=req.birthDate, birthPlace=req.birthPlace, birthTime=req.birthTime)
+    meta[marker] = True
+    chips = [f"Ort {req.birthPlace or 'unbekannt'}" if c.startswith("Ort ") else c for c in resp.chips]
+    return ReadingResponse(meta=meta, sections=resp.sections, chips=chips, disclaimer=resp.disclaimer)
+
+async def _cache_get(key: str):
+    return await _READING_CACHE.get(key)
+
+async def _cache_put(key: str, resp) -> None:
+    await _READING_CACHE.put(key, resp)
+
+# Outline-Stufe (classic/serial) mit eigenem Cache: Die Outline hängt nur an
+# Geburtsdaten, Zeitraum und grob am Mixer, nicht am Ton — der steckt erst im
+# Langtext. Wer dasselbe Reading in einem anderen Ton oder mit leicht
+# verschobenem Mixer-Regler neu anfordert, bezahlt so einen Call statt zwei.
+# Der Mixer geht in OUTLINE_MIXER_STEP-Prozentschritten in Schlüssel und
+# Outline-Prompt ein; der Langtext bekommt weiterhin den exakten Mixer.
+# Die Tabelle in READING_CACHE_PATH bekommt ein Viertel des Byte-Budgets der
+# Readings dazu (Outlines sind deutlich kürzer).
+OUTLINE_MIXER_STEP = max(1, int(os.getenv("OUTLINE_MIXER_STEP", "10")))
+_OUTLINE_CACHE = _LRUCache(_READING_CACHE_MAX, _READING_CACHE_TTL, 8 * 1024 * 1024)
+_OUTLINE_SHARED: Optional[_SqliteKV] = (
+    _SqliteKV(READING_CACHE_PATH, "outline_cache", max_bytes=READING_CACHE_DISK_MAX_BYTES // 4)
+    if READING_CACHE_BACKEND == "sqlite" else None)
+
+def _quantize_mixer(mixer: Dict[str, int], step: int) -> Dict[str, int]:
+    """Normalisierten Mixer auf Vielfache von `step` runden, Summe bleibt 100
+    (größter Rest zuerst, wie _normalize_mixer)."""
+    units = 100 // step
+    scaled = {k: v * units / 100 for k, v in mixer.items()}
+    floored = {k: int(v) for k, v in scaled.items()}
+    for k, _ in sorted(scaled.items(), key=lambda kv: kv[1] - int(kv[1]), reverse=True)[:units - sum(floored.values())]:
+        floored[k] += 1
+    return {k: v * step for k, v in floored.items()}
+
+def _outline_key(req: "ReadingRequest", mixer: Dict[str, int],
+                 coords: Optional[Dict[str, float]] = None) -> str:
+    """Wie _cache_key, nur ohne Ton. Die Outline trägt Aszendent und Häuser
+    des Orts — ohne Koordinaten im Schlüssel teilten sich alle Requests
+    ohne Ortsnamen eine Outline."""
+    return "|".join([
+        *_canonical_birth(req, coords),
+        (req.approxDaypart or "").strip().lower(),
+        (req.period or "day").strip().lower(),
+        str(req.seed or ""),
+        json.dumps(mixer, sort_keys=True),
+        _period_bucket(req.period),
+        _llm_id(),
+    ])
 
-def _cache_put(key: str, resp) -> None:
-    # Evict oldest entry if we reach the cap.
-    if len(_READING_CACHE) >= _READING_CACHE_MAX:
-        oldest_key = min(_READING_CACHE.items(), key=lambda kv: kv[1][0])[0]
-        _READING_CACHE.pop(oldest_key, None)
-    _READING_CACHE[key] = (time.time(), resp)
+async def _outline_get(key: str) -> Optional[Dict[str, Any]]:
+    outline = _OUTLINE_CACHE.get(key)
+    if outline is None and _OUTLINE_SHARED is not None:
+        raw = await _OUTLINE_SHARED.aget(key)
+        if raw is not None:
+            outline = json.loads(raw)
+            _OUTLINE_CACHE.put(key, outline, size=len(raw))
+    _count("stageCache", "outline", "misses" if outline is None else "hits")
+    return outline
+
+async def _outline_put(key: str, outline: Dict[str, Any]) -> None:
+    raw = json.dumps(outline, ensure_ascii=False)
+    _OUTLINE_CACHE.put(key, outline, size=len(raw))
+    if _OUTLINE_SHARED is not None:
+        await _OUTLINE_SHARED.aput(key, raw, _READING_CACHE_TTL)
+
+
+# Classic-Pipeline (CLASSIC_PIPELINE):
+#   serial   — Outline-JSON, danach Langtext aus der Outline (2 Calls hintereinander)
+#   sections — die vier Sektionen als vier parallele Calls
+#   single   — Outline und Prosa in einem Call
+# Vergleich: scripts/bench_classic_pipeline.py
+CLASSIC_PIPELINE = os.getenv("CLASSIC_PIPELINE", "serial").strip().lower()
+_CLASSIC_SECTIONS = {
+    "fokus": "Fokus – das Leitthema des Zeitraums",
+    "beruf": "Beruf – Arbeit und Alltag",
+    "liebe": "Liebe – Beziehungen und Nähe",
+    "energie": "Energie – Kraft, Körper, Rhythmus",
+}
 
+# Stabile Aufgabenteile der Classic-Prompts (Prompt-Cache, s. _voice_system).
+# Der Ton steckt im System-Prompt; Rahmendaten, Mixer und Outline folgen als
+# variabler Rest.
+_CLASSIC_OUTLINE_TASK = """Du bist ein sachlicher, klarer Berater. Erstelle eine OUTLINE als JSON (keinen Fließtext).
+Struktur:
+{
+ "fokus": {"kern":"...", "punkte":["...","...","..."]},
+ "beruf": {"kern":"...", "punkte":["...","...","..."]},
+ "liebe": {"kern":"...", "punkte":["...","...","..."]},
+ "energie": {"kern":"...", "punkte":["...","...","..."]}
+}
+
+Regeln:
+- Pro Bereich 3–4 Stichpunkte, direkt aus den Rahmendaten abgeleitet.
+- Die Traditions-Gewichtung unten entscheidet, welche Symbolsprache dominiert.
+  Nenne hoch gewichtete Symbole BEIM NAMEN (z. B. „Hexagramm 42 – Die Mehrung", „Der Eremit").
+- Letzter Stichpunkt = ultra-kurze Mini-Aktion (imperativ, 1 Satz) ohne „Aktion:"-Prefix.
+- Keine medizinisch/juristisch/finanziell heiklen Ratschläge."""
+
+_CLASSIC_WRITING_TASK = """Formuliere aus der OUTLINE (ganz unten) ein Horoskop mit 3–4 Sätzen je Sektion.
+Integriere die Mini-Aktion organisch in den Absatz. Keine Bullet-Listen.
+Gib nur JSON:
+{
+ "fokus": "Absatz",
+ "beruf": "Absatz",
+ "liebe": "Absatz",
+ "energie": "Absatz"
+}"""
+
+_CLASSIC_SECTION_TASK = """Schreibe NUR den Abschnitt eines Horoskops, der ganz unten genannt ist: 3–4 Sätze Fließtext.
+Die übrigen Abschnitte schreibt jemand anderes — bleib bei deinem Thema.
+
+Regeln:
+- Aussagen direkt aus dem Kontext ableiten; die Traditions-Gewichtung entscheidet,
+  welche Symbolsprache dominiert. Hoch gewichtete Symbole BEIM NAMEN nennen.
+- Eine ultra-kurze Mini-Aktion (imperativ, 1 Satz) organisch in den Absatz einbauen.
+- Keine Bullet-Listen, keine medizinisch/juristisch/finanziell heiklen Ratschläge."""
+
+_CLASSIC_SINGLE_TASK = """Schreibe ein Horoskop mit vier Sektionen (fokus, beruf, liebe, energie), je 3–4 Sätze.
+Gehe intern in zwei Schritten vor: leite erst pro Bereich 3–4 Kernpunkte aus dem
+Kontext ab, formuliere dann daraus den Absatz. Gib NUR die Absätze aus.
+
+Regeln:
+- Die Traditions-Gewichtung entscheidet, welche Symbolsprache dominiert.
+  Nenne hoch gewichtete Symbole BEIM NAMEN (z. B. „Hexagramm 42 – Die Mehrung", „Der Eremit").
+- Jede Sektion endet mit einer ultra-kurzen Mini-Aktion (imperativ, 1 Satz), organisch im Absatz.
+- Keine Bullet-Listen, keine medizinisch/juristisch/finanziell heiklen Ratschläge.
+
+Gib nur JSON:
+{
+ "fokus": "Absatz",
+ "beruf": "Absatz",
+ "liebe": "Absatz",
+ "energie": "Absatz"
+}"""
+
+# Laufende Readings je Cache-Key: Doppel-Tap auf „Heute“ oder ein geteilter
+# Link, den viele gleichzeitig öffnen, verpassen den Cache im selben Moment —
+# statt N-mal die LLM-Pipeline zu starten, warten alle auf die erste.
+_READING_INFLIGHT: Dict[str, "asyncio.Future"] = {}
 
 async def _reading_impl(req: ReadingRequest):
-  try:
-    # Cache short-circuit — identical inputs within the same period bucket
-    # get the same response without hitting OpenAI or Nominatim.
-    ckey = _cache_key(req)
-    cached = _cache_get(ckey)
+    # Cache short-circuit — equivalent inputs within the same period bucket
+    # get the same response without hitting OpenAI.
+    canon, ckey = await _canonical_reading(req)
+    cached = await _cache_get(ckey)
     if cached is not None:
-        meta = dict(cached.meta)
-        meta["cacheHit"] = True
-        return ReadingResponse(meta=meta, sections=cached.sections, chips=cached.chips, disclaimer=cached.disclaimer)
+        _count("readingCache", "reading", "hits")
+        return _reading_for(req, cached, "cacheHit")
+
+    pending, joined = _single_flight(_READING_INFLIGHT, ckey, lambda: _reading_compute(canon, ckey))
+    _count("readingCache", "reading", "coalesced" if joined else "misses")
+    resp = await pending
+    if joined:
+        return _reading_for(req, resp, "coalesced")
+    return resp
 
+@_with_llm_deadline(lambda: READING_DEADLINE_SECONDS)
+async def _reading_compute(req: ReadingRequest, ckey: str,
+                           emit: Optional[Callable[[str, dict], None]] = None,
+                           pipeline: Optional[str] = None):
+  """Rechnet ein Reading. Mit `emit` (für /reading/stream) gehen `meta` und
+  jede fertige Sektion schon unterwegs raus; `pipeline` überschreibt
+  CLASSIC_PIPELINE."""
+  streamed: set = set()
+
+  def _emit_section(i: int, sec: "Section") -> None:
+      if emit is not None and i not in streamed:
+          streamed.add(i)
+          emit("section", {"index": i, **sec.model_dump()})
+
+  try:
     bdate=parse_birth_date(req.birthDate) or dt.date.today()
     btime=parse_birth_time(req.birthTime)
     dpart=(req.approxDaypart or daypart_from_time(btime)).lower()
@@ -1197,20 +2880,42 @@ async def _reading_impl(req: ReadingRequest):
         },
         "swiss": swe_data,
     }
+    if rtype == "classic":
+        pipeline = pipeline or CLASSIC_PIPELINE
+        pipeline = pipeline if pipeline in ("sections", "single") else "serial"
+        meta["pipeline"] = pipeline
+    if emit is not None:
+        emit("meta", {"meta": meta, "chips": why_chips, "disclaimer": disclaimer})
 
     # --- Classic reading (original 4-section flow) ---
     if rtype == "classic":
-        outline_prompt=f"""
-Du bist ein sachlicher, klarer Berater. Erstelle eine OUTLINE als JSON (keinen Fließtext).
-Struktur:
-{{
- "fokus": {{"kern":"...", "punkte":["...","...","..."]}},
- "beruf": {{"kern":"...", "punkte":["...","...","..."]}},
- "liebe": {{"kern":"...", "punkte":["...","...","..."]}},
- "energie": {{"kern":"...", "punkte":["...","...","..."]}}
-}}
-
-Rahmendaten:
+        # Distribute mixer chips across sections (#8): each section gets the
+        # dominant tradition's chip plus one section-specific signal. The two
+        # top traditions also appear on the header via the meta.activeMixer
+        # rendering, so the user sees both a global and per-section view.
+        sorted_mix = sorted(active_mixer.items(), key=lambda kv: kv[1], reverse=True)
+        top1 = sorted_mix[0] if sorted_mix else None
+        top2 = sorted_mix[1] if len(sorted_mix) > 1 else None
+        top1_chip = f"{_MIXER_LABELS[top1[0]]} {top1[1]}%" if top1 and top1[1] > 0 else None
+        top2_chip = f"{_MIXER_LABELS[top2[0]]} {top2[1]}%" if top2 and top2[1] > 0 else None
+
+        def _sec_chips(base: List[str]) -> List[str]:
+            return [c for c in base + [top1_chip] if c]
+
+        section_head = {
+            "fokus":   ("Fokus",   _sec_chips([why_chips[0], why_chips[1], f"Saison: {season}"])),
+            "beruf":   ("Beruf",   _sec_chips([f"Lebenszahl {lifepath}", f"P-Jahr {personal_year}"])),
+            "liebe":   ("Liebe",   _sec_chips([f"Mondphase: {moon}", f"Tarot: {tarot['name']}"] + ([top2_chip] if top2_chip else []))),
+            "energie": ("Energie", _sec_chips([f"Tag/Nacht: {dpart}", f"I-Ging: {hex_name}" if hex_name else ""])),
+        }
+
+        def _classic_section(key: str, text: Any) -> Section:
+            title, chips = section_head[key]
+            return Section(title=title, text=(text or "").strip(), chips=list(chips))
+
+        outline_mixer = _quantize_mixer(active_mixer, OUTLINE_MIXER_STEP)
+        outline_mixer_block = _mixer_directive(outline_mixer)
+        outline_prompt=f"""Rahmendaten:
 - Zeitraum: {req.period}
 - Ort: {resolved_place or req.birthPlace} → lat={lat}, lon={lon}, Zeitzone={tzname}
 - Datum: {bdate.strftime('%d.%m.%Y')} · Tagesabschnitt: {dpart}
@@ -1224,33 +2929,9 @@ Symbole der Traditionen (nutze nur, was laut Mixer hoch gewichtet ist):
 - Chinesisches Tierkreiszeichen: {cn_animal}
 - Keltischer Baumkreis: {tree}
 
-{mixer_block}
-
-Ton-Vorgabe: {tone_block}
-
-Regeln:
-- Pro Bereich 3–4 Stichpunkte, direkt aus den Rahmendaten abgeleitet.
-- Die Traditions-Gewichtung oben entscheidet, welche Symbolsprache dominiert.
-  Nenne hoch gewichtete Symbole BEIM NAMEN (z. B. „Hexagramm 42 – Die Mehrung", „Der Eremit").
-- Letzter Stichpunkt = ultra-kurze Mini-Aktion (imperativ, 1 Satz) ohne „Aktion:"-Prefix.
-- Keine medizinisch/juristisch/finanziell heiklen Ratschläge.
+{outline_mixer_block}
 """
-        try:
-            outline_raw=oa_text(outline_prompt, seed=req.seed, temperature=0.4)
-            outline=try_load_json(outline_raw)
-        except Exception as e:
-            outline={"fokus":{"kern":"","punkte":[]}, "error":str(e)}
-
-        writing_prompt=f"""
-Formuliere aus der OUTLINE ein Horoskop mit 3–4 Sätzen je Sektion.
-
-Ton-Vorgabe: {tone_block}
-
-Integriere die Mini-Aktion organisch in den Absatz. Keine Bullet-Listen.
-
-{mixer_block}
-
-Kontext (nur nutzen, nicht erneut aufzählen):
+        context_block=f"""Kontext (nur nutzen, nicht erneut aufzählen):
 - Zeitraum: {req.period} · Ort: {resolved_place or req.birthPlace} (Zeitzone {tzname})
 - Saison/Hemisphäre: {season} / {hemisphere}
 - Sonne≈{sun_sign}, Mondphase {moon}, Tagesabschnitt {dpart}.
@@ -1258,51 +2939,86 @@ Kontext (nur nutzen, nicht erneut aufzählen):
 - Tarot: **{tarot['name']}** — {tarot['core']}.
 - I-Ging: Hexagramm {hex_idx} — **{hex_name}**: {hex_core}.
 - Chinesisch {cn_animal}, Keltischer Baum {tree}.
-- Swiss-Ephemeris: {swe_line}.
+- Swiss-Ephemeris: {swe_line}."""
+
+        if pipeline == "serial":
+            okey = _outline_key(req, outline_mixer, None if lat is None else _round_coords(lat, lon))
+            outline = await _outline_get(okey)
+            if outline is None:
+                try:
+                    # Ohne Ton: dieselbe Outline trägt jeden Ton-Regler.
+                    outline_raw=await oa_text(outline_prompt, seed=req.seed, temperature=0.4, endpoint="reading_outline",
+                                              prefix=_CLASSIC_OUTLINE_TASK)
+                    outline=try_load_json(outline_raw)
+                    if all(isinstance(outline.get(k), dict) for k in _CLASSIC_SECTIONS):
+                        await _outline_put(okey, outline)
+                except Exception as e:
+                    outline={"fokus":{"kern":"","punkte":[]}, "error":str(e)}
+
+            writing_prompt=f"""{mixer_block}
+
+{context_block}
 
 OUTLINE:
 ```json
 {json.dumps(outline, ensure_ascii=False, indent=2)}
 ```
+"""
+            try:
+                longform_raw=await oa_text(writing_prompt, seed=req.seed, temperature=0.8, endpoint="reading_longform",
+                                           prefix=_CLASSIC_WRITING_TASK, tone=req.tone)
+                data=try_load_json(longform_raw)
+            except Exception as e:
+                data={"fokus":"","beruf":"","liebe":"","energie":"","error":str(e)}
+
+        elif pipeline == "sections":
+            # Vier unabhängige Calls, parallel: Latenz ≈ ein kurzer Absatz
+            # statt Outline + kompletter Langtext hintereinander.
+            # Aufgabe, Mixer und Kontext sind für alle vier gleich; nur die
+            # letzte Zeile nennt den Abschnitt.
+            def _section_prompt(key: str) -> str:
+                return f"""{mixer_block}
+
+{context_block}
+
+Dein Abschnitt: „{_CLASSIC_SECTIONS[key]}“ (die übrigen: {", ".join(k for k in _CLASSIC_SECTIONS if k != key)}).
 Gib nur JSON:
-{{
- "fokus": "Absatz",
- "beruf": "Absatz",
- "liebe": "Absatz",
- "energie": "Absatz"
-}}
+{{"{key}": "Absatz"}}
 """
-        try:
-            longform_raw=oa_text(writing_prompt, seed=req.seed, temperature=0.8)
-            data=try_load_json(longform_raw)
-        except Exception as e:
-            data={"fokus":"","beruf":"","liebe":"","energie":"","error":str(e)}
+            data = {}
 
-        # Distribute mixer chips across sections (#8): each section gets the
-        # dominant tradition's chip plus one section-specific signal. The two
-        # top traditions also appear on the header via the meta.activeMixer
-        # rendering, so the user sees both a global and per-section view.
-        sorted_mix = sorted(active_mixer.items(), key=lambda kv: kv[1], reverse=True)
-        top1 = sorted_mix[0] if sorted_mix else None
-        top2 = sorted_mix[1] if len(sorted_mix) > 1 else None
-        top1_chip = f"{_MIXER_LABELS[top1[0]]} {top1[1]}%" if top1 and top1[1] > 0 else None
-        top2_chip = f"{_MIXER_LABELS[top2[0]]} {top2[1]}%" if top2 and top2[1] > 0 else None
+            async def _one_section(i: int, key: str) -> None:
+                try:
+                    part = try_load_json(await oa_text(_section_prompt(key), seed=req.seed, temperature=0.8,
+                                                       endpoint="reading_section", prefix=_CLASSIC_SECTION_TASK,
+                                                       tone=req.tone))
+                    data[key] = (part.get(key) or part.get("raw") or "") if isinstance(part, dict) else ""
+                except Exception as e:
+                    data[key] = ""
+                    data["error"] = str(e)
+                _emit_section(i, _classic_section(key, data[key]))
 
-        def _sec_chips(base: List[str]) -> List[str]:
-            return [c for c in base + [top1_chip] if c]
+            await asyncio.gather(*(_one_section(i, k) for i, k in enumerate(_CLASSIC_SECTIONS)))
+
+        else:  # single: Outline und Prosa in einem Call
+            single_prompt=f"""{mixer_block}
 
-        sections=[
-            Section(title="Fokus",  text=(data.get("fokus")  or "").strip(),
-                    chips=_sec_chips([why_chips[0], why_chips[1], f"Saison: {season}"])),
-            Section(title="Beruf",  text=(data.get("beruf")  or "").strip(),
-                    chips=_sec_chips([f"Lebenszahl {lifepath}", f"P-Jahr {personal_year}"])),
-            Section(title="Liebe",  text=(data.get("liebe")  or "").strip(),
-                    chips=_sec_chips([f"Mondphase: {moon}", f"Tarot: {tarot['name']}"] + ([top2_chip] if top2_chip else []))),
-            Section(title="Energie",text=(data.get("energie") or "").strip(),
-                    chips=_sec_chips([f"Tag/Nacht: {dpart}", f"I-Ging: {hex_name}" if hex_name else ""])),
-        ]
+{context_block}
+"""
+            try:
+                data=try_load_json(await oa_text(single_prompt, seed=req.seed, temperature=0.8, endpoint="reading_single",
+                                                 prefix=_CLASSIC_SINGLE_TASK, tone=req.tone))
+            except Exception as e:
+                data={"fokus":"","beruf":"","liebe":"","energie":"","error":str(e)}
+
+        sections=[_classic_section(key, data.get(key)) for key in section_head]
+        if _llm_degraded():
+            _degrade_sections(meta, sections)
+        for i, sec in enumerate(sections):
+            _emit_section(i, sec)
         resp = ReadingResponse(meta=meta, sections=sections, chips=why_chips, disclaimer=disclaimer)
-        _cache_put(ckey, resp)
+        if not meta.get("degraded"):  # Überlast-Text nicht für 24 h festschreiben
+            await _cache_put(ckey, resp)
         return resp
 
     # --- Deep readings (7 specialized types) ---
@@ -1328,19 +3044,22 @@ Gib nur JSON:
                      else "- (Keine exakte Geburtszeit → keine Häuser/Aszendent-Berechnung)"),
     }
 
-    system_prompt = (_deep_system_prompt(rtype) + "\n\nTon-Vorgabe: " + tone_block
+    # Stabil vorn (Reading-Typ, Stimme, Sprache, dann Ton), variabel hinten.
+    system_prompt = (_deep_system_prompt(rtype)
                      + "\n\nStimme: wie der Rat einer guten Freundin — warm, direkt, "
                        "auf Augenhöhe, in Du-Form, alltagsnah statt kosmisch. Impulse "
                        "klein und konkret genug für heute."
                        "\n\nSprache: fehlerfreies, natürliches Deutsch; ausschließlich "
                        "existierende Wörter — keine Wortneuschöpfungen oder erfundenen "
-                       "Adjektive. Im Zweifel das einfache, gebräuchliche Wort.")
-    user_prompt = _deep_user_prompt(rtype, ctx)
+                       "Adjektive. Im Zweifel das einfache, gebräuchliche Wort."
+                     + "\n\nTon-Vorgabe: " + tone_block)
+    user_prompt = _deep_context_block(ctx)
     if mixer_block:
         user_prompt = mixer_block + "\n\n" + user_prompt
 
     try:
-        raw = llm_text(system_prompt, user_prompt, temperature=0.7, seed=req.seed)
+        raw = await llm_text(system_prompt, user_prompt, temperature=0.7, seed=req.seed,
+                             endpoint="reading_deep", prefix=_deep_task_prompt(rtype))
         data = try_load_json(raw)
     except Exception as e:
         print(f"deep reading LLM failed ({_llm_id()}): {e}")
@@ -1368,9 +3087,14 @@ Gib nur JSON:
             if c and c not in have:
                 s.chips.append(c)
                 have.add(c)
+    if _llm_degraded():
+        _degrade_sections(meta, sections)
+    for i, sec in enumerate(sections):
+        _emit_section(i, sec)
 
     resp = ReadingResponse(meta=meta, sections=sections, chips=why_chips, disclaimer=disclaimer)
-    _cache_put(ckey, resp)
+    if not meta.get("degraded"):
+        await _cache_put(ckey, resp)
     return resp
   except Exception as exc:
     # Never return 500 — always give the frontend a usable response
@@ -1382,6 +3106,54 @@ Gib nur JSON:
         chips=[], disclaimer=fallback_disclaimer,
     )
 
+def _sse(event: str, payload: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+async def _reading_stream_events(req: ReadingRequest):
+    """Server-Sent Events für /reading/stream.
+
+    `meta` (alle deterministischen Daten) geht sofort raus, danach je eine
+    `section`, sobald sie fertig ist, zum Schluss `done` mit der kompletten
+    ReadingResponse — dieselbe, die /reading liefern würde und die im Cache
+    landet. Classic-Readings laufen hier immer als `sections`-Pipeline,
+    weil nur die ihre Sektionen einzeln fertig bekommt.
+    """
+    canon, ckey = await _canonical_reading(req)
+    resp = await _cache_get(ckey)
+    marker = "cacheHit"
+    if resp is None:
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def _compute():
+            try:
+                return await _reading_compute(canon, ckey, pipeline="sections",
+                                              emit=lambda ev, data: queue.put_nowait((ev, data)))
+            finally:
+                queue.put_nowait(None)
+
+        pending, joined = _single_flight(_READING_INFLIGHT, ckey, _compute)
+        _count("readingCache", "stream", "coalesced" if joined else "misses")
+        if not joined:
+            # Läuft als eigener Task: bricht der Client ab, wird trotzdem
+            # fertig gerechnet und gecacht.
+            while (item := await queue.get()) is not None:
+                yield _sse(*item)
+            yield _sse("done", (await pending).model_dump())
+            return
+        resp, marker = await pending, "coalesced"
+    else:
+        _count("readingCache", "stream", "hits")
+
+    resp = _reading_for(req, resp, marker)
+    yield _sse("meta", {"meta": resp.meta, "chips": resp.chips, "disclaimer": resp.disclaimer})
+    for i, sec in enumerate(resp.sections):
+        yield _sse("section", {"index": i, **sec.model_dump()})
+    yield _sse("done", resp.model_dump())
+
+def _reading_stream_response(req: ReadingRequest) -> StreamingResponse:
+    return StreamingResponse(_reading_stream_events(req), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # Run: uvicorn main:app --host 0.0.0.0 --port 8080
 
 # Öffentliche Routen mit optionalem Rate-Limiting. Slowapi erwartet ein
@@ -1397,6 +3169,11 @@ if _HAS_SLOWAPI and limiter is not None:
     @limiter.limit(READING_RATE_LIMIT)
     async def readings_alias(request: Request, req: ReadingRequest = Body(...)):
         return await _reading_impl(req)
+
+    @app.post("/reading/stream")
+    @limiter.limit(READING_RATE_LIMIT)
+    async def reading_stream(request: Request, req: ReadingRequest = Body(...)):
+        return _reading_stream_response(req)
 else:
     @app.post("/reading")
     async def reading(req: ReadingRequest = Body(...)):
@@ -1406,6 +3183,286 @@ else:
     async def readings_alias(req: ReadingRequest = Body(...)):
         return await _reading_impl(req)
 
+    @app.post("/reading/stream")
+    async def reading_stream(req: ReadingRequest = Body(...)):
+        return _reading_stream_response(req)
+
+
+# ---------------------------------------------------------------------------
+# Reading-Jobs: POST /reading/jobs antwortet sofort mit einer Job-ID (und
+# `meta`, sobald die deterministischen Daten stehen); das Reading rechnet
+# ein begrenzter Worker-Pool fertig. GET /reading/jobs/{id}?wait=20 pollt
+# bzw. wartet als Long-Poll auf das fertige ReadingResponse, das wie bei
+# /reading im Reading-Cache landet. Die Job-ID hängt am Cache-Key: schickt
+# ein Handy nach dem Funkloch denselben POST noch einmal, landet es beim
+# selben Job, statt ein zweites Reading zu bezahlen.
+#
+# Die Jobs liegen in SQLite (READING_JOBS_PATH); Worker holen sie sich per
+# atomarem UPDATE … RETURNING, auch über Prozesse hinweg. Im Web-Prozess
+# laufen READING_JOB_WORKERS davon (Default 4); mit 0 rechnet nur ein
+# eigener Prozess (scripts/reading_worker.py) — nur auf demselben Host bzw.
+# Volume, weil Jobs und Cache SQLite-Dateien sind, und mit
+# READING_CACHE_BACKEND=sqlite, damit beide denselben Cache sehen.
+# ---------------------------------------------------------------------------
+READING_JOBS_PATH = os.getenv("READING_JOBS_PATH", "reading_jobs.sqlite3")
+READING_JOB_WORKERS = int(os.getenv("READING_JOB_WORKERS", "4"))
+READING_JOBS_TTL = int(os.getenv("READING_JOBS_TTL", "3600"))
+READING_JOBS_MAX_QUEUED = int(os.getenv("READING_JOBS_MAX_QUEUED", "500"))
+_JOB_POLL_SECONDS = 0.5  # Takt, in dem Wartende Jobs anderer Prozesse sehen
+_JOB_META_WAIT = 2.0     # so lange wartet der POST auf `meta`
+_JOB_MAX_WAIT = 30.0     # längster Long-Poll
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+class _JobStore:
+    """Reading-Jobs in SQLite (WAL): queued → running → done | failed.
+
+    Die Methoden blockieren (busy timeout 5 s); Worker und Routen rufen sie
+    per asyncio.to_thread auf, das Lock serialisiert die eine Verbindung.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS reading_jobs "
+                         "(id TEXT PRIMARY KEY, request TEXT NOT NULL, status TEXT NOT NULL, "
+                         "meta TEXT, result TEXT, owner TEXT, claimed REAL, "
+                         "created REAL NOT NULL, updated REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS reading_jobs_queue ON reading_jobs (status, created)")
+            self._conn = conn
+        return self._conn
+
+    def _one(self, sql: str, params: tuple = ()) -> Optional[tuple]:
+        """Eine Anweisung unter dem Lock, erste Ergebniszeile (oder None)."""
+        with self._lock:
+            return self._db().execute(sql, params).fetchone()
+
+    def submit(self, job_id: str, request: str) -> None:
+        """Legt den Job an; ein bestehender bleibt, wie er ist — außer er ist
+        gescheitert, abgelaufen oder fertig, aber sein Ergebnis nicht mehr im
+        Reading-Cache (submit kommt nur bei einem Cache-Fehlschlag), dann
+        startet er neu."""
+        now = time.time()
+        self._one("DELETE FROM reading_jobs WHERE updated < ? AND status != 'running'",
+                  (now - READING_JOBS_TTL,))
+        self._one(
+            "INSERT INTO reading_jobs (id, request, status, created, updated) VALUES (?, ?, 'queued', ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET request = excluded.request, status = 'queued', meta = NULL, "
+            "result = NULL, owner = NULL, claimed = NULL, created = excluded.created, updated = excluded.updated "
+            "WHERE reading_jobs.status IN ('failed', 'done')", (job_id, request, now, now))
+
+    def complete(self, job_id: str, request: str, resp: "ReadingResponse") -> None:
+        """Job, dessen Ergebnis schon im Cache lag, direkt als fertig eintragen."""
+        now = time.time()
+        self._one(
+            "INSERT OR REPLACE INTO reading_jobs (id, request, status, meta, result, created, updated) "
+            "VALUES (?, ?, 'done', ?, ?, ?, ?)",
+            (job_id, request, json.dumps(resp.meta, ensure_ascii=False, default=str),
+             resp.model_dump_json(), now, now))
+
+    def claim(self, owner: str, stale_before: float) -> Optional[Tuple[str, str]]:
+        """Ältesten wartenden Job übernehmen — oder einen, dessen Worker seit
+        `stale_before` nichts mehr von sich hören ließ. → (id, request)"""
+        now = time.time()
+        row = self._one(
+            "UPDATE reading_jobs SET status = 'running', owner = ?, claimed = ?, updated = ? "
+            "WHERE id = (SELECT id FROM reading_jobs WHERE status = 'queued' "
+            "OR (status = 'running' AND claimed < ?) ORDER BY created LIMIT 1) RETURNING id, request",
+            (owner, now, now, stale_before))
+        return (row[0], row[1]) if row else None
+
+    def set_meta(self, job_id: str, owner: str, meta: Dict[str, Any]) -> None:
+        self._one("UPDATE reading_jobs SET meta = ?, updated = ? WHERE id = ? AND owner = ?",
+                  (json.dumps(meta, ensure_ascii=False, default=str), time.time(), job_id, owner))
+
+    def finish(self, job_id: str, owner: str, status: str, result: str,
+               meta: Optional[Dict[str, Any]] = None) -> None:
+        self._one(
+            "UPDATE reading_jobs SET status = ?, result = ?, meta = COALESCE(?, meta), updated = ? "
+            "WHERE id = ? AND owner = ?",
+            (status, result, None if meta is None else json.dumps(meta, ensure_ascii=False, default=str),
+             time.time(), job_id, owner))
+
+    def requeue(self, job_id: str, owner: str) -> None:
+        """Worker wird beendet: Job sofort für den nächsten freigeben."""
+        self._one("UPDATE reading_jobs SET status = 'queued', owner = NULL, claimed = NULL "
+                  "WHERE id = ? AND owner = ? AND status = 'running'", (job_id, owner))
+
+    def queued(self) -> int:
+        return self._one("SELECT COUNT(*) FROM reading_jobs WHERE status = 'queued'")[0]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._one("SELECT status, meta, result FROM reading_jobs WHERE id = ?", (job_id,))
+        if row is None:
+            return None
+        status, meta, result = row
+        job = {"jobId": job_id, "status": status, "meta": json.loads(meta) if meta else None,
+               "result": json.loads(result) if result and status == "done" else None}
+        if status == "failed":
+            job["error"] = json.loads(result).get("error") if result else None
+        return job
+
+_JOB_STORE = _JobStore(READING_JOBS_PATH)
+_JOB_EVENTS: Dict[str, tuple] = {}
+_JOB_WORKERS: List[asyncio.Task] = []
+
+def _job_event(name: str) -> asyncio.Event:
+    return _loop_local(_JOB_EVENTS, name, asyncio.Event)
+
+def _job_changed() -> None:
+    """Wartende in diesem Prozess sofort wecken; andere Prozesse sehen die
+    Änderung beim nächsten Poll."""
+    _job_event("changed").set()
+    _job_event("queued").set()
+
+async def _run_reading_job(store: _JobStore, owner: str, job_id: str, raw: str) -> None:
+    _REQUEST_LOAD.set({"client": "job", "degraded": False})
+    try:
+        orig = ReadingRequest.model_validate_json(raw)
+        req, ckey = await _canonical_reading(orig)
+        resp, marker = await _cache_get(ckey), "cacheHit"
+        if resp is None:
+            meta_writes: List[asyncio.Task] = []
+
+            async def write_meta(meta: Dict[str, Any]) -> None:
+                await asyncio.to_thread(store.set_meta, job_id, owner, meta)
+                _job_changed()
+
+            def emit(event: str, data: dict) -> None:
+                if event == "meta":
+                    meta_writes.append(asyncio.create_task(write_meta(data["meta"])))
+            pending, joined = _single_flight(_READING_INFLIGHT, ckey,
+                                             lambda: _reading_compute(req, ckey, emit=emit))
+            resp, marker = await pending, "coalesced" if joined else None
+            await asyncio.gather(*meta_writes)  # `meta` vor dem Ergebnis schreiben, nie danach
+        if marker is not None:
+            resp = _reading_for(orig, resp, marker)
+        if resp.meta.get("error"):
+            # Fehler-Fallback von _reading_compute (wirft nie): nicht als fertig
+            # festschreiben, sonst bekäme jeder Retry ihn bis READING_JOBS_TTL.
+            await asyncio.to_thread(store.finish, job_id, owner, "failed",
+                                    json.dumps({"error": str(resp.meta["error"])}))
+        elif resp.meta.get("degraded"):
+            # Überlast-Text: wie im Reading-Cache nicht festschreiben; der
+            # nächste POST startet den Job neu.
+            await asyncio.to_thread(store.finish, job_id, owner, "failed",
+                                    json.dumps({"error": "overloaded"}), resp.meta)
+        else:
+            await asyncio.to_thread(store.finish, job_id, owner, "done", resp.model_dump_json(), resp.meta)
+    except asyncio.CancelledError:
+        store.requeue(job_id, owner)  # beim Beenden direkt, ein weiteres await käme nicht mehr sicher dran
+        raise
+    except Exception as e:
+        print(f"reading job {job_id} failed: {e}")
+        await asyncio.to_thread(store.finish, job_id, owner, "failed", json.dumps({"error": str(e)}))
+    _job_changed()
+
+async def _reading_job_worker(store: _JobStore, owner: str) -> None:
+    queued = _job_event("queued")
+    while True:
+        try:
+            job = await asyncio.to_thread(store.claim, owner, time.time() - 2 * READING_DEADLINE_SECONDS)
+        except sqlite3.Error as e:
+            print(f"reading job claim failed: {e}")
+            job = None
+        if job is None:
+            queued.clear()
+            try:
+                await asyncio.wait_for(queued.wait(), 2 * _JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await _run_reading_job(store, owner, *job)
+
+async def _run_reading_workers(n: int, store: Optional[_JobStore] = None) -> None:
+    """n Worker, die Jobs ziehen, bis sie abgebrochen werden (Web-Prozess
+    oder scripts/reading_worker.py)."""
+    base = f"{socket.gethostname()}:{os.getpid()}:{random.getrandbits(32):08x}"
+    await asyncio.gather(*(_reading_job_worker(store or _JOB_STORE, f"{base}#{i}") for i in range(n)))
+
+async def _job_wait(job_id: str, ready: Callable[[Dict[str, Any]], bool],
+                    timeout: float) -> Optional[Dict[str, Any]]:
+    changed = _job_event("changed")
+    deadline = time.monotonic() + timeout
+    while True:
+        job = await asyncio.to_thread(_JOB_STORE.get, job_id)
+        left = deadline - time.monotonic()
+        if job is None or ready(job) or left <= 0:
+            return job
+        changed.clear()
+        try:
+            await asyncio.wait_for(changed.wait(), min(left, _JOB_POLL_SECONDS))
+        except asyncio.TimeoutError:
+            pass
+
+def _job_finished(job: Dict[str, Any]) -> bool:
+    return job["status"] in ("done", "failed")
+
+def _job_response(job: Dict[str, Any]) -> JSONResponse:
+    return JSONResponse(status_code=200 if _job_finished(job) else 202, content=job,
+                        headers={"Location": f"/reading/jobs/{job['jobId']}"})
+
+async def _reading_job_submit(req: ReadingRequest):
+    _canon, ckey = await _canonical_reading(req)
+    # Job je Cache-Key *und* Schreibweise: gerechnet wird über Cache und
+    # Single-Flight trotzdem nur einmal, aber jeder Job trägt das Echo
+    # (Datum, Ort, Zeit) seines Aufrufers — wie /reading (_reading_for).
+    echo = "|".join((req.birthDate or "", req.birthPlace or "", req.birthTime or ""))
+    job_id = hashlib.sha256(f"{ckey}|{echo}".encode("utf-8")).hexdigest()[:32]
+    raw = req.model_dump_json()
+    cached = await _cache_get(ckey)
+    _count("readingCache", "jobs", "misses" if cached is None else "hits")
+    if cached is not None:
+        await asyncio.to_thread(_JOB_STORE.complete, job_id, raw, _reading_for(req, cached, "cacheHit"))
+    else:
+        if (await asyncio.to_thread(_JOB_STORE.get, job_id) is None
+                and await asyncio.to_thread(_JOB_STORE.queued) >= READING_JOBS_MAX_QUEUED):
+            return JSONResponse(status_code=503, headers={"Retry-After": "30"}, content={
+                "detail": "Gerade sind sehr viele Readings in Arbeit — bitte gleich noch einmal versuchen."})
+        await asyncio.to_thread(_JOB_STORE.submit, job_id, raw)
+        _job_changed()
+    job = await _job_wait(job_id, lambda j: j["meta"] is not None or _job_finished(j), _JOB_META_WAIT)
+    return _job_response(job)
+
+@app.get("/reading/jobs/{job_id}")
+async def reading_job(job_id: str, wait: float = 0):
+    """Stand eines Reading-Jobs; mit `wait` (Sekunden, höchstens 30) als
+    Long-Poll, der zurückkommt, sobald der Job fertig ist."""
+    job = None
+    if _JOB_ID.fullmatch(job_id):
+        job = await _job_wait(job_id, _job_finished, min(max(wait, 0.0), _JOB_MAX_WAIT))
+    if job is None:
+        return JSONResponse(status_code=404, content={"detail": "Job unbekannt oder abgelaufen."})
+    return _job_response(job)
+
+if _HAS_SLOWAPI and limiter is not None:
+    @app.post("/reading/jobs")
+    @limiter.limit(READING_RATE_LIMIT)
+    async def reading_job_submit(request: Request, req: ReadingRequest = Body(...)):
+        return await _reading_job_submit(req)
+else:
+    @app.post("/reading/jobs")
+    async def reading_job_submit(req: ReadingRequest = Body(...)):
+        return await _reading_job_submit(req)
+
+@app.on_event("startup")
+async def _start_reading_workers():
+    if READING_JOB_WORKERS > 0:
+        _JOB_WORKERS.append(asyncio.create_task(_run_reading_workers(READING_JOB_WORKERS)))
+
+@app.on_event("shutdown")
+async def _stop_reading_workers():
+    # Laufende Jobs gehen zurück in die Warteschlange (requeue beim Abbruch).
+    for task in _JOB_WORKERS:
+        task.cancel()
+    await asyncio.gather(*_JOB_WORKERS, return_exceptions=True)
+    _JOB_WORKERS.clear()
 
 # ===========================================================================
 # Das Monatsbrett — kalendergebundenes Senet-Orakelspiel (docs/spielkonzept.md)
@@ -1661,9 +3718,37 @@ def _validate_positions(raw: Dict[str, int]) -> Dict[str, int]:
         raise ValueError("Zwei Steine auf demselben Feld")
     return pos
 
+# --- Tageslage-Tabelle -----------------------------------------------------
+# Die Tageslage ist global und wechselt einmal am Tag, um Mitternacht
+# Europe/Berlin. Beim Start rechnen wir BOARD_TABLE_YEARS Jahre im Voraus
+# (≈ 20 µs pro Tag); board_today() ist danach ein Dict-Lookup.
+BOARD_TABLE_YEARS = int(os.getenv("BOARD_TABLE_YEARS", "3"))
+_BOARD_TZ = ZoneInfo("Europe/Berlin")
+_BOARD_DAYS: Dict[dt.date, Dict[str, Any]] = {}
+_BOARD_ETAGS: Dict[dt.date, str] = {}
+
+def board_local_today() -> dt.date:
+    """Das Brett-Datum: der Kalendertag in Europe/Berlin, nicht in der
+    Zeitzone des Servers (Railway läuft auf UTC)."""
+    return dt.datetime.now(_BOARD_TZ).date()
+
 def board_today(d: Optional[dt.date] = None) -> Dict[str, Any]:
-    """Globale Tageslage — für alle Spieler identisch, daher cachebar."""
-    d = d or dt.date.today()
+    """Globale Tageslage — für alle Spieler identisch, daher gecacht. Das
+    Dict ist geteilt: Aufrufer lesen nur."""
+    d = d or board_local_today()
+    today = _BOARD_DAYS.get(d)
+    if today is None:
+        today = _BOARD_DAYS[d] = _board_compute(d)
+    return today
+
+def _board_etag(d: dt.date) -> str:
+    etag = _BOARD_ETAGS.get(d)
+    if etag is None:
+        body = json.dumps(board_today(d), sort_keys=True, ensure_ascii=False)
+        etag = _BOARD_ETAGS[d] = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest()[:20] + '"'
+    return etag
+
+def _board_compute(d: dt.date) -> Dict[str, Any]:
     lb = lunar_board(d)
     mf = moon_phase_fraction(d)
     hex_idx = iching_index(d)
@@ -1697,7 +3782,17 @@ class BoardMoveRequest(BaseModel):
     dayIndex: Optional[int] = Field(None, ge=1, le=30)
     useAlt: bool = False  # Sternschnuppen-Tag: den zweiten Wurf nehmen
 
-def _board_reading(req: BoardMoveRequest, today: Dict[str, Any], stone: str,
+# Stabile Aufgabenteile der Kurztexte (Prompt-Cache, s. _voice_system):
+# Tageslage, Zug und Profil folgen jeweils als variabler Rest.
+_BOARD_MOVE_TASK = """Deute einen Zug auf dem Monatsbrett: 2–3 kurze Sätze für den Lebensbereich
+des gezogenen Steins — wie eine gute Freundin, die dir beim Kaffee etwas mitgibt.
+Der letzte Satz ist der „Satz für heute“: ein kleiner, konkreter Alltags-Impuls im
+Imperativ, der bis heute Abend machbar ist. Keine Aufzählung, keine Überschrift,
+keine medizinisch/juristisch/finanziell heiklen Ratschläge.
+Tageslage, Zug und Profil:"""
+
+@_with_llm_deadline(lambda: LLM_DEADLINE_SECONDS)
+async def _board_reading(req: BoardMoveRequest, today: Dict[str, Any], stone: str,
                    from_pos: int, to_pos: int, is_today: bool,
                    event: Optional[Dict[str, str]] = None) -> str:
     """Mikro-Lesung zum Zug. LLM nur für den aktuellen Tag; Nachhol-Züge und
@@ -1720,15 +3815,10 @@ Tageszeichen {today['ganzhi']['label']}.
 
 Zug: Der Stein „{stone_label}“ ({'zieht aus ins Binsengefilde' if to_pos == _AARU else f"zieht von Feld {from_pos} auf Feld {to_pos} „{field['name']}“ — {field['core']}"}).
 Profil: Sternzeichen {sun}, Lebenszahl {lp}{f", Ort {req.birthPlace}" if req.birthPlace else ""}.{f'''
-Besonderer Tag: {event['symbol']} {event['name']} — {event['text']} Webe dieses seltene Ereignis kurz in die Deutung ein.''' if event else ""}
-
-Schreibe 2–3 kurze Sätze Deutung dieses Zuges für den Lebensbereich {stone_label} —
-wie eine gute Freundin, die dir beim Kaffee etwas mitgibt. Der letzte Satz ist
-der „Satz für heute“: ein kleiner, konkreter Alltags-Impuls im Imperativ, der
-bis heute Abend machbar ist. Keine Aufzählung, keine Überschrift, keine
-medizinisch/juristisch/finanziell heiklen Ratschläge."""
+Besonderer Tag: {event['symbol']} {event['name']} — {event['text']} Webe dieses seltene Ereignis kurz in die Deutung ein.''' if event else ""}"""
     try:
-        return oa_text(_tone_directive(req.tone) + "\n\n" + prompt, temperature=0.8).strip()
+        return (await oa_text(prompt, temperature=0.8, endpoint="board_move",
+                              prefix=_BOARD_MOVE_TASK, tone=req.tone)).strip()
     except Exception as e:
         # Sichtbar loggen — ein stiller Fallback hat in Produktion wochenlang
         # den Temperature-Bug der GPT-5-Umstellung verdeckt.
@@ -1762,7 +3852,7 @@ async def _board_move_impl(req: BoardMoveRequest):
     to_pos = moves[req.stone]
     positions[req.stone] = to_pos
     is_today = (day == today["dayIndex"])
-    text = _board_reading(req, today, req.stone, from_pos, to_pos, is_today, event)
+    text = await _board_reading(req, today, req.stone, from_pos, to_pos, is_today, event)
     field = FIELD_EVENTS[min(to_pos, 30) - 1]
     chips = [f"Tag {day}", today["moon"]["name"],
              f"I-Ging: {today['hexagram']['name']}", today["ganzhi"]["label"]]
@@ -1776,17 +3866,45 @@ async def _board_move_impl(req: BoardMoveRequest):
                   "field": field["name"] if to_pos != _AARU else "Binsengefilde"},
         "reading": {"text": text, "chips": chips},
         "disclaimer": "Unterhaltung & Selbstreflexion – kein Ersatz für professionelle Beratung.",
+        **({"meta": {"degraded": True}} if _llm_degraded() else {}),
     }
 
+def _not_modified(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match", "")
+    return inm.strip() == "*" or etag in (t.strip().removeprefix("W/") for t in inm.split(","))
+
 @app.get("/board/today")
-def board_today_route():
-    return board_today()
+def board_today_route(request: Request):
+    """Browser und CDN dürfen die Tageslage bis Mitternacht (Berlin) halten;
+    danach fragt der ETag nach, ob sich wirklich etwas geändert hat."""
+    now = dt.datetime.now(_BOARD_TZ)
+    d = now.date()
+    midnight = dt.datetime.combine(d + dt.timedelta(days=1), dt.time(0), tzinfo=_BOARD_TZ)
+    etag = _board_etag(d)
+    headers = {"ETag": etag,
+               "Cache-Control": f"public, max-age={max(1, int((midnight - now).total_seconds()))}"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(board_today(d), headers=headers)
+
+_BOARD_FIELDS = {"fields": [{"index": i + 1, **f} for i, f in enumerate(FIELD_EVENTS)]}
+_BOARD_FIELDS_ETAG = '"' + hashlib.sha1(
+    json.dumps(_BOARD_FIELDS, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:20] + '"'
 
 @app.get("/board/fields")
-def board_fields_route():
+def board_fields_route(request: Request):
     """Alle 30 Feldkarten (für das Feld-Album im Frontend) — statisch,
-    identisch für alle, daher unbegrenzt cachebar."""
-    return {"fields": [{"index": i + 1, **f} for i, f in enumerate(FIELD_EVENTS)]}
+    identisch für alle; ändern sich nur mit einem Deploy (ETag)."""
+    headers = {"ETag": _BOARD_FIELDS_ETAG, "Cache-Control": "public, max-age=86400"}
+    if _not_modified(request, _BOARD_FIELDS_ETAG):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(_BOARD_FIELDS, headers=headers)
+
+@app.on_event("startup")
+def _precompute_board_table():
+    start = board_local_today() - dt.timedelta(days=31)
+    for i in range(31 + 366 * max(0, BOARD_TABLE_YEARS)):
+        board_today(start + dt.timedelta(days=i))
 
 # --- Profil-Karte („Sternzeichen als Stenografie", docs/tonalitaet.md §3.2) --
 # Statische Charakter-Sätze in der Produktstimme: Stärke + kleine Aufgabe.
@@ -1923,12 +4041,22 @@ else:
 # deterministischem Fallback; teilt das Reading-Rate-Limit.
 # ---------------------------------------------------------------------------
 
+_RESONANZ_TASK = """Paar-Resonanz: Schreibe 3–4 kurze Sätze darüber, wie die Energien zweier
+Menschen heute zusammenwirken — was sie einander geben, wo es knistern oder haken
+kann — im Ton einer guten Freundin, die euch beide kennt. Sprich beide als „ihr" an.
+Der letzte Satz ist euer „Satz für heute": ein kleiner, gemeinsamer Impuls im
+Imperativ, der bis heute Abend machbar ist. Keine Aufzählung, keine Überschrift,
+keine medizinisch/juristisch/finanziell heiklen Ratschläge, keine
+Beziehungsprognosen über den heutigen Tag hinaus.
+Tageslage und die beiden Profile:"""
+
 class ResonanzRequest(BaseModel):
     birthDate: str = Field(..., max_length=32)
     partnerDate: str = Field(..., max_length=32)
     tone: Optional[str] = Field(None, max_length=64)
 
-def _resonanz_impl(req: ResonanzRequest):
+@_with_llm_deadline(lambda: LLM_DEADLINE_SECONDS)
+async def _resonanz_impl(req: ResonanzRequest):
     d1 = parse_birth_date(req.birthDate)
     d2 = parse_birth_date(req.partnerDate)
     if not d1 or not d2:
@@ -1947,34 +4075,28 @@ I-Ging {today['hexagram']['index']} „{today['hexagram']['name']}“ ({today['h
 Tageszeichen {today['ganzhi']['label']} · Feld „{today['field']['name']}“ — {today['field']['core']}.
 
 Paar-Resonanz: Person A ist Sternzeichen {z1}, Lebenszahl {lp1}, Jahreszeichen {a1}.
-Person B ist Sternzeichen {z2}, Lebenszahl {lp2}, Jahreszeichen {a2}.
-
-Schreibe 3–4 kurze Sätze darüber, wie diese beiden Energien heute zusammenwirken —
-was sie einander geben, wo es knistern oder haken kann — im Ton einer guten
-Freundin, die euch beide kennt. Sprich beide als „ihr" an. Der letzte Satz ist
-euer „Satz für heute": ein kleiner, gemeinsamer Impuls im Imperativ, der bis
-heute Abend machbar ist. Keine Aufzählung, keine Überschrift, keine
-medizinisch/juristisch/finanziell heiklen Ratschläge, keine Beziehungsprognosen
-über den heutigen Tag hinaus."""
+Person B ist Sternzeichen {z2}, Lebenszahl {lp2}, Jahreszeichen {a2}."""
     seed = _det_hash("resonanz", req.birthDate.strip(), req.partnerDate.strip(), today["date"])
     try:
-        text = oa_text(_tone_directive(req.tone) + "\n\n" + prompt, seed=seed).strip()
+        text = (await oa_text(prompt, seed=seed, endpoint="resonanz",
+                              prefix=_RESONANZ_TASK, tone=req.tone)).strip()
     except Exception as e:
         print(f"resonanz LLM failed ({_llm_id()}): {e}")
         text = fallback
     return {"date": today["date"], "chips": chips, "text": text,
             "pair": {"zodiac": [z1, z2], "lifePath": [lp1, lp2], "animal": [a1, a2]},
-            "disclaimer": "Unterhaltung & Selbstreflexion – kein Ersatz für professionelle Beratung."}
+            "disclaimer": "Unterhaltung & Selbstreflexion – kein Ersatz für professionelle Beratung.",
+            **({"meta": {"degraded": True}} if _llm_degraded() else {})}
 
 if _HAS_SLOWAPI and limiter is not None:
     @app.post("/resonanz")
     @limiter.limit(READING_RATE_LIMIT)
     async def resonanz(request: Request, req: ResonanzRequest = Body(...)):
-        return _resonanz_impl(req)
+        return await _resonanz_impl(req)
 else:
     @app.post("/resonanz")
     async def resonanz(req: ResonanzRequest = Body(...)):
-        return _resonanz_impl(req)
+        return await _resonanz_impl(req)
 
 
 # ---------------------------------------------------------------------------
@@ -2080,12 +4202,21 @@ class WeekMove(BaseModel):
     stone: str = Field(..., max_length=16)
     field: Optional[str] = Field(None, max_length=64)
 
+_WOCHE_TASK = """Wochenrückblick auf dem Monatsbrett: Schreibe eine Wochenlesung in 4–5 kurzen
+Sätzen — wie eine gute Freundin beim Sonntagskaffee: Was für ein Bogen war diese
+Woche (nimm Bezug auf die Bereiche, die gezogen wurden — und die, die liegen
+blieben)? Was deutet sich für die kommende Woche an? Der letzte Satz ist der
+„Satz für die Woche“: ein kleiner, konkreter Impuls im Imperativ. Keine Aufzählung,
+keine Überschrift, keine medizinisch/juristisch/finanziell heiklen Ratschläge.
+Kalenderwoche, Tageslage, Züge und Profil:"""
+
 class WochenRequest(BaseModel):
     birthDate: str = Field(..., max_length=32)
     moves: List[WeekMove] = Field(default_factory=list, max_length=10)
     tone: Optional[str] = Field(None, max_length=64)
 
-def _wochenlesung_impl(req: WochenRequest):
+@_with_llm_deadline(lambda: LLM_DEADLINE_SECONDS)
+async def _wochenlesung_impl(req: WochenRequest):
     d = parse_birth_date(req.birthDate)
     if not d:
         return JSONResponse(status_code=422, content={
@@ -2100,83 +4231,212 @@ def _wochenlesung_impl(req: WochenRequest):
     fallback = ("Eine Woche auf dem Brett liegt hinter dir — jeder Zug hat "
                 "seinen Teil erzählt. Nimm dir heute zehn ruhige Minuten und "
                 "schau, welcher Bereich als Nächstes dran ist.")
-    prompt = f"""Wochenrückblick auf dem Monatsbrett (Kalenderwoche {iso[1]}).
+    prompt = f"""Kalenderwoche {iso[1]}.
 Tageslage heute: Tag {today['dayIndex']} des Mondmonats · {today['moon']['name']} ·
 I-Ging {today['hexagram']['index']} „{today['hexagram']['name']}“ · Feld „{today['field']['name']}“.
 
 Die Züge dieser Woche:
 {zug_zeilen}
 
-Sternzeichen: {zodiac_from_date(d)}, Lebenszahl: {life_path_number(d)}.
-
-Schreibe eine Wochenlesung in 4–5 kurzen Sätzen — wie eine gute Freundin beim
-Sonntagskaffee: Was für ein Bogen war diese Woche (nimm Bezug auf die Bereiche,
-die gezogen wurden — und die, die liegen blieben)? Was deutet sich für die
-kommende Woche an? Der letzte Satz ist der „Satz für die Woche“: ein kleiner,
-konkreter Impuls im Imperativ. Keine Aufzählung, keine Überschrift, keine
-medizinisch/juristisch/finanziell heiklen Ratschläge."""
+Sternzeichen: {zodiac_from_date(d)}, Lebenszahl: {life_path_number(d)}."""
     seed = _det_hash("woche", req.birthDate.strip(), week_key)
     try:
-        text = oa_text(_tone_directive(req.tone) + "\n\n" + prompt, seed=seed).strip()
+        text = (await oa_text(prompt, seed=seed, endpoint="wochenlesung",
+                              prefix=_WOCHE_TASK, tone=req.tone)).strip()
     except Exception as e:
         print(f"wochenlesung LLM failed ({_llm_id()}): {e}")
         text = fallback
     return {"week": week_key, "text": text,
             "chips": [f"KW {iso[1]}", today["moon"]["name"], today["ganzhi"]["label"]],
-            "disclaimer": "Unterhaltung & Selbstreflexion – kein Ersatz für professionelle Beratung."}
+            "disclaimer": "Unterhaltung & Selbstreflexion – kein Ersatz für professionelle Beratung.",
+            **({"meta": {"degraded": True}} if _llm_degraded() else {})}
 
 if _HAS_SLOWAPI and limiter is not None:
     @app.post("/wochenlesung")
     @limiter.limit(READING_RATE_LIMIT)
     async def wochenlesung(request: Request, req: WochenRequest = Body(...)):
-        return _wochenlesung_impl(req)
+        return await _wochenlesung_impl(req)
 else:
     @app.post("/wochenlesung")
     async def wochenlesung(req: WochenRequest = Body(...)):
-        return _wochenlesung_impl(req)
+        return await _wochenlesung_impl(req)
 
 
 # ---------------------------------------------------------------------------
 # Web-Push — das Morgen-Ritual (docs/tonalitaet.md §3.1, Phase 3).
 # Täglich zur festen Uhrzeit die Tageslage als Einladung zum Zug.
 # Aktiv nur mit VAPID-Keys (VAPID_PRIVATE_KEY/VAPID_PUBLIC_KEY, erzeugbar
-# mit scripts/generate_vapid.py). Abos liegen in PUSH_STORE_PATH — ohne
-# Volume/DB überleben sie kein Deploy (bewusster Beta-Kompromiss; der
-# Umstieg auf ein Railway-Volume ist nur eine Pfad-Variable).
+# mit scripts/generate_vapid.py). Abos liegen in einer SQLite-Datei unter
+# PUSH_STORE_PATH — ohne Volume überleben sie kein Deploy (bewusster
+# Beta-Kompromiss; der Umstieg auf ein Railway-Volume ist nur eine
+# Pfad-Variable).
 # ---------------------------------------------------------------------------
 
 try:
-    from pywebpush import webpush as _webpush, WebPushException as _WebPushException
+    from pywebpush import WebPusher as _WebPusher
+    from py_vapid import Vapid as _Vapid
 except ImportError:
-    _webpush = None
-    _WebPushException = Exception
+    _WebPusher = None
+    _Vapid = None
+
+try:
+    import h2  # noqa: F401 — httpx braucht es für http2=True
+    _HAS_H2 = True
+except ImportError:
+    _HAS_H2 = False
 
 VAPID_PRIVATE_KEY = os.getenv("VAPID_PRIVATE_KEY", "").strip()
 VAPID_PUBLIC_KEY = os.getenv("VAPID_PUBLIC_KEY", "").strip()
 VAPID_SUBJECT = os.getenv("VAPID_SUBJECT", "mailto:hallo@horoskop.one").strip()
-PUSH_STORE_PATH = os.getenv("PUSH_STORE_PATH", "push_subscriptions.json")
-PUSH_TIME = os.getenv("PUSH_TIME", "08:00")  # Europe/Berlin
+PUSH_STORE_PATH = os.getenv("PUSH_STORE_PATH", "push_subscriptions.sqlite3")
+PUSH_TIME = os.getenv("PUSH_TIME", "08:00")  # Default-Wunschzeit, lokal beim Abo
 
 def _push_enabled() -> bool:
-    return bool(_webpush and VAPID_PRIVATE_KEY and VAPID_PUBLIC_KEY)
+    return bool(_WebPusher and VAPID_PRIVATE_KEY and VAPID_PUBLIC_KEY)
 
-def _push_load() -> List[Dict[str, Any]]:
-    try:
-        with open(PUSH_STORE_PATH, encoding="utf-8") as f:
-            return json.load(f)
-    except (OSError, json.JSONDecodeError):
-        return []
+class _PushStore:
+    """Abo-Bestand in SQLite (WAL), Schlüssel ist der Endpoint.
 
-def _push_save(subs: List[Dict[str, Any]]) -> None:
-    try:
-        with open(PUSH_STORE_PATH, "w", encoding="utf-8") as f:
-            json.dump(subs, f)
-    except OSError as e:
-        print(f"push store write failed: {e}")
+    Upsert und Löschen sind Einzelzeilen-Operationen statt „ganze Datei
+    lesen und neu schreiben“; SQLite sperrt über Worker hinweg, damit keine
+    gleichzeitige Anmeldung verloren geht. Eine alte JSON-Datei gleichen
+    Namens (…json) wird beim ersten Zugriff übernommen und danach in
+    `…json.migrated` umbenannt.
+    """
+
+    PAGE = 500
+
+    def __init__(self, path: str):
+        stem = path[:-5] if path.endswith(".json") else os.path.splitext(path)[0]
+        self.path = stem + ".sqlite3" if path.endswith(".json") else path
+        self.legacy_path = stem + ".json"
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS push_subscriptions "
+                         "(endpoint TEXT PRIMARY KEY, keys TEXT NOT NULL, created REAL NOT NULL)")
+            # Spalten für die Zustellfenster (ältere Dateien bekommen sie nachgerüstet).
+            have = {row[1] for row in conn.execute("PRAGMA table_info(push_subscriptions)")}
+            for column in ("tz", "push_time", "last_sent"):
+                if column not in have:
+                    try:
+                        conn.execute(f"ALTER TABLE push_subscriptions ADD COLUMN {column} TEXT")
+                    except sqlite3.OperationalError:
+                        pass  # ein anderer Worker war schneller
+            self._conn = conn
+            self._migrate_json()
+        return self._conn
+
+    def _migrate_json(self) -> None:
+        try:
+            with open(self.legacy_path, encoding="utf-8") as f:
+                subs = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"push store migration skipped ({self.legacy_path}): {e}")
+            return
+        now = time.time()
+        rows = [(s["endpoint"], json.dumps(s.get("keys") or {}), now)
+                for s in subs if isinstance(s, dict) and s.get("endpoint")]
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            # OR IGNORE: ein zweiter Worker, der parallel migriert, überschreibt nichts.
+            self._conn.executemany("INSERT OR IGNORE INTO push_subscriptions (endpoint, keys, created) "
+                                   "VALUES (?, ?, ?)", rows)
+        try:
+            os.replace(self.legacy_path, self.legacy_path + ".migrated")
+        except FileNotFoundError:
+            pass
+        print(f"push store: {len(rows)} Abos aus {self.legacy_path} übernommen")
+
+    def upsert(self, endpoint: str, keys: Dict[str, str], tz: Optional[str] = None,
+               push_time: Optional[str] = None) -> None:
+        self._db().execute(
+            "INSERT INTO push_subscriptions (endpoint, keys, created, tz, push_time) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(endpoint) DO UPDATE SET keys = excluded.keys, "
+            "tz = COALESCE(excluded.tz, tz), push_time = COALESCE(excluded.push_time, push_time)",
+            (endpoint, json.dumps(keys), time.time(), tz, push_time))
+
+    def get_many(self, endpoints: List[str]) -> List[Dict[str, Any]]:
+        rows = []
+        for i in range(0, len(endpoints), self.PAGE):
+            chunk = endpoints[i:i + self.PAGE]
+            rows += self._db().execute(
+                f"SELECT {self._COLUMNS} FROM push_subscriptions "
+                f"WHERE endpoint IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+        return [self._row(r) for r in rows]
+
+    def mark_sent(self, sent: List[Tuple[str, str]]) -> None:
+        """(endpoint, lokales Datum) — heute schon beliefert, auch nach einem Neustart."""
+        if not sent:
+            return
+        conn = self._db()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("UPDATE push_subscriptions SET last_sent = ? WHERE endpoint = ?",
+                             [(day, endpoint) for endpoint, day in sent])
+
+    def delete(self, endpoint: str) -> None:
+        self._db().execute("DELETE FROM push_subscriptions WHERE endpoint = ?", (endpoint,))
+
+    def delete_many(self, endpoints: List[str]) -> None:
+        """Erloschene Abos in einer Transaktion wegräumen."""
+        if not endpoints:
+            return
+        conn = self._db()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("DELETE FROM push_subscriptions WHERE endpoint = ?",
+                             [(e,) for e in endpoints])
+
+    def count(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM push_subscriptions").fetchone()[0]
+
+    def pages(self):
+        """Alle Abos seitenweise (Keyset-Paging) — der Fan-out hält nie den
+        ganzen Bestand im Speicher, und Löschungen während des Laufs stören
+        die Iteration nicht."""
+        last = ""
+        while True:
+            rows = self._db().execute(
+                f"SELECT {self._COLUMNS} FROM push_subscriptions WHERE endpoint > ? "
+                "ORDER BY endpoint LIMIT ?", (last, self.PAGE)).fetchall()
+            if rows:
+                yield [self._row(r) for r in rows]
+            if len(rows) < self.PAGE:
+                return
+            last = rows[-1][0]
+
+    _COLUMNS = "endpoint, keys, tz, push_time, last_sent"
+
+    @staticmethod
+    def _row(row: tuple) -> Dict[str, Any]:
+        endpoint, keys, tz, push_time, last_sent = row
+        return {"endpoint": endpoint, "keys": json.loads(keys),
+                "tz": tz, "time": push_time, "lastSent": last_sent}
+
+    def __iter__(self):
+        for page in self.pages():
+            yield from page
+
+_PUSH_STORES: Dict[str, _PushStore] = {}
+
+def _push_store() -> _PushStore:
+    store = _PUSH_STORES.get(PUSH_STORE_PATH)
+    if store is None:
+        store = _PUSH_STORES[PUSH_STORE_PATH] = _PushStore(PUSH_STORE_PATH)
+    return store
 
 class PushSubscription(BaseModel):
     endpoint: str = Field(..., max_length=1000)
     keys: Dict[str, str] = Field(default_factory=dict)
+    tz: Optional[str] = Field(None, max_length=64)     # IANA-Zone des Geräts
+    time: Optional[str] = Field(None, max_length=5)    # Wunschzeit HH:MM, lokal
 
 class PushUnsubscribe(BaseModel):
     endpoint: str = Field(..., max_length=1000)
@@ -2192,17 +4452,157 @@ def push_subscribe(req: PushSubscription = Body(...)):
             "detail": "Push ist auf diesem Server nicht konfiguriert."})
     if not req.keys.get("p256dh") or not req.keys.get("auth"):
         return JSONResponse(status_code=422, content={"detail": "Unvollständiges Abo."})
-    subs = [s for s in _push_load() if s.get("endpoint") != req.endpoint]
-    subs.append({"endpoint": req.endpoint, "keys": req.keys})
-    _push_save(subs)
-    return {"ok": True, "count": len(subs)}
+    tz = _push_zone(req.tz).key
+    push_time = "%02d:%02d" % _push_clock(req.time)
+    store = _push_store()
+    store.upsert(req.endpoint, req.keys, tz, push_time)
+    if _PUSH_SCHEDULER is not None:
+        _PUSH_SCHEDULER.schedule({"endpoint": req.endpoint, "tz": tz, "time": push_time, "lastSent": None})
+    return {"ok": True, "count": store.count(), "tz": tz, "time": push_time}
 
 @app.post("/push/unsubscribe")
 def push_unsubscribe(req: PushUnsubscribe = Body(...)):
-    subs = [s for s in _push_load() if s.get("endpoint") != req.endpoint]
-    _push_save(subs)
+    _push_store().delete(req.endpoint)
     return {"ok": True}
 
+# --- Zustellfenster ---------------------------------------------------------
+# Jedes Abo hat seine Zeitzone und Wunschzeit (Default PUSH_TIME, Europe/
+# Berlin). Zugestellt wird nicht auf die Minute, sondern verteilt über
+# PUSH_WINDOW_MINUTES ab der Wunschzeit: jedes Abo bekommt einen festen,
+# aus dem Endpoint abgeleiteten Versatz. Der Ansturm auf /board/throw und
+# /board/move (LLM) verteilt sich so über das Fenster statt auf eine Minute.
+PUSH_WINDOW_MINUTES = int(os.getenv("PUSH_WINDOW_MINUTES", "60"))
+PUSH_RESCAN_SECONDS = 300  # neue Abos anderer Worker einsammeln
+
+def _push_zone(name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(name) if name else _BOARD_TZ
+    except (ValueError, KeyError, OSError):  # ZoneInfoNotFoundError ist ein KeyError
+        return _BOARD_TZ
+
+def _push_clock(hhmm: Optional[str]) -> Tuple[int, int]:
+    for value in (hhmm, PUSH_TIME, "08:00"):
+        try:
+            hour, minute = (int(x) for x in (value or "").split(":"))
+            if 0 <= hour < 24 and 0 <= minute < 60:
+                return hour, minute
+        except ValueError:
+            continue
+    return 8, 0
+
+def _push_offset(endpoint: str) -> int:
+    """Deterministischer Versatz im Zustellfenster (Sekunden)."""
+    return _det_hash("push-window", endpoint) % max(1, PUSH_WINDOW_MINUTES * 60)
+
+def _push_due(sub: Dict[str, Any], now: dt.datetime) -> Tuple[float, str]:
+    """Nächster Zustellzeitpunkt (UTC-Timestamp) und das lokale Datum, für
+    das er gilt. Wer heute noch nicht beliefert wurde und sein Fenster
+    höchstens ein Fenster lang verpasst hat (Neustart), bekommt sofort."""
+    tz = _push_zone(sub.get("tz"))
+    hour, minute = _push_clock(sub.get("time"))
+    offset = dt.timedelta(seconds=_push_offset(sub["endpoint"]))
+    grace = dt.timedelta(minutes=PUSH_WINDOW_MINUTES)
+    today = now.astimezone(tz).date()
+    for day in (today, today + dt.timedelta(days=1), today + dt.timedelta(days=2)):
+        if sub.get("lastSent") == day.isoformat():
+            continue
+        at = dt.datetime.combine(day, dt.time(hour, minute), tzinfo=tz) + offset
+        if at >= now - grace:
+            return max(at, now).timestamp(), day.isoformat()
+    return (now + dt.timedelta(days=1)).timestamp(), (today + dt.timedelta(days=1)).isoformat()
+
+class _PushScheduler:
+    """Zeitlich sortierte Warteschlange (Heap) aller anstehenden Zustellungen.
+
+    Schläft bis zur nächsten fälligen, schickt alles Fällige als einen
+    Fan-out und plant die Empfänger für ihren nächsten Tag neu ein. Neue Abos
+    dieses Workers kommen sofort in den Heap, die anderer Worker beim
+    nächsten Scan des Stores.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, Tuple[float, str]] = {}
+        self._wake = asyncio.Event()
+        self._scanned = 0.0
+        self.day_stats: Dict[str, Any] = {}
+
+    def schedule(self, sub: Dict[str, Any], now: Optional[dt.datetime] = None) -> None:
+        due = _push_due(sub, now or dt.datetime.now(dt.timezone.utc))
+        self._due[sub["endpoint"]] = due
+        heapq.heappush(self._heap, (due[0], sub["endpoint"]))
+        if self._heap[0][1] == sub["endpoint"]:
+            self._wake.set()
+
+    def rescan(self) -> None:
+        now = dt.datetime.now(dt.timezone.utc)
+        for sub in _push_store():
+            if sub["endpoint"] not in self._due:
+                self.schedule(sub, now)
+        self._scanned = time.monotonic()
+
+    def pop_due(self, now: float) -> List[Tuple[str, str]]:
+        """Alle fälligen (endpoint, lokales Datum); veraltete Heap-Einträge
+        (umgeplante Abos) werden übersprungen."""
+        batch = []
+        while self._heap and self._heap[0][0] <= now:
+            at, endpoint = heapq.heappop(self._heap)
+            due = self._due.get(endpoint)
+            if due is not None and due[0] == at:
+                del self._due[endpoint]
+                batch.append((endpoint, due[1]))
+        return batch
+
+    def next_wakeup(self, now: float) -> float:
+        until_rescan = self._scanned + PUSH_RESCAN_SECONDS - time.monotonic()
+        until_due = self._heap[0][0] - now if self._heap else until_rescan
+        return max(0.0, min(until_due, until_rescan))
+
+    async def deliver(self, batch: List[Tuple[str, str]]) -> Dict[str, Any]:
+        store = _push_store()
+        days = dict(batch)
+        subs = store.get_many([endpoint for endpoint, _ in batch])  # Abgemeldete fehlen hier
+        payload = _push_payload().encode("utf-8")
+        pages = [subs[i:i + store.PAGE] for i in range(0, len(subs), store.PAGE)]
+        results, elapsed = await _push_fan_out(iter(pages), payload)
+        expired = [endpoint for endpoint, status, _ in results if status == "expired"]
+        store.delete_many(expired)
+        # Auch Fehlschläge gelten als erledigt: kein Dauerfeuer auf einen
+        # kaputten Endpoint, morgen ist der nächste Versuch.
+        store.mark_sent([(endpoint, days[endpoint]) for endpoint, status, _ in results if status != "expired"])
+        gone = set(expired)
+        now = dt.datetime.now(dt.timezone.utc)
+        for sub in subs:
+            if sub["endpoint"] not in gone:
+                sub["lastSent"] = days[sub["endpoint"]]
+                self.schedule(sub, now)
+        return _push_stats(results, elapsed, len(expired))
+
+    async def run(self) -> None:
+        while True:
+            try:
+                if time.monotonic() - self._scanned >= PUSH_RESCAN_SECONDS:
+                    self.rescan()
+                now = time.time()
+                batch = self.pop_due(now)
+                if batch:
+                    stats = await self.deliver(batch)
+                    print(f"push window: {stats['sent']}/{stats['total']} sent, {stats['expired']} expired, "
+                          f"{stats['failed']} failed ({stats['sendsPerSec']}/s, p95 {stats['p95Ms']} ms)")
+                    continue
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.next_wakeup(now))
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"push scheduler error: {e}")
+                await asyncio.sleep(5)
+
+_PUSH_SCHEDULER: Optional[_PushScheduler] = None
+
 def _push_payload() -> str:
     today = board_today()
     return json.dumps({
@@ -2211,53 +4611,247 @@ def _push_payload() -> str:
         "url": "/play",
     }, ensure_ascii=False)
 
-def _push_send_all() -> int:
-    """Die Morgen-Nachricht an alle Abos; tote Endpoints (404/410) räumen wir weg."""
-    subs = _push_load()
-    if not subs:
-        return 0
-    payload = _push_payload()
-    alive, sent = [], 0
+# --- Versand: asynchroner Fan-out -------------------------------------------
+# Der Morgen-Push läuft im Event-Loop, ohne ihn anzuhalten: je Push-Dienst
+# (FCM, Mozilla, Apple …) ein gepoolter Client — HTTP/2, wenn `h2`
+# installiert ist — und eine eigene Drossel (PUSH_ORIGIN_RATE), insgesamt
+# höchstens PUSH_CONCURRENCY Sends gleichzeitig. 429 und 5xx werden mit
+# Backoff wiederholt (Retry-After hat Vorrang), 404/410 heißt: Abo erloschen.
+PUSH_CONCURRENCY = int(os.getenv("PUSH_CONCURRENCY", "64"))
+PUSH_ORIGIN_RATE = float(os.getenv("PUSH_ORIGIN_RATE", "100"))  # Sends/Sekunde je Dienst
+PUSH_MAX_RETRIES = int(os.getenv("PUSH_MAX_RETRIES", "3"))
+_PUSH_BUCKETS: Dict[str, _TokenBucket] = {}
+_PUSH_VAPID: Any = None
+# VAPID-JWTs gelten 12 h und sind für alle Abos eines Push-Dienstes gleich:
+# einmal signieren, wiederverwenden bis kurz vor Ablauf.
+_PUSH_VAPID_TTL = 12 * 3600
+_PUSH_VAPID_MARGIN = 3600
+_PUSH_VAPID_CACHE: Dict[str, Tuple[float, Dict[str, str]]] = {}
+# Die Verschlüsselung (ECDH + AES-GCM, ≈ 0,3 ms je Abo) läuft in einem
+# Prozess-Pool statt auf dem Event-Loop-Thread; 0 = im Loop verschlüsseln.
+PUSH_ENCRYPT_WORKERS = int(os.getenv("PUSH_ENCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PUSH_ENCRYPT_CHUNK = 128
+_PUSH_POOL: Any = None
+_PUSH_LAST_RUN: Dict[str, Any] = {}
+
+def _push_origin(endpoint: str) -> str:
+    u = urlparse(endpoint)
+    return f"{u.scheme}://{u.netloc}"
+
+def _push_client(origin: str) -> httpx.AsyncClient:
+    return _loop_local(_HTTP_CLIENTS, "push:" + origin, lambda: httpx.AsyncClient(
+        http2=_HAS_H2, timeout=15,
+        limits=httpx.Limits(max_connections=PUSH_CONCURRENCY, max_keepalive_connections=PUSH_CONCURRENCY)))
+
+def _push_bucket(origin: str) -> _TokenBucket:
+    bucket = _PUSH_BUCKETS.get(origin)
+    if bucket is None:
+        bucket = _PUSH_BUCKETS[origin] = _TokenBucket(PUSH_ORIGIN_RATE, PUSH_ORIGIN_RATE)
+    return bucket
+
+def _push_vapid_headers(origin: str) -> Dict[str, str]:
+    """Authorization-Header für einen Push-Dienst, gecacht bis eine Stunde
+    vor Ablauf des JWT."""
+    global _PUSH_VAPID
+    now = time.time()
+    hit = _PUSH_VAPID_CACHE.get(origin)
+    if hit is not None and hit[0] - now > _PUSH_VAPID_MARGIN:
+        return dict(hit[1])
+    if _PUSH_VAPID is None:
+        _PUSH_VAPID = _Vapid.from_string(private_key=VAPID_PRIVATE_KEY)
+    exp = int(now) + _PUSH_VAPID_TTL
+    headers = dict(_PUSH_VAPID.sign({"sub": VAPID_SUBJECT, "aud": origin, "exp": exp}))
+    headers.update({"Content-Encoding": "aes128gcm", "TTL": "0"})
+    _PUSH_VAPID_CACHE[origin] = (exp, headers)
+    return dict(headers)
+
+def _push_encrypt_chunk(subs: List[Dict[str, Any]], payload: bytes) -> List[Optional[bytes]]:
+    """Verschlüsselt `payload` für jedes Abo (aes128gcm, RFC 8291) — läuft im
+    Prozess-Pool. Kaputte Abo-Schlüssel ergeben None statt den ganzen
+    Block scheitern zu lassen."""
+    out: List[Optional[bytes]] = []
     for sub in subs:
         try:
-            _webpush(subscription_info=sub, data=payload,
-                     vapid_private_key=VAPID_PRIVATE_KEY,
-                     vapid_claims={"sub": VAPID_SUBJECT})
-            alive.append(sub); sent += 1
-        except _WebPushException as e:
-            code = getattr(getattr(e, "response", None), "status_code", None)
-            if code in (404, 410):
-                continue  # Abo ist erloschen
-            print(f"push send failed ({code}): {e}")
-            alive.append(sub)
-    _push_save(alive)
-    return sent
-
-async def _push_scheduler():
-    import asyncio
-    from zoneinfo import ZoneInfo
-    tz = ZoneInfo("Europe/Berlin")
+            out.append(_WebPusher(sub).encode(payload, "aes128gcm")["body"])
+        except Exception as e:
+            print(f"push encrypt failed ({_push_origin(sub.get('endpoint', ''))}): {e}")
+            out.append(None)
+    return out
+
+def _push_pool():
+    """Prozess-Pool für die Verschlüsselung, erst beim ersten Bedarf — nur
+    der Worker mit der Push-Lease braucht ihn. Unter Linux per fork: die
+    Kinder erben das geladene Modul und müssen main.py nicht neu
+    importieren (das kostet Sekunden)."""
+    global _PUSH_POOL
+    if _PUSH_POOL is None and PUSH_ENCRYPT_WORKERS > 0:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        _PUSH_POOL = ProcessPoolExecutor(PUSH_ENCRYPT_WORKERS, mp_context=multiprocessing.get_context(method))
+    return _PUSH_POOL
+
+async def _push_encrypt_many(subs: List[Dict[str, Any]], payload: bytes) -> List[Optional[bytes]]:
+    pool = _push_pool()
+    if pool is None:
+        return _push_encrypt_chunk(subs, payload)
+    loop = asyncio.get_running_loop()
+    chunks = [subs[i:i + PUSH_ENCRYPT_CHUNK] for i in range(0, len(subs), PUSH_ENCRYPT_CHUNK)]
     try:
-        hour, minute = (int(x) for x in PUSH_TIME.split(":"))
-    except ValueError:
-        hour, minute = 8, 0
-    while True:
-        now = dt.datetime.now(tz)
-        target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-        if target <= now:
-            target += dt.timedelta(days=1)
-        await asyncio.sleep((target - now).total_seconds())
+        parts = await asyncio.gather(*(loop.run_in_executor(pool, _push_encrypt_chunk, c, payload)
+                                       for c in chunks))
+    except Exception as e:  # BrokenProcessPool o. ä. — dann eben im Loop
+        print(f"push encrypt pool failed, encrypting inline: {e}")
+        return _push_encrypt_chunk(subs, payload)
+    return [body for part in parts for body in part]
+
+async def _warm_push_pool() -> None:
+    """Pool hochfahren, sobald dieser Worker die Lease hat — nicht erst
+    mitten im ersten Versand."""
+    pool = _push_pool()
+    if pool is not None:
         try:
-            n = _push_send_all()
-            print(f"morning push sent to {n} subscriptions")
+            await asyncio.get_running_loop().run_in_executor(pool, int)
         except Exception as e:
-            print(f"push scheduler error: {e}")
+            print(f"push encrypt pool failed to start: {e}")
+
+@app.on_event("shutdown")
+def _stop_push_pool():
+    global _PUSH_POOL
+    if _PUSH_POOL is not None:
+        # Mit wait=True: sonst räumt der atexit-Hook von concurrent.futures
+        # einen halb geschlossenen Pool ab (EBADF).
+        _PUSH_POOL.shutdown(wait=True, cancel_futures=True)
+        _PUSH_POOL = None
+
+def _push_backoff(attempt: int, retry_after: Optional[str]) -> float:
+    try:
+        return min(60.0, max(0.0, float(retry_after)))
+    except (TypeError, ValueError):
+        return min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+async def _push_deliver(sub: Dict[str, Any], body: Optional[bytes]) -> Tuple[str, float]:
+    """Ein Abo mit der bereits verschlüsselten Nachricht beliefern.
+    → ("sent" | "expired" | "failed", Sekunden)."""
+    t0 = time.monotonic()
+    if body is None:
+        return "failed", 0.0
+    origin = _push_origin(sub["endpoint"])
+    try:
+        headers = _push_vapid_headers(origin)
+    except Exception as e:
+        print(f"push VAPID signing failed ({origin}): {e}")
+        return "failed", 0.0
+    code: Optional[int] = None
+    for attempt in range(PUSH_MAX_RETRIES + 1):
+        await _push_bucket(origin).acquire()
+        retry_after = None
+        try:
+            r = await _push_client(origin).post(sub["endpoint"], content=body, headers=headers)
+            code, retry_after = r.status_code, r.headers.get("retry-after")
+        except httpx.HTTPError as e:
+            code = None
+            print(f"push send error ({origin}): {e}")
+        if code is not None and code < 300:
+            return "sent", time.monotonic() - t0
+        if code in (404, 410):
+            return "expired", time.monotonic() - t0
+        if code is not None and code < 500 and code != 429:
+            break  # 400/413 & Co.: eine Wiederholung ändert nichts
+        if attempt < PUSH_MAX_RETRIES:
+            await asyncio.sleep(_push_backoff(attempt, retry_after))
+    print(f"push send failed ({code}): {origin}")
+    return "failed", time.monotonic() - t0
+
+async def _push_fan_out(pages, payload: bytes) -> Tuple[List[Tuple[str, str, float]], float]:
+    """Beliefert alle Abos aus `pages` (Listen von Abos) nebenläufig.
+    → ([(endpoint, status, Sekunden)], Laufzeit)."""
+    slots = asyncio.Semaphore(max(1, PUSH_CONCURRENCY))
+    results: List[Tuple[str, str, float]] = []
+    running: set = set()
+
+    async def _one(sub, body):
+        try:
+            status, sec = await _push_deliver(sub, body)
+            results.append((sub["endpoint"], status, sec))
+        finally:
+            slots.release()
+
+    def _encrypt(page):
+        return asyncio.ensure_future(_push_encrypt_many(page, payload)) if page else None
+
+    t0 = time.monotonic()
+    # Seite für Seite: während die Sends einer Seite laufen, verschlüsselt
+    # der Pool schon die nächste. Neue Sends starten erst, wenn ein Slot frei
+    # ist — der Speicher wächst nicht mit der Zahl der Abos.
+    page = next(pages, None)
+    encrypting = _encrypt(page)
+    while page:
+        bodies = await encrypting
+        upcoming = next(pages, None)
+        encrypting = _encrypt(upcoming)
+        for sub, body in zip(page, bodies):
+            await slots.acquire()
+            task = asyncio.ensure_future(_one(sub, body))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        page = upcoming
+    if running:
+        await asyncio.gather(*running)
+    return results, time.monotonic() - t0
+
+def _push_stats(results: List[Tuple[str, str, float]], elapsed: float, expired: int) -> Dict[str, Any]:
+    latencies = sorted(sec for _, status, sec in results if status == "sent")
+    sent = len(latencies)
+    stats = {
+        "total": len(results), "sent": sent, "expired": expired,
+        "failed": sum(1 for _, status, _ in results if status == "failed"),
+        "seconds": round(elapsed, 3),
+        "sendsPerSec": round(sent / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50Ms": round(_percentile(latencies, 50) * 1000, 1),
+        "p95Ms": round(_percentile(latencies, 95) * 1000, 1),
+        "p99Ms": round(_percentile(latencies, 99) * 1000, 1),
+    }
+    _PUSH_LAST_RUN.clear()
+    _PUSH_LAST_RUN.update(stats, at=dt.datetime.now(dt.timezone.utc).isoformat())
+    return stats
+
+async def _push_send_all() -> Dict[str, Any]:
+    """Die Tageslage sofort an alle Abos (ohne Zustellfenster); tote
+    Endpoints (404/410) räumen wir weg. Liefert die Laufstatistik
+    (Durchsatz, Latenz-Perzentile)."""
+    store = _push_store()
+    results, elapsed = await _push_fan_out(store.pages(), _push_payload().encode("utf-8"))
+    expired = [endpoint for endpoint, status, _ in results if status == "expired"]
+    store.delete_many(expired)
+    return _push_stats(results, elapsed, len(expired))
+
+async def _run_push_scheduler() -> None:
+    global _PUSH_SCHEDULER
+    _PUSH_SCHEDULER = scheduler = _PushScheduler()
+    try:
+        await _warm_push_pool()
+        await scheduler.run()
+    finally:
+        if _PUSH_SCHEDULER is scheduler:
+            _PUSH_SCHEDULER = None
+
+_LEADER_TASKS: List[asyncio.Task] = []
 
 @app.on_event("startup")
 async def _start_push_scheduler():
+    # Nur der Worker mit der Lease verschickt; die anderen nehmen weiter Abos an.
     if _push_enabled():
-        import asyncio
-        asyncio.create_task(_push_scheduler())
+        lease = _Lease(SCHEDULER_LEASE_PATH, "push", SCHEDULER_LEASE_TTL)
+        _LEADER_TASKS.append(asyncio.create_task(_run_as_leader(lease, _run_push_scheduler)))
+
+@app.on_event("shutdown")
+async def _stop_leader_tasks():
+    # Lease sofort freigeben, damit ein anderer Worker nicht die TTL abwarten muss.
+    for task in _LEADER_TASKS:
+        task.cancel()
+    await asyncio.gather(*_LEADER_TASKS, return_exceptions=True)
+    _LEADER_TASKS.clear()
 
 
 # ---------------------------------------------------------------------------
@@ -2281,14 +4875,9 @@ I-Ging {today['hexagram']['index']} „{today['hexagram']['name']}“ ({today['h
 Tageszeichen {today['ganzhi']['label']}.
 
 Zug: Der Stein „{stone_label}“ zieht auf Feld {field['index']} „{field['name']}“ — {field['core']}.
-Profil: Sternzeichen {sun}, Lebenszahl {lp}.
-
-Schreibe 2–3 kurze Sätze Deutung dieses Zuges für den Lebensbereich {stone_label} —
-wie eine gute Freundin, die dir beim Kaffee etwas mitgibt. Der letzte Satz ist
-der „Satz für heute“: ein kleiner, konkreter Alltags-Impuls im Imperativ, der
-bis heute Abend machbar ist. Keine Aufzählung, keine Überschrift, keine
-medizinisch/juristisch/finanziell heiklen Ratschläge."""
-    return _tone_directive(None), user, today
+Profil: Sternzeichen {sun}, Lebenszahl {lp}."""
+    # Derselbe Prompt wie /board/move, damit der Vergleich die Produktion zeigt.
+    return _voice_system(None), _BOARD_MOVE_TASK, user, today
 
 def _compare_page(body: str) -> Response:
     page = f"""<!doctype html><html lang="de"><head><meta charset="utf-8">
@@ -2305,6 +4894,7 @@ font-size:16px;cursor:pointer}}details{{margin-top:14px}}summary{{cursor:pointer
 <h1>🔬 LLM-Blindvergleich</h1>{body}</body></html>"""
     return Response(content=page, media_type="text/html; charset=utf-8")
 
+@_with_llm_deadline(lambda: LLM_DEADLINE_SECONDS)
 async def _compare_impl(birthDate: Optional[str], stone: str):
     if _anthropic_client is None:
         return _compare_page(
@@ -2326,14 +4916,18 @@ in zufälliger Reihenfolge, damit du blind entscheiden kannst.</p>
     if re.match(r'^\d{4}-\d{2}-\d{2}$', birthDate.strip()):
         y, m, d = birthDate.strip().split('-')
         birthDate = f"{d}.{m}.{y}"
-    system, user, today = _compare_prompt(birthDate[:32], stone[:16])
-    results = {}
-    for prov in ("openai", "anthropic"):
+    system, prefix, user, today = _compare_prompt(birthDate[:32], stone[:16])
+    # Beide Provider parallel — der Vergleich dauert so lang wie der
+    # langsamere Call, nicht wie die Summe.
+    async def _one(prov: str) -> str:
         try:
-            results[prov] = llm_text(system, user, temperature=0.8, provider=prov)
+            return await llm_text(system, user, temperature=0.8, provider=prov, endpoint="compare",
+                                  prefix=prefix)
         except Exception as e:
             print(f"compare: {prov} failed: {e}")
-            results[prov] = f"[{prov} fehlgeschlagen: {e}]"
+            return f"[{prov} fehlgeschlagen: {e}]"
+    provs = ("openai", "anthropic")
+    results = dict(zip(provs, await asyncio.gather(*(_one(p) for p in provs))))
     # Deterministische, aber tagesabhängige Zuordnung A/B — nicht erratbar
     # ohne Auflösung, aber reproduzierbar beim Neuladen.
     flip = _det_hash("compare", birthDate, today["date"]) % 2 == 1
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Vergleicht die CLASSIC_PIPELINE-Modi (serial / sections / single).
+
+    python3 scripts/bench_classic_pipeline.py            # simuliertes LLM
+    python3 scripts/bench_classic_pipeline.py --live -n 3
+
+Ohne --live antwortet ein Fake-Client mit künstlicher Latenz: feste
+Zeit bis zum ersten Token plus Ausgabelänge / Tokenrate. Das misst nur
+die Struktur der Pipeline (wie viele Calls hintereinander), nicht das
+Modell. Mit --live gehen die Anfragen an den konfigurierten Provider
+(OPENAI_API_KEY / LLM_PROVIDER); die Texte werden zum Gegenlesen
+ausgegeben, denn schneller zählt nur, wenn die Qualität hält.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+MODES = ("serial", "sections", "single")
+# Grobe Ausgabelängen in Tokens je Prompt-Art (Fake-Modus).
+_OUT_TOKENS = {"outline": 250, "section": 120, "full": 450}
+
+
+class _FakeCompletions:
+    def __init__(self, ttft: float, tps: float):
+        self.ttft, self.tps, self.calls = ttft, tps, 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        prompt = kwargs["messages"][-1]["content"]
+        if "OUTLINE als JSON" in prompt:
+            kind, payload = "outline", {k: {"kern": "k", "punkte": ["p"]} for k in ("fokus", "beruf", "liebe", "energie")}
+        elif "Schreibe NUR den Abschnitt" in prompt:
+            key = next(k for k in ("fokus", "beruf", "liebe", "energie") if f'{{"{k}": "Absatz"}}' in prompt)
+            kind, payload = "section", {key: f"{key.title()}-Absatz."}
+        else:
+            kind, payload = "full", {k: f"{k.title()}-Absatz." for k in ("fokus", "beruf", "liebe", "energie")}
+        await asyncio.sleep(self.ttft + _OUT_TOKENS[kind] / self.tps)
+        msg = type("M", (), {"content": json.dumps(payload)})()
+        return type("R", (), {"choices": [type("C", (), {"message": msg})()]})()
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def _bench(main, mode: str, n: int, fake):
+    main.CLASSIC_PIPELINE = mode
+    req = main.ReadingRequest(birthDate="27.07.1966", birthPlace="Bad Saulgau",
+                              coords={"lat": 48.02, "lon": 9.5}, birthTime="13:30",
+                              period="day", readingType="classic")
+    times, last = [], None
+    for _ in range(n):
+        main._READING_CACHE.clear()
+        main._LLM_CACHE.clear()
+        main._OUTLINE_CACHE.clear()
+        t0 = time.perf_counter()
+        last = await main._reading_impl(req)
+        times.append(time.perf_counter() - t0)
+    calls = fake.calls if fake else None
+    if fake:
+        fake.calls = 0
+    return times, calls, last
+
+
+def main_cli(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-n", type=int, default=3, help="Durchläufe je Modus")
+    ap.add_argument("--modes", default=",".join(MODES))
+    ap.add_argument("--live", action="store_true", help="echten Provider nutzen")
+    ap.add_argument("--ttft", type=float, default=0.6, help="Fake: Sekunden bis zum ersten Token")
+    ap.add_argument("--tps", type=float, default=60.0, help="Fake: Ausgabe-Tokens pro Sekunde")
+    args = ap.parse_args(argv)
+
+    if not args.live:
+        os.environ.setdefault("OPENAI_API_KEY", "sk-bench-placeholder")
+    os.environ["READING_CACHE_BACKEND"] = "memory"
+    os.environ["LLM_CACHE_PATH"] = ""
+    os.environ["LLM_LOG_USAGE"] = "0"
+    import main
+
+    fake = None
+    if not args.live:
+        fake = _FakeCompletions(args.ttft, args.tps)
+        main.client = type("C", (), {"chat": type("X", (), {"completions": fake})()})()
+        main.LLM_PROVIDER = "openai"
+
+    print(f"{'Modus':<10} {'p50 s':>8} {'p95 s':>8} {'Calls':>6}")
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        times, calls, resp = asyncio.run(_bench(main, mode, args.n, fake))
+        per_run = "-" if calls is None else f"{calls / args.n:.0f}"
+        print(f"{mode:<10} {_pct(times, 50):>8.2f} {_pct(times, 95):>8.2f} {per_run:>6}")
+        if args.live and resp is not None:
+            for s in resp.sections:
+                print(f"    [{s.title}] {s.text}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
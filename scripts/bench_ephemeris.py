@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Charts/Sekunde der Swiss-Ephemeris-Engine, vorher/nachher.
+
+    python3 scripts/bench_ephemeris.py               # 20 000 Anfragen, 2 000 Profile
+    python3 scripts/bench_ephemeris.py -n 50000 --profiles 500
+
+"ungecacht" ruft die Rechnung für jede Anfrage neu auf (Stand vor dem
+LRU), "gecacht" geht über swe_compute (LRU, Kopie des Ergebnisses), "Batch"
+über swe_compute_many. Die Anfragen ziehen zufällig aus einer festen Zahl
+Geburtsprofile — so wie echte Nutzer dieselben Daten immer wieder schicken.
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-placeholder")
+
+
+def _profiles(n: int, rng: random.Random):
+    out = []
+    for _ in range(n):
+        d = dt.date(1940, 1, 1) + dt.timedelta(days=rng.randrange(365 * 70))
+        t = dt.time(rng.randrange(24), rng.randrange(60))
+        out.append((d, t, rng.uniform(46.0, 55.0), rng.uniform(5.5, 17.0), "Europe/Berlin"))
+    return out
+
+
+def _rate(label: str, n: int, seconds: float) -> None:
+    print(f"{label:<12} {n / seconds:>10,.0f} Charts/s  ({seconds * 1000:,.0f} ms)")
+
+
+def main_cli(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-n", type=int, default=20000, help="Anzahl Anfragen")
+    ap.add_argument("--profiles", type=int, default=2000, help="verschiedene Geburtsprofile")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+
+    import main
+    if not main.HAS_SWE:
+        print("pyswisseph ist nicht installiert.")
+        return 1
+    rng = random.Random(args.seed)
+    profiles = _profiles(args.profiles, rng)
+    requests = [rng.choice(profiles) for _ in range(args.n)]
+    uncached = main._swe_chart.__wrapped__
+
+    t0 = time.perf_counter()
+    for item in requests:
+        uncached(*main._swe_key(*item))
+    _rate("ungecacht", args.n, time.perf_counter() - t0)
+
+    main._swe_chart.cache_clear()
+    t0 = time.perf_counter()
+    for item in requests:
+        main.swe_compute(*item)
+    _rate("gecacht", args.n, time.perf_counter() - t0)
+
+    main._swe_chart.cache_clear()
+    t0 = time.perf_counter()
+    main.swe_compute_many(requests)
+    _rate("Batch", args.n, time.perf_counter() - t0)
+    print(main._swe_chart.cache_info())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Vergleicht Board-Kurztexte mit und ohne Micro-Batching (LLM_MICROBATCH_MS).
+
+    python3 scripts/bench_microbatch.py                    # simuliertes LLM
+    python3 scripts/bench_microbatch.py --rate 80 -n 400 --windows 0,50,100,200
+    python3 scripts/bench_microbatch.py --live -n 20 --windows 0,100
+
+Simuliert die 08:00-Spitze: n /board/move-Prompts treffen mit --rate pro
+Sekunde ein (Poisson). Der Fake-Client antwortet nach fester Zeit bis zum
+ersten Token plus Ausgabelänge / Tokenrate und lässt höchstens --slots
+Calls gleichzeitig zu (LLM_MAX_CONCURRENCY — das Rate-Limit des Keys).
+Gemessen werden beantwortete Prompts pro Sekunde, p50/p95 der Latenz je
+Prompt (Ankunft bis Antwort) und wie viele in den Fallback liefen (keine
+freie Spur innerhalb LLM_QUEUE_SECONDS). Mit --live gehen die Prompts an den konfigurierten
+Provider; die Antworten des letzten Fensters werden zum Gegenlesen
+ausgegeben — Batching zählt nur, wenn die Texte so gut bleiben wie einzeln.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+_OUT_TOKENS = 70  # ≈ 2–3 Sätze
+
+
+class _FakeCompletions:
+    def __init__(self, main, ttft: float, tps: float):
+        self.main, self.ttft, self.tps, self.calls = main, ttft, tps, 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        prompt = kwargs["messages"][-1]["content"]
+        if prompt.startswith(self.main._MICROBATCH_TASK):
+            n = prompt.count("\n\n[")
+            text = json.dumps({str(i): f"Deutung {i}." for i in range(1, n + 1)})
+        else:
+            n, text = 1, "Deutung."
+        await asyncio.sleep(self.ttft + n * _OUT_TOKENS / self.tps)
+        msg = type("M", (), {"content": text})()
+        return type("R", (), {"choices": [type("C", (), {"message": msg})()]})()
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def _bench(main, n: int, rate: float, rng: random.Random):
+    main._LLM_CACHE.clear()
+    main._LLM_POOLS.clear()
+    latencies, results, failed = [], [], []
+
+    async def one(i: int, delay: float):
+        await asyncio.sleep(delay)
+        t0 = time.perf_counter()
+        user = f"Tageslage: Bench-Tag. Zug: Stein {i % 5} auf Feld {i % 30 + 1}. Profil: Nr. {i}."
+        try:
+            results.append(await main.oa_text(user, endpoint="board_move", prefix=main._BOARD_MOVE_TASK))
+        except Exception:
+            failed.append(i)
+            return
+        latencies.append(time.perf_counter() - t0)
+
+    arrivals, t = [], 0.0
+    for _ in range(n):
+        t += rng.expovariate(rate)
+        arrivals.append(t)
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i, at) for i, at in enumerate(arrivals)))
+    return len(results) / (time.perf_counter() - start), latencies or [0.0], results, len(failed)
+
+
+def main_cli(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-n", type=int, default=200, help="Prompts je Durchlauf")
+    ap.add_argument("--rate", type=float, default=20.0, help="eintreffende Prompts pro Sekunde")
+    ap.add_argument("--windows", default="0,50,100,200", help="Batch-Fenster in ms (0 = ohne)")
+    ap.add_argument("--max", type=int, default=16, help="LLM_MICROBATCH_MAX")
+    ap.add_argument("--slots", type=int, default=8, help="Fake: gleichzeitige Calls je Key")
+    ap.add_argument("--live", action="store_true", help="echten Provider nutzen")
+    ap.add_argument("--ttft", type=float, default=0.8, help="Fake: Sekunden bis zum ersten Token")
+    ap.add_argument("--tps", type=float, default=200.0, help="Fake: Ausgabe-Tokens pro Sekunde")
+    args = ap.parse_args(argv)
+
+    if not args.live:
+        os.environ.setdefault("OPENAI_API_KEY", "sk-bench-placeholder")
+        os.environ["LLM_MAX_CONCURRENCY_OPENAI"] = str(args.slots)
+    os.environ["LLM_CACHE_PATH"] = ""
+    os.environ["LLM_LOG_USAGE"] = "0"
+    import main
+
+    fake = None
+    if not args.live:
+        fake = _FakeCompletions(main, args.ttft, args.tps)
+        main.client = type("C", (), {"chat": type("X", (), {"completions": fake})()})()
+        main.LLM_PROVIDER = "openai"
+    main.LLM_MICROBATCH_MAX = args.max
+
+    print(f"{'Fenster ms':>10} {'Prompts/s':>10} {'p50 s':>8} {'p95 s':>8} {'Calls':>6} {'Fehler':>6}")
+    results = []
+    for window in [float(w) for w in args.windows.split(",") if w.strip()]:
+        main.LLM_MICROBATCH_MS = window
+        main._METRICS.clear()
+        throughput, latencies, results, failed = asyncio.run(_bench(main, args.n, args.rate, random.Random(7)))
+        calls = sum(c.get("calls", 0) for c in main._METRICS.get("llmTokens", {}).values())
+        print(f"{window:>10.0f} {throughput:>10.1f} {_pct(latencies, 50):>8.2f} "
+              f"{_pct(latencies, 95):>8.2f} {calls:>6} {failed:>6}")
+    if args.live:
+        for text in results[:5]:
+            print(f"    {text}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
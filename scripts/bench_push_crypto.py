@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Kosten für Verschlüsseln + VAPID-Signieren des Morgen-Pushs.
+
+    python3 scripts/bench_push_crypto.py                 # 10 000 Abos
+    python3 scripts/bench_push_crypto.py -n 2000 --workers 4
+
+"vorher" ist der alte Weg pro Abo: ein frisches VAPID-JWT signieren und die
+Nachricht verschlüsseln, alles auf dem Event-Loop-Thread. "nachher" nimmt
+die je Push-Dienst gecachten VAPID-Header und verschlüsselt im
+Prozess-Pool (PUSH_ENCRYPT_WORKERS). Gemessen werden die Wandzeit und die
+Zeit, in der der Event-Loop-Thread selbst rechnet — die blockiert /health,
+/reading & Co. Zahlen auf 10 000 Abos hochgerechnet.
+"""
+import argparse
+import asyncio
+import base64
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-placeholder")
+
+ORIGINS = ("https://fcm.googleapis.com", "https://updates.push.services.mozilla.com",
+           "https://web.push.apple.com")
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _subscriptions(n: int):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    subs = []
+    for i in range(n):
+        pub = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+            serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint)
+        subs.append({"endpoint": f"{ORIGINS[i % len(ORIGINS)]}/send/{i}",
+                     "keys": {"p256dh": _b64(pub), "auth": _b64(os.urandom(16))}})
+    return subs
+
+
+def _report(label: str, n: int, wall: float, loop_cpu: float) -> None:
+    k = 10000 / n
+    print(f"{label:<8} {wall * k:>8.2f} s Wandzeit   {loop_cpu * k:>8.2f} s auf dem Event-Loop  (je 10k Abos)")
+
+
+def main_cli(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-n", type=int, default=10000, help="Anzahl Abos")
+    ap.add_argument("--workers", type=int, default=None, help="Prozess-Pool-Größe (Default wie PUSH_ENCRYPT_WORKERS)")
+    args = ap.parse_args(argv)
+
+    from cryptography.hazmat.primitives.asymmetric import ec
+    vapid = ec.generate_private_key(ec.SECP256R1())
+    os.environ["VAPID_PRIVATE_KEY"] = _b64(vapid.private_numbers().private_value.to_bytes(32, "big"))
+    if args.workers is not None:
+        os.environ["PUSH_ENCRYPT_WORKERS"] = str(args.workers)
+    import main
+    if main._WebPusher is None:
+        print("pywebpush ist nicht installiert.")
+        return 1
+
+    subs = _subscriptions(args.n)
+    payload = main._push_payload().encode("utf-8")
+    vapid_signer = main._Vapid.from_string(private_key=main.VAPID_PRIVATE_KEY)
+
+    # vorher: je Abo signieren + verschlüsseln, alles im Loop-Thread
+    t0, c0 = time.perf_counter(), time.thread_time()
+    for sub in subs:
+        claims = {"sub": main.VAPID_SUBJECT, "aud": main._push_origin(sub["endpoint"]),
+                  "exp": int(time.time()) + 12 * 3600}
+        vapid_signer.sign(claims)
+        main._WebPusher(sub).encode(payload, "aes128gcm")
+    _report("vorher", args.n, time.perf_counter() - t0, time.thread_time() - c0)
+
+    # nachher: VAPID-Cache + Prozess-Pool
+    async def _after():
+        main._push_pool()
+        if main._PUSH_POOL is not None:
+            main._PUSH_POOL.submit(int).result()  # Pool hochfahren, nicht mitmessen
+        t0, c0 = time.perf_counter(), time.thread_time()
+        for sub in subs:
+            main._push_vapid_headers(main._push_origin(sub["endpoint"]))
+        for i in range(0, len(subs), main._PushStore.PAGE):
+            await main._push_encrypt_many(subs[i:i + main._PushStore.PAGE], payload)
+        return time.perf_counter() - t0, time.thread_time() - c0
+
+    wall, cpu = asyncio.run(_after())
+    _report("nachher", args.n, wall, cpu)
+    print(f"Pool: {main.PUSH_ENCRYPT_WORKERS} Prozesse, {len(main._PUSH_VAPID_CACHE)} VAPID-Signaturen")
+    main._stop_push_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
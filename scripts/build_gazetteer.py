@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Baut den Offline-Ortsindex für geocode() aus GeoNames-Dumps.
+
+    python3 scripts/build_gazetteer.py DE.zip AT.zip CH.zip
+    python3 scripts/build_gazetteer.py cities500.zip --countries DE,AT,CH,LI,IT,FR,NL
+
+Quellen: https://download.geonames.org/export/dump/ (CC BY 4.0 — wer den
+Index ausliefert, nennt GeoNames als Quelle). Gelesen werden die
+TSV-Dumps direkt oder gezippt; optional liefert `--admin1
+admin1CodesASCII.txt` das Bundesland für die Anzeige („Bad Saulgau,
+Baden-Württemberg, Deutschland“).
+
+Ergebnis: data/gazetteer.bin (GAZETTEER_PATH). Das Format ist für mmap
+gebaut — main.py öffnet die Datei beim ersten Lookup und liest nur die
+Seiten, die die Binärsuche berührt:
+
+    Header  16 B   b"HGZ1", Anzahl n, Offset des String-Blobs, 0
+    Index   n×26 B key_off, key_len, disp_len, disp_off, lat·1e5, lon·1e5,
+                   Einwohner, Ländercode — sortiert nach Schlüssel (UTF-8-
+                   Bytes), bei gleichem Schlüssel der beste Treffer zuerst
+    Blob           Schlüssel und Anzeigenamen als UTF-8
+
+Schlüssel sind normalisierte Namen (siehe `norm`, identisch zu
+`main._gazetteer_norm`): Name, ASCII-Name und lateinische Alternativnamen.
+Bei Namensgleichheit gewinnt DACH vor dem Rest, der Hauptname vor einem
+Alternativnamen, dann die Einwohnerzahl — dieselbe DACH-zuerst-Logik wie
+der erste Nominatim-Pass.
+"""
+import argparse
+import io
+import os
+import re
+import struct
+import sys
+import unicodedata
+import zipfile
+
+MAGIC = b"HGZ1"
+HEADER = struct.Struct("<4sIII")
+ENTRY = struct.Struct("<IHHIiiI2s")
+DACH = {"DE", "AT", "CH"}
+COUNTRY_NAMES = {
+    "DE": "Deutschland", "AT": "Österreich", "CH": "Schweiz", "LI": "Liechtenstein",
+    "IT": "Italien", "FR": "Frankreich", "NL": "Niederlande", "BE": "Belgien",
+    "LU": "Luxemburg", "PL": "Polen", "CZ": "Tschechien", "DK": "Dänemark",
+}
+_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+
+def norm(name: str) -> str:
+    """Umlaute ausschreiben, Akzente weg, Satzzeichen/Bindestriche zu
+    Leerzeichen — „Bad-Saulgau“, „bad saulgau“ und „BAD SAULGAU“ fallen
+    zusammen, „München“ und „Muenchen“ ebenso."""
+    s = (name or "").casefold().translate(_UMLAUTS)
+    s = "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", s).split())
+
+
+def _open_dump(path: str):
+    if path.endswith(".zip"):
+        zf = zipfile.ZipFile(path)
+        inner = next(n for n in zf.namelist() if n.endswith(".txt") and not n.startswith("readme"))
+        return io.TextIOWrapper(zf.open(inner), encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def load_admin1(path: str) -> dict:
+    names = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            code, name, *_ = line.rstrip("\n").split("\t")
+            names[code] = name
+    return names
+
+
+def parse_geonames(lines, countries=None, min_population=0, admin1=None):
+    """GeoNames-Zeilen → (schlüssel, rang, anzeige, lat, lon, einwohner, land).
+
+    Nur besiedelte Orte (Feature-Klasse P). Der Rang sortiert innerhalb
+    eines Schlüssels: kleiner ist besser."""
+    admin1 = admin1 or {}
+    for line in lines:
+        cols = line.rstrip("\n").split("\t")
+        if len(cols) < 15 or cols[6] != "P":
+            continue
+        cc = cols[8].upper()
+        if countries and cc not in countries:
+            continue
+        population = int(cols[14] or 0)
+        if population < min_population:
+            continue
+        lat, lon = float(cols[4]), float(cols[5])
+        region = admin1.get(f"{cc}.{cols[10]}")
+        suffix = ", ".join(p for p in (region, COUNTRY_NAMES.get(cc, cc)) if p)
+        variants = [(cols[1], 0), (cols[2], 0)]
+        variants += [(alt, 1) for alt in cols[3].split(",") if alt]
+        seen = set()
+        for label, is_alt in variants:
+            key = norm(label)
+            if len(key) < 2 or key in seen or not _latin(label):
+                continue
+            seen.add(key)
+            rank = (0 if cc in DACH else 1, is_alt, -population)
+            yield key, rank, f"{label}, {suffix}", lat, lon, population, cc
+
+
+def _latin(label: str) -> bool:
+    """Nur lateinische Schreibweisen indizieren (keine kyrillischen o. ä.
+    Alternativnamen — die tippt hier niemand)."""
+    return all(ord(c) < 0x250 or unicodedata.combining(c) for c in label)
+
+
+def write_index(rows, path: str) -> int:
+    """Schreibt den Index; bei Namensgleichheit bleibt nur der beste Treffer."""
+    best = {}
+    for key, rank, display, lat, lon, population, cc in rows:
+        if key not in best or rank < best[key][0]:
+            best[key] = (rank, display, lat, lon, population, cc)
+    keys = sorted(best, key=lambda k: k.encode("utf-8"))
+    blob = bytearray()
+    entries = []
+    for key in keys:
+        _rank, display, lat, lon, population, cc = best[key]
+        kb, db = key.encode("utf-8"), display.encode("utf-8")[:65535]
+        key_off = len(blob); blob += kb
+        disp_off = len(blob); blob += db
+        entries.append(ENTRY.pack(key_off, len(kb), len(db), disp_off,
+                                  round(lat * 1e5), round(lon * 1e5),
+                                  min(population, 2**32 - 1), cc.encode("ascii")[:2].ljust(2)))
+    blob_offset = HEADER.size + ENTRY.size * len(entries)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(entries), blob_offset, 0))
+        for e in entries:
+            f.write(e)
+        f.write(blob)
+    os.replace(tmp, path)  # atomar — ein laufender Server sieht nie eine halbe Datei
+    return len(entries)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("dumps", nargs="+", help="GeoNames-Dumps (.txt oder .zip)")
+    ap.add_argument("--out", default="data/gazetteer.bin")
+    ap.add_argument("--countries", default="DE,AT,CH",
+                    help="komma-separierte Ländercodes, leer = alle")
+    ap.add_argument("--min-population", type=int, default=0)
+    ap.add_argument("--admin1", help="admin1CodesASCII.txt für Bundesland-Anzeige")
+    args = ap.parse_args(argv)
+    countries = {c.strip().upper() for c in args.countries.split(",") if c.strip()}
+    admin1 = load_admin1(args.admin1) if args.admin1 else None
+
+    def rows():
+        for path in args.dumps:
+            with _open_dump(path) as f:
+                yield from parse_geonames(f, countries, args.min_population, admin1)
+
+    n = write_index(rows(), args.out)
+    print(f"{n} Schlüssel → {args.out} ({os.path.getsize(args.out) / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Rechnet Reading-Jobs (/reading/jobs) in einem eigenen Prozess.
+
+    python3 scripts/reading_worker.py          # READING_JOB_WORKERS Jobs parallel
+    python3 scripts/reading_worker.py -c 8
+
+Zieht die Jobs aus derselben SQLite-Datei wie das Web (READING_JOBS_PATH)
+und skaliert so die LLM-Arbeit unabhängig von den Web-Workern: im Web
+READING_JOB_WORKERS=0 setzen, hier so viele parallele Jobs, wie die
+API-Keys hergeben. Beide Seiten brauchen READING_CACHE_BACKEND=sqlite mit
+gemeinsamem READING_CACHE_PATH, damit fertige Readings auch für /reading
+im Cache liegen. Nur auf demselben Host bzw. Volume wie das Web: Plattformen,
+die jeden Prozesstyp in einen eigenen Container legen (Railway, Heroku),
+teilen die SQLite-Dateien nicht. Ctrl-C gibt laufende Jobs an die
+Warteschlange zurück.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+
+def main_cli(argv=None) -> int:
+    import main
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-c", "--concurrency", type=int, default=max(1, main.READING_JOB_WORKERS),
+                    help="parallele Jobs in diesem Prozess")
+    args = ap.parse_args(argv)
+    if main.READING_CACHE_BACKEND != "sqlite":
+        print("Hinweis: READING_CACHE_BACKEND ist nicht sqlite — /reading sieht die "
+              "Ergebnisse dieses Workers nur über den Job, nicht über den Cache.")
+    print(f"reading worker: {args.concurrency} parallel, jobs in {main.READING_JOBS_PATH}")
+    try:
+        asyncio.run(main._run_reading_workers(args.concurrency))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Vergleicht die Trefferquote des Reading-Caches mit rohem und kanonischem Key.
+
+    python3 scripts/replay_cache_keys.py requests.jsonl
+    python3 scripts/replay_cache_keys.py --synth 2000
+    python3 scripts/replay_cache_keys.py requests.jsonl --steps 1,5,10 --no-geocode
+
+Liest ReadingRequest-Bodies (eine JSON-Zeile je Anfrage, wie /reading sie
+bekommt) und spielt sie in Reihenfolge gegen einen unbegrenzten Cache ab:
+Ein Treffer ist jede Anfrage, deren Schlüssel schon einmal vorkam. „roh“
+ist der frühere Schlüssel aus den unveränderten Strings, „kanonisch“ der
+aus main._canonical_reading (ISO-Datum/-Zeit, gerundete Koordinaten,
+Mixer in CACHE_MIXER_STEP-Schritten) — je --steps-Wert eine Zeile.
+
+Ohne Datei erzeugt --synth eine Mischung aus wenigen Profilen in
+typischen Schreibvarianten („1.2.1980“/„01.02.1980“, „Berlin“/„Berlin,
+Deutschland“, leicht verschobene Mixer-Regler), jeweils mit dem Seed, den
+das Web-Formular aus den rohen Eingaben bildet (stableSeed in
+src/main.ts) — wie echter Browser-Traffic. Orte löst geocode() auf
+(Offline-Gazetteer, sonst Nominatim); --no-geocode vergleicht nur die
+normalisierten Namen.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+_PROFILES = [
+    ("1.2.1980", "Berlin", "7:05"),
+    ("27.07.1966", "Bad Saulgau", "13:30"),
+    ("3.11.1992", "München", None),
+    ("15.5.1975", "Wien", "22:10"),
+    ("9.9.2001", "Zürich", None),
+]
+_PLACE_SUFFIXES = {"Berlin": ", Deutschland", "Bad Saulgau": ", Baden-Württemberg", "München": ", Bayern",
+                   "Wien": ", Österreich", "Zürich": ", Schweiz"}
+
+
+def _legacy_key(main, req) -> str:
+    """Der Schlüssel vor der Kanonisierung (rohe, nur getrimmte Strings)."""
+    return "|".join([
+        (req.birthDate or "").strip(),
+        (req.birthPlace or "").strip().lower(),
+        (req.birthTime or "").strip(),
+        (req.approxDaypart or "").strip().lower(),
+        (req.period or "day").strip().lower(),
+        (req.tone or "").strip().lower(),
+        (req.readingType or "classic").strip().lower(),
+        str(req.seed or ""),
+        repr(tuple(sorted((req.mixer or {}).items()))),
+        main._period_bucket(req.period),
+        main._llm_id(),
+    ])
+
+
+def _synth(main, n: int, rng: random.Random):
+    for _ in range(n):
+        date, place, btime = rng.choice(_PROFILES)
+        d, m, y = date.split(".")
+        field = rng.choice([date, f"{int(d):02d}.{int(m):02d}.{y}", f"{y}-{int(m):02d}-{int(d):02d}"])
+        # readForm(): ISO aus dem Datumsfeld geht deutsch raus, der Seed hasht das Feld
+        date = f"{int(d):02d}.{int(m):02d}.{y}" if "-" in field else field
+        place = rng.choice([place, place + _PLACE_SUFFIXES[place], place.upper(), place.lower()])
+        body = {"birthDate": date, "birthPlace": place, "period": rng.choice(["day", "day", "week"]),
+                "seed": main._form_seed(f"{field}|{place}")}
+        if btime:
+            h, mi = btime.split(":")
+            body["birthTime"] = rng.choice([btime, f"{int(h):02d}:{mi}"])
+        if rng.random() < 0.5:
+            astro = 40 + rng.uniform(-1.5, 1.5)
+            body["mixer"] = {"astro": round(astro, 1), "tarot": 30, "iching": round(70 - astro, 1)}
+        yield body
+
+
+def _load(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+async def _replay(main, bodies, steps, use_geocode: bool):
+    if not use_geocode:
+        async def _no_geocode(place):
+            return None
+        main.geocode = _no_geocode
+    reqs = [main.ReadingRequest.model_validate(b) for b in bodies]
+    rows = [("roh", len({_legacy_key(main, r) for r in reqs}))]
+    for step in steps:
+        main.CACHE_MIXER_STEP = step
+        keys = {(await main._canonical_reading(r))[1] for r in reqs}
+        rows.append((f"kanonisch {step} %", len(keys)))
+    return len(reqs), rows
+
+
+def main_cli(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("path", nargs="?", help="JSONL mit ReadingRequest-Bodies")
+    ap.add_argument("--synth", type=int, default=0, help="so viele synthetische Anfragen erzeugen")
+    ap.add_argument("--steps", default="5", help="CACHE_MIXER_STEP-Werte, komma-separiert")
+    ap.add_argument("--no-geocode", action="store_true", help="Orte nicht auflösen, nur Namen normalisieren")
+    args = ap.parse_args(argv)
+    if not args.path and not args.synth:
+        ap.error("Datei oder --synth angeben")
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-replay-placeholder")
+    os.environ["LLM_CACHE_PATH"] = ""
+    import main
+
+    bodies = list(_load(args.path)) if args.path else list(_synth(main, args.synth, random.Random(7)))
+    steps = [int(s) for s in args.steps.split(",") if s.strip()]
+    n, rows = asyncio.run(_replay(main, bodies, steps, not args.no_geocode))
+
+    print(f"{'Schlüssel':<16} {'Einträge':>9} {'Treffer':>8} {'Quote':>7}")
+    for name, distinct in rows:
+        print(f"{name:<16} {distinct:>9} {n - distinct:>8} {(n - distinct) / max(1, n):>7.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -498,7 +498,11 @@ async function appendPushButton(container: HTMLElement) {
           applicationServerKey: urlBase64ToUint8Array(key),
         });
         const j = sub.toJSON();
-        await api('/push/subscribe', { endpoint: j.endpoint, keys: j.keys });
+        await api('/push/subscribe', {
+          endpoint: j.endpoint,
+          keys: j.keys,
+          tz: Intl.DateTimeFormat().resolvedOptions().timeZone,
+        });
       }
     } catch {}
     setLabel();
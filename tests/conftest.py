@@ -9,6 +9,14 @@ if ROOT not in sys.path:
 
 os.environ.setdefault("OPENAI_API_KEY", "sk-test-placeholder")
 os.environ.setdefault("CORS_ALLOW_ORIGINS", "*")
+# Keine Cache-Dateien im Repo anlegen; Tests, die den Plattencache brauchen,
+# setzen ihn selbst auf tmp_path.
+os.environ.setdefault("GEOCODE_CACHE_PATH", "")
+os.environ.setdefault("LLM_CACHE_PATH", "")
+os.environ.setdefault("READING_JOBS_PATH", ":memory:")
+# Push-Verschlüsselung im Test-Prozess statt in geforkten Pool-Workern;
+# der Pool-Pfad hat einen eigenen Test.
+os.environ.setdefault("PUSH_ENCRYPT_WORKERS", "0")
 
 
 import pytest
@@ -23,3 +31,17 @@ def _disable_rate_limit():
     if getattr(main, "limiter", None) is not None:
         main.limiter.enabled = False
     yield
+
+
+@pytest.fixture(autouse=True)
+def _fresh_llm_cache():
+    """Jeder Test zählt seine LLM-Calls selbst — keine Treffer aus dem
+    LLM-Cache, kein offener Circuit Breaker und kein gedrosselter Key-Pool
+    eines vorherigen Tests."""
+    import main
+    main._LLM_CACHE.clear()
+    main._OUTLINE_CACHE.clear()
+    main._METRICS.clear()
+    main._LLM_BREAKERS.clear()
+    main._LLM_POOLS.clear()
+    yield
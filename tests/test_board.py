@@ -142,6 +142,22 @@ class TestBoardEndpoints:
         assert set(data["stones"]) == set(main.STONES)
         assert data["hexagram"]["name"] and data["ganzhi"]["label"]
 
+    def test_today_is_cached_per_day_and_rolls_over(self):
+        d = dt.date(2026, 4, 8)
+        assert main.board_today(d) is main.board_today(d)
+        nxt = main.board_today(d + dt.timedelta(days=1))
+        assert nxt["date"] == "2026-04-09" and nxt is not main.board_today(d)
+        assert main.board_today(d) == main._board_compute(d)
+
+    def test_today_http_caching(self):
+        r = client.get("/board/today")
+        etag = r.headers["etag"]
+        max_age = int(r.headers["cache-control"].split("max-age=")[1])
+        assert 0 < max_age <= 25 * 3600  # bis Mitternacht Berlin (inkl. Zeitumstellung)
+        again = client.get("/board/today", headers={"If-None-Match": etag})
+        assert again.status_code == 304 and not again.content
+        assert client.get("/board/today", headers={"If-None-Match": '"alt"'}).status_code == 200
+
     def test_throw_returns_legal_moves(self):
         r = client.post("/board/throw", json={"birthDate": "27.07.1966", "positions": {}})
         assert r.status_code == 200
@@ -334,13 +350,219 @@ class TestPush:
         assert r.status_code == 503
 
     def test_store_roundtrip(self, tmp_path, monkeypatch):
-        monkeypatch.setattr(main, "PUSH_STORE_PATH", str(tmp_path / "subs.json"))
-        main._push_save([{"endpoint": "e1", "keys": {}}])
-        assert main._push_load() == [{"endpoint": "e1", "keys": {}}]
+        monkeypatch.setattr(main, "PUSH_STORE_PATH", str(tmp_path / "subs.sqlite3"))
+        store = main._push_store()
+        store.upsert("e1", {}, "Europe/Vienna", "07:30")
+        store.upsert("e1", {"auth": "neu"})  # ohne tz/time bleiben die alten Werte
+        assert list(store) == [{"endpoint": "e1", "keys": {"auth": "neu"}, "tz": "Europe/Vienna",
+                                "time": "07:30", "lastSent": None}]
+        store.mark_sent([("e1", "2026-03-01")])
+        assert store.get_many(["e1", "fehlt"])[0]["lastSent"] == "2026-03-01"
         # unsubscribe entfernt unabhängig vom enabled-Zustand
         r = client.post("/push/unsubscribe", json={"endpoint": "e1"})
         assert r.status_code == 200
-        assert main._push_load() == []
+        assert list(store) == [] and store.count() == 0
+
+    def test_store_migrates_legacy_json(self, tmp_path, monkeypatch):
+        import json
+        legacy = tmp_path / "subs.json"
+        legacy.write_text(json.dumps([{"endpoint": "e1", "keys": {"auth": "a"}},
+                                      {"endpoint": "e2", "keys": {}}]))
+        monkeypatch.setattr(main, "PUSH_STORE_PATH", str(legacy))
+        store = main._push_store()
+        assert store.path == str(tmp_path / "subs.sqlite3")
+        assert [s["endpoint"] for s in store] == ["e1", "e2"]
+        assert not legacy.exists() and (tmp_path / "subs.json.migrated").exists()
+
+    def test_store_adds_window_columns_to_old_tables(self, tmp_path, monkeypatch):
+        import sqlite3
+        path = tmp_path / "subs.sqlite3"
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE push_subscriptions "
+                         "(endpoint TEXT PRIMARY KEY, keys TEXT NOT NULL, created REAL NOT NULL)")
+            conn.execute("INSERT INTO push_subscriptions VALUES ('alt', '{}', 0)")
+        monkeypatch.setattr(main, "PUSH_STORE_PATH", str(path))
+        assert list(main._push_store()) == [{"endpoint": "alt", "keys": {}, "tz": None,
+                                              "time": None, "lastSent": None}]
+
+    def test_due_time_is_local_and_staggered(self, monkeypatch):
+        import datetime as dt
+        monkeypatch.setattr(main, "PUSH_WINDOW_MINUTES", 60)
+        now = dt.datetime(2026, 3, 2, 5, 0, tzinfo=dt.timezone.utc)
+        subs = [{"endpoint": f"https://fcm.example/{i}", "tz": "Europe/Berlin", "time": "08:00"}
+                for i in range(50)]
+        start = dt.datetime(2026, 3, 2, 7, 0, tzinfo=dt.timezone.utc).timestamp()  # 08:00 MEZ
+        dues = [main._push_due(s, now) for s in subs]
+        assert all(start <= at < start + 3600 and day == "2026-03-02" for at, day in dues)
+        assert len({at for at, _ in dues}) > 40  # verteilt, nicht alle auf einmal
+        assert dues == [main._push_due(s, now) for s in subs]  # deterministisch
+        # dieselbe Wunschzeit in New York liegt sechs Stunden später (UTC-5 vs. UTC+1)
+        ny = main._push_due(dict(subs[0], tz="America/New_York"), now)[0]
+        assert ny - dues[0][0] == 6 * 3600
+        # unbekannte Zone und kaputte Zeit fallen auf Berlin / PUSH_TIME zurück
+        monkeypatch.setattr(main, "PUSH_TIME", "08:00")
+        assert main._push_due(dict(subs[0], tz="Mars/Olympus", time="25:99"), now) == dues[0]
+
+    def test_due_time_catches_up_and_skips_sent_days(self, monkeypatch):
+        import datetime as dt
+        monkeypatch.setattr(main, "PUSH_WINDOW_MINUTES", 60)
+        sub = {"endpoint": "e1", "tz": "UTC", "time": "08:00"}
+        slot, _ = main._push_due(sub, dt.datetime(2026, 3, 2, 0, 0, tzinfo=dt.timezone.utc))
+        # knapp verpasst (Neustart): sofort nachholen
+        late = dt.datetime.fromtimestamp(slot + 1800, dt.timezone.utc)
+        assert main._push_due(sub, late) == (late.timestamp(), "2026-03-02")
+        # heute schon geschickt oder zu lange her: morgen zur selben Zeit
+        assert main._push_due(dict(sub, lastSent="2026-03-02"), late) == (slot + 86400, "2026-03-03")
+        much_later = dt.datetime.fromtimestamp(slot + 3 * 3600, dt.timezone.utc)
+        assert main._push_due(sub, much_later) == (slot + 86400, "2026-03-03")
+
+    def test_scheduler_sends_due_and_reschedules(self, tmp_path, monkeypatch):
+        import asyncio
+        monkeypatch.setattr(main, "PUSH_STORE_PATH", str(tmp_path / "subs.sqlite3"))
+        monkeypatch.setattr(main, "_push_payload", lambda: "{}")
+
+        async def fake_encrypt(subs, payload):
+            return [b"x"] * len(subs)
+
+        async def fake_deliver(sub, body):
+            return ("expired" if sub["endpoint"].endswith("gone") else "sent"), 0.01
+
+        monkeypatch.setattr(main, "_push_encrypt_many", fake_encrypt)
+        monkeypatch.setattr(main, "_push_deliver", fake_deliver)
+        store = main._push_store()
+        for e in ("a", "b", "gone"):
+            store.upsert(e, {}, "UTC", "08:00")
+        sched = main._PushScheduler()
+        sched.rescan()
+        assert len(sched._due) == 3
+        # Umplanen lässt den alten Heap-Eintrag ins Leere laufen
+        sched.schedule({"endpoint": "b", "tz": "UTC", "time": "09:00"})
+        batch = sched.pop_due(float("inf"))
+        assert sorted(e for e, _ in batch) == ["a", "b", "gone"] and not sched._heap
+
+        stats = asyncio.run(sched.deliver(batch))
+        assert (stats["total"], stats["sent"], stats["expired"]) == (3, 2, 1)
+        assert sorted(s["endpoint"] for s in store) == ["a", "b"]
+        assert all(s["lastSent"] for s in store)
+        assert sorted(sched._due) == ["a", "b"]  # für den nächsten Tag eingeplant
+
+    def test_store_pages_and_batch_deletes(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(main, "PUSH_STORE_PATH", str(tmp_path / "subs.sqlite3"))
+        monkeypatch.setattr(main._PushStore, "PAGE", 3)
+        store = main._push_store()
+        for i in range(10):
+            store.upsert(f"e{i:02d}", {})
+        seen = []
+        for sub in store:  # Löschen während der Iteration stört das Paging nicht
+            seen.append(sub["endpoint"])
+            store.delete(sub["endpoint"])
+        assert seen == [f"e{i:02d}" for i in range(10)]
+        for i in range(5):
+            store.upsert(f"x{i}", {})
+        store.delete_many(["x1", "x3", "fehlt"])
+        assert [s["endpoint"] for s in store] == ["x0", "x2", "x4"]
+
+    def test_async_fan_out_retries_prunes_and_reports(self, tmp_path, monkeypatch):
+        """Fan-out über zwei Push-Dienste: 429 wird wiederholt, 410 räumt das
+        Abo weg, 400 wird nicht wiederholt; die Statistik zählt alles mit."""
+        import asyncio
+        import base64
+        import os
+
+        import httpx
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+
+        def b64(raw):
+            return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+        vapid = ec.generate_private_key(ec.SECP256R1())
+        monkeypatch.setattr(main, "VAPID_PRIVATE_KEY", b64(vapid.private_numbers().private_value.to_bytes(32, "big")))
+        monkeypatch.setattr(main, "_PUSH_VAPID", None)
+        monkeypatch.setattr(main, "_PUSH_VAPID_CACHE", {})
+        monkeypatch.setattr(main, "PUSH_STORE_PATH", str(tmp_path / "subs.sqlite3"))
+        monkeypatch.setattr(main, "PUSH_ORIGIN_RATE", 1000.0)
+        monkeypatch.setattr(main, "_PUSH_BUCKETS", {})
+        monkeypatch.setattr(main, "_push_backoff", lambda attempt, retry_after: 0)
+
+        receiver = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+            serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint)
+        keys = {"p256dh": b64(receiver), "auth": b64(os.urandom(16))}
+        endpoints = ["https://fcm.example/ok", "https://fcm.example/busy",
+                     "https://moz.example/gone", "https://moz.example/bad"]
+        for e in endpoints:
+            main._push_store().upsert(e, keys)
+
+        hits = {}
+
+        def handler(request):
+            assert request.headers["content-encoding"] == "aes128gcm"
+            assert request.headers["authorization"].startswith("vapid t=")
+            path = request.url.path
+            hits[path] = hits.get(path, 0) + 1
+            if path == "/busy" and hits[path] == 1:
+                return httpx.Response(429, headers={"Retry-After": "0"})
+            return httpx.Response({"/gone": 410, "/bad": 400}.get(path, 201))
+
+        clients = {}
+        monkeypatch.setattr(main, "_push_client", lambda origin: clients.setdefault(
+            origin, httpx.AsyncClient(transport=httpx.MockTransport(handler))))
+
+        stats = asyncio.run(main._push_send_all())
+        assert (stats["total"], stats["sent"], stats["expired"], stats["failed"]) == (4, 2, 1, 1)
+        assert hits == {"/ok": 1, "/busy": 2, "/gone": 1, "/bad": 1}
+        assert stats["sendsPerSec"] > 0 and stats["p95Ms"] >= stats["p50Ms"] > 0
+        assert sorted(s["endpoint"] for s in main._push_store()) == sorted(e for e in endpoints if "gone" not in e)
+        assert sorted(main._PUSH_VAPID_CACHE) == ["https://fcm.example", "https://moz.example"]
+
+    def test_vapid_headers_cached_until_near_expiry(self, monkeypatch):
+        signed = []
+
+        class _FakeVapid:
+            def sign(self, claims):
+                signed.append(claims)
+                return {"Authorization": f"vapid t={len(signed)}"}
+
+        monkeypatch.setattr(main, "_PUSH_VAPID", _FakeVapid())
+        monkeypatch.setattr(main, "_PUSH_VAPID_CACHE", {})
+        a = main._push_vapid_headers("https://fcm.example")
+        assert main._push_vapid_headers("https://fcm.example") == a
+        main._push_vapid_headers("https://moz.example")
+        assert [c["aud"] for c in signed] == ["https://fcm.example", "https://moz.example"]
+        exp, headers = main._PUSH_VAPID_CACHE["https://fcm.example"]
+        main._PUSH_VAPID_CACHE["https://fcm.example"] = (main.time.time() + 60, headers)
+        assert main._push_vapid_headers("https://fcm.example")["Authorization"] == "vapid t=3"
+
+    def test_pool_encryption_is_decryptable(self, monkeypatch):
+        import asyncio
+        import base64
+        import os
+
+        import http_ece
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+
+        def b64(raw):
+            return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+        monkeypatch.setattr(main, "PUSH_ENCRYPT_WORKERS", 1)
+        monkeypatch.setattr(main, "PUSH_ENCRYPT_CHUNK", 2)
+        monkeypatch.setattr(main, "_PUSH_POOL", None)
+        receivers, subs = [], []
+        for i in range(3):
+            priv, auth = ec.generate_private_key(ec.SECP256R1()), os.urandom(16)
+            pub = priv.public_key().public_bytes(serialization.Encoding.X962,
+                                                 serialization.PublicFormat.UncompressedPoint)
+            receivers.append((priv, auth))
+            subs.append({"endpoint": f"https://fcm.example/{i}", "keys": {"p256dh": b64(pub), "auth": b64(auth)}})
+        subs.append({"endpoint": "https://fcm.example/kaputt", "keys": {"p256dh": "x", "auth": "y"}})
+        try:
+            bodies = asyncio.run(main._push_encrypt_many(subs, b"Tag 3"))
+        finally:
+            main._stop_push_pool()
+        assert bodies[3] is None
+        for body, (priv, auth) in zip(bodies, receivers):
+            assert http_ece.decrypt(body, private_key=priv, auth_secret=auth, version="aes128gcm") == b"Tag 3"
 
 
 class TestFieldAlbum:
@@ -354,6 +576,11 @@ class TestFieldAlbum:
         for f in fields:
             assert f["name"] and f["core"]
 
+    def test_fields_etag(self):
+        r = client.get("/board/fields")
+        assert "max-age" in r.headers["cache-control"]
+        assert client.get("/board/fields", headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+
 
 class TestSternzwillinge:
     """Die kuratierte Promi-Geburtstagstabelle (public/assets/sternzwillinge.json):
@@ -513,7 +740,7 @@ class TestComparePage:
 
     def test_blind_pair_with_mocked_providers(self, monkeypatch):
         monkeypatch.setattr(main, "_anthropic_client", object())
-        def fake_llm(system, user, temperature=0.8, seed=None, provider=None):
+        async def fake_llm(system, user, temperature=0.8, seed=None, provider=None, endpoint=None, prefix=""):
             return f"text-von-{provider}"
         monkeypatch.setattr(main, "llm_text", fake_llm)
         r = client.get("/compare", params={"birthDate": "1966-07-27", "stone": "werk"})
@@ -0,0 +1,267 @@
+"""Tests für geocode(): Caches, Single-Flight und Drosselung.
+
+Nominatim wird über einen httpx.MockTransport ersetzt — kein Netz im Test.
+"""
+import asyncio
+import importlib.util
+import pathlib
+
+import httpx
+import pytest
+
+import main
+
+BERLIN = [{"lat": "52.52", "lon": "13.40", "class": "place", "importance": 0.9,
+           "display_name": "Berlin, Deutschland", "address": {"country_code": "de"}}]
+
+
+@pytest.fixture
+def nominatim(monkeypatch):
+    """Installiert einen Fake-Nominatim und liefert die Liste der Anfragen."""
+    calls = []
+    answers = {"de,at,ch": BERLIN, None: BERLIN}
+
+    async def handler(request):
+        calls.append(dict(request.url.params))
+        await asyncio.sleep(0.01)
+        data = answers.get(request.url.params.get("countrycodes"), [])
+        if isinstance(data, Exception):
+            raise data
+        return httpx.Response(200, json=data)
+
+    monkeypatch.setattr(main, "_http_client",
+                        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(main, "_GAZETTEER", main._Gazetteer("/nonexistent/gazetteer.bin"))
+    monkeypatch.setattr(main, "_GEOCODE_LRU", main._LRUCache(64, 3600))
+    monkeypatch.setattr(main, "_GEOCODE_DISK", None)
+    monkeypatch.setattr(main, "_GEOCODE_INFLIGHT", {})
+    monkeypatch.setattr(main, "_NOMINATIM_BUCKET", main._TokenBucket(1000, burst=1000))
+    return calls, answers
+
+
+def test_normalized_place_is_served_from_memory(nominatim):
+    calls, _ = nominatim
+    a = asyncio.run(main.geocode("Berlin"))
+    b = asyncio.run(main.geocode("  berlin "))
+    assert a == b and a["countryCode"] == "DE"
+    assert len(calls) == 1  # DACH-Treffer, danach nur noch Cache
+
+
+def test_concurrent_lookups_share_one_request(nominatim):
+    calls, _ = nominatim
+
+    async def burst():
+        return await asyncio.gather(*(main.geocode("Berlin") for _ in range(5)))
+
+    results = asyncio.run(burst())
+    assert all(r == results[0] for r in results)
+    assert len(calls) == 1
+
+
+def test_disk_cache_survives_memory_loss(nominatim, tmp_path, monkeypatch):
+    calls, _ = nominatim
+    monkeypatch.setattr(main, "_GEOCODE_DISK", main._SqliteKV(str(tmp_path / "geo.sqlite3"), "geocode"))
+    first = asyncio.run(main.geocode("Berlin"))
+    main._GEOCODE_LRU.clear()
+    assert asyncio.run(main.geocode("Berlin")) == first
+    assert len(calls) == 1
+
+
+def test_misses_are_cached_but_errors_are_not(nominatim):
+    calls, answers = nominatim
+    answers["de,at,ch"] = []
+    answers[None] = []
+    assert asyncio.run(main.geocode("Atlantis")) is None
+    assert asyncio.run(main.geocode("Atlantis")) is None
+    assert len(calls) == 2  # beide Pässe einmal, dann negativ gecacht
+
+    answers["de,at,ch"] = httpx.ConnectError("offline")
+    assert asyncio.run(main.geocode("Berlin")) is None
+    answers["de,at,ch"] = BERLIN
+    assert asyncio.run(main.geocode("Berlin"))["lat"] == 52.52
+
+
+def test_dach_status_error_falls_through_to_world_pass(nominatim, monkeypatch):
+    calls = []
+
+    async def handler(request):
+        cc = request.url.params.get("countrycodes")
+        calls.append(cc)
+        return httpx.Response(503) if cc else httpx.Response(200, json=BERLIN)
+
+    monkeypatch.setattr(main, "_http_client",
+                        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    assert asyncio.run(main.geocode("Berlin"))["lat"] == 52.52
+    assert calls == ["de,at,ch", None]
+    asyncio.run(main.geocode("Berlin"))
+    assert len(calls) == 4  # Welt-Treffer ohne DACH-Antwort nicht gecacht
+
+
+def test_token_bucket_spaces_requests():
+    bucket = main._TokenBucket(rate=2.0)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5, abs=0.05)
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+
+
+def test_parallel_mode_prefers_dach_and_cancels_world(nominatim, monkeypatch):
+    calls, answers = nominatim
+    monkeypatch.setattr(main, "GEOCODE_PARALLEL", True)
+    started, finished = [], []
+
+    async def handler(request):
+        cc = request.url.params.get("countrycodes")
+        started.append(cc)
+        await asyncio.sleep(0.05 if cc else 0.5)
+        finished.append(cc)
+        return httpx.Response(200, json=answers.get(cc, []))
+
+    monkeypatch.setattr(main, "_http_client",
+                        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    hit = asyncio.run(main.geocode("Berlin"))
+    assert hit["countryCode"] == "DE"
+    assert sorted(started, key=str) == [None, "de,at,ch"]  # beide gestartet
+    assert finished == ["de,at,ch"]  # Welt-Pass abgebrochen
+
+
+def test_parallel_mode_falls_back_to_world_without_waiting_twice(nominatim, monkeypatch):
+    _, answers = nominatim
+    monkeypatch.setattr(main, "GEOCODE_PARALLEL", True)
+    answers["de,at,ch"] = []
+    answers[None] = [{**BERLIN[0], "display_name": "Paris", "address": {"country_code": "fr"}}]
+
+    async def handler(request):
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json=answers.get(request.url.params.get("countrycodes"), []))
+
+    monkeypatch.setattr(main, "_http_client",
+                        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    loop = asyncio.new_event_loop()
+    t0 = loop.time()
+    hit = loop.run_until_complete(main.geocode("Paris"))
+    elapsed = loop.time() - t0
+    loop.close()
+    assert hit["countryCode"] == "FR"
+    assert elapsed < 0.35  # gleichzeitig, nicht 2 × 0.2 s
+
+
+def test_cancelled_wait_refunds_the_token():
+    bucket = main._TokenBucket(rate=1.0)
+    bucket.reserve()  # Burst verbraucht
+
+    async def cancel_waiter():
+        t = asyncio.ensure_future(bucket.acquire())
+        await asyncio.sleep(0.01)
+        t.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await t
+
+    asyncio.run(cancel_waiter())
+    # Ohne Rückgabe müsste der nächste fast 2 s warten.
+    assert bucket.reserve() < 1.0
+
+
+def test_cancelled_wait_keeps_later_reservations_apart():
+    bucket = main._TokenBucket(rate=1.0)
+    bucket.reserve()  # Burst verbraucht
+
+    async def scenario():
+        a = asyncio.ensure_future(bucket.acquire())   # Slot t+1
+        b = asyncio.ensure_future(bucket.acquire())   # Slot t+2
+        await asyncio.sleep(0.01)
+        a.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await a
+        # A gibt nichts zurück, weil B hinter ihm steht: C landet nach B, nicht auf B.
+        delay = bucket.reserve()
+        b.cancel()
+        await asyncio.gather(b, return_exceptions=True)
+        return delay
+
+    assert asyncio.run(scenario()) > 2.5
+
+
+# ---------------------------------------------------------------------------
+# Offline-Ortsindex
+# ---------------------------------------------------------------------------
+
+def _load_builder():
+    path = pathlib.Path(__file__).parent.parent / "scripts" / "build_gazetteer.py"
+    spec = importlib.util.spec_from_file_location("build_gazetteer", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _row(gid, name, alts, lat, lon, cc, pop, fcode="PPL"):
+    cols = [str(gid), name, name, alts, str(lat), str(lon), "P", fcode, cc, "", "01",
+            "", "", "", str(pop), "", "", "Europe/Berlin", "2024-01-01"]
+    return "\t".join(cols) + "\n"
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    builder = _load_builder()
+    lines = [
+        _row(1, "Munich", "München,Muenchen,Monaco di Baviera", 48.137, 11.575, "DE", 1_500_000),
+        _row(2, "Stuttgart", "", 48.782, 9.177, "DE", 630_000),
+        _row(3, "Weilimdorf", "", 48.817, 9.109, "DE", 31_000, "PPLX"),
+        _row(4, "Bad Saulgau", "Saulgau", 48.016, 9.500, "DE", 17_000),
+        _row(5, "Frankfurt am Main", "", 50.110, 8.682, "DE", 750_000),
+        _row(6, "Frankfurt (Oder)", "", 52.347, 14.550, "DE", 57_000),
+        _row(7, "Neustadt", "", 40.0, -80.0, "US", 500_000),
+        _row(8, "Neustadt", "", 49.350, 8.139, "DE", 53_000),
+        _row(9, "Zürich", "Zurich", 47.376, 8.541, "CH", 400_000),
+        _row(10, "Москва", "", 55.75, 37.61, "RU", 10_000_000),
+    ]
+    out = tmp_path / "gaz.bin"
+    n = builder.write_index(builder.parse_geonames(lines, countries=None), str(out))
+    assert n > 0
+    return builder, main._Gazetteer(str(out))
+
+
+class TestGazetteer:
+    def test_normalization_matches_build_script(self, gazetteer):
+        builder, _ = gazetteer
+        for name in ["München", "Bad-Saulgau", "Zürich", "Stuttgart-Weilimdorf",
+                     "Frankfurt (Oder)", "  ST. GALLEN  ", "Île-de-France"]:
+            assert builder.norm(name) == main._gazetteer_norm(name)
+
+    def test_umlauts_and_alternate_names(self, gazetteer):
+        _, gaz = gazetteer
+        for q in ["München", "Muenchen", "munich", "MÜNCHEN"]:
+            assert gaz.lookup(q)["lat"] == pytest.approx(48.137)
+        assert gaz.lookup("Zurich")["countryCode"] == "CH"
+
+    def test_bad_prefix_and_districts(self, gazetteer):
+        _, gaz = gazetteer
+        assert gaz.lookup("Bad-Saulgau")["lon"] == pytest.approx(9.5)
+        assert gaz.lookup("Saulgau")["lon"] == pytest.approx(9.5)
+        # Stadtteil bekannt → Stadtteil; sonst die Stadt davor.
+        assert gaz.lookup("Stuttgart-Weilimdorf")["lat"] == pytest.approx(48.817)
+        assert gaz.lookup("Stuttgart-Zuffenhausen")["lat"] == pytest.approx(48.782)
+
+    def test_dach_wins_homonyms_and_prefix_prefers_population(self, gazetteer):
+        _, gaz = gazetteer
+        assert gaz.lookup("Neustadt")["countryCode"] == "DE"
+        assert gaz.lookup("Frankfurt")["lat"] == pytest.approx(50.110)
+
+    def test_country_suffix(self, gazetteer):
+        _, gaz = gazetteer
+        assert gaz.lookup("München, Deutschland")["lat"] == pytest.approx(48.137)
+        assert gaz.lookup("Zürich, Schweiz")["countryCode"] == "CH"
+        assert gaz.lookup("Neustadt, USA") is None  # nicht-DACH → Nominatim
+        assert gaz.lookup("Москва") is None
+
+    def test_missing_index_is_empty(self):
+        gaz = main._Gazetteer("/nonexistent/gazetteer.bin")
+        assert len(gaz) == 0 and gaz.lookup("Berlin") is None
+
+    def test_geocode_answers_from_index_without_network(self, gazetteer, nominatim, monkeypatch):
+        calls, _ = nominatim
+        monkeypatch.setattr(main, "_GAZETTEER", gazetteer[1])
+        hit = asyncio.run(main.geocode("Bad Saulgau"))
+        assert hit["display"].startswith("Bad Saulgau") and hit["countryCode"] == "DE"
+        assert calls == []
+        asyncio.run(main.geocode("Berlin"))  # nicht im Index → Nominatim
+        assert len(calls) == 1
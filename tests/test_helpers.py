@@ -3,7 +3,11 @@
 These tests avoid any network or OpenAI calls — they only cover date parsing,
 zodiac derivation, numerology, moon phases, seasons, I-Ging and Celtic trees.
 """
+import asyncio
 import datetime as dt
+import json
+
+import pytest
 
 import main
 
@@ -182,6 +186,24 @@ class TestMixerNormalization:
         out = main._normalize_mixer({"astro": "sixty", "num": None, "tarot": 50, "iching": 50, "cn": 0, "tree": 0})
         assert sum(out.values()) == 100
 
+    def test_quantized_mixer_keeps_sum_and_absorbs_small_nudges(self):
+        a = main._quantize_mixer(main._normalize_mixer(None), 10)
+        assert sum(a.values()) == 100 and all(v % 10 == 0 for v in a.values())
+        nudged = main._normalize_mixer({"astro": 36, "num": 12, "tarot": 17, "iching": 14, "cn": 11, "tree": 10})
+        assert main._quantize_mixer(nudged, 10) == a
+        assert main._quantize_mixer({"astro": 100, "num": 0, "tarot": 0, "iching": 0, "cn": 0, "tree": 0}, 5)["astro"] == 100
+
+    def test_outline_key_is_canonical_and_separates_coordinates(self):
+        mixer = main._quantize_mixer(main._normalize_mixer(None), 10)
+        a = main.ReadingRequest(birthDate="1.2.1980", birthPlace="Berlin", tone="coach")
+        b = main.ReadingRequest(birthDate="01.02.1980", birthPlace="berlin, deutschland", tone="skeptisch")
+        berlin = main._round_coords(52.52, 13.405)
+        assert main._outline_key(a, mixer, berlin) == main._outline_key(b, mixer, berlin)
+        hamburg = main.ReadingRequest(birthDate="1.2.1980", birthPlace="", birthTime="12:00",
+                                      coords={"lat": 53.55, "lon": 9.99})
+        munich = hamburg.model_copy(update={"coords": {"lat": 48.14, "lon": 11.58}})
+        assert main._outline_key(hamburg, mixer) != main._outline_key(munich, mixer)
+
 
 class TestToneDirective:
     def test_all_known_tones_return_nonempty(self):
@@ -325,15 +347,75 @@ class TestPeriodBucket:
 class TestCacheLayer:
     def test_cache_miss_returns_none(self):
         main._READING_CACHE.clear()
-        assert main._cache_get("missing") is None
+        assert asyncio.run(main._cache_get("missing")) is None
 
     def test_cache_roundtrip(self):
         main._READING_CACHE.clear()
         dummy = main.ReadingResponse(
             meta={"x": 1}, sections=[], chips=[], disclaimer=""
         )
-        main._cache_put("k1", dummy)
-        assert main._cache_get("k1") is dummy
+        asyncio.run(main._cache_put("k1", dummy))
+        assert asyncio.run(main._cache_get("k1")) is dummy
+
+    def test_lru_evicts_least_recently_used(self):
+        c = main._LRUCache(max_entries=2, ttl=60)
+        c.put("a", 1); c.put("b", 2)
+        assert c.get("a") == 1          # a ist jetzt frischer als b
+        c.put("c", 3)
+        assert c.get("b") is None
+        assert c.get("a") == 1 and c.get("c") == 3
+
+    def test_lru_respects_byte_budget(self):
+        c = main._LRUCache(max_entries=100, ttl=60, max_bytes=1000)
+        for i in range(5):
+            c.put(f"k{i}", i, size=400)
+        assert len(c) == 2 and c.bytes == 800
+        assert c.get("k3") == 3 and c.get("k4") == 4
+        c.pop("k3")
+        assert c.bytes == 400
+
+    def test_sqlite_sweep_drops_expired_then_earliest_expiring(self, tmp_path):
+        kv = main._SqliteKV(str(tmp_path / "kv.sqlite3"), "kv", max_rows=3, max_bytes=250)
+        kv.put("old", "x", -1)
+        for i in range(4):
+            kv.put(f"k{i}", "v" * 100, 60 + i)
+        assert kv.sweep() == 3   # abgelaufen, dann Zeilen-, dann Byte-Grenze
+        keys = {r[0] for r in kv._db().execute("SELECT k FROM kv")}
+        assert keys == {"k2", "k3"}
+        assert kv.get("k3") == "v" * 100 and kv.get("k0") is None
+
+    def test_sqlite_write_behind_a_lock_does_not_stall_the_loop(self, tmp_path):
+        import sqlite3
+        path = str(tmp_path / "kv.sqlite3")
+        kv = main._SqliteKV(path, "kv")
+        kv.put("warm", "x", 60)
+        other = sqlite3.connect(path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")   # anderer Worker hält die Schreibsperre
+
+        async def scenario():
+            put = asyncio.create_task(kv.aput("k", "v", 60))
+            ticks = 0
+            for _ in range(20):
+                await asyncio.sleep(0.01)
+                ticks += 1
+            assert not put.done()
+            other.execute("COMMIT")
+            await put
+            return ticks
+        assert asyncio.run(scenario()) == 20
+        assert kv.get("k") == "v"
+
+    def test_sqlite_backend_is_shared_between_instances(self, tmp_path):
+        path = str(tmp_path / "reading.sqlite3")
+        writer = main._ReadingCache(60, 10, 0, main._SqliteKV(path, "reading_cache"))
+        reader = main._ReadingCache(60, 10, 0, main._SqliteKV(path, "reading_cache"))
+        resp = main.ReadingResponse(
+            meta={"x": 1}, sections=[main.Section(title="T", text="t")], chips=["c"], disclaimer="d"
+        )
+        asyncio.run(writer.put("k", resp))
+        got = asyncio.run(reader.get("k"))
+        assert got is not None and got.model_dump() == resp.model_dump()
+        assert len(reader.local) == 1   # danach aus dem eigenen LRU
 
     def test_cache_key_differs_by_period(self):
         a = main.ReadingRequest(birthDate="27.07.1966", birthPlace="Berlin", period="day")
@@ -352,6 +434,124 @@ class TestCacheLayer:
         b = main.ReadingRequest(birthDate="27.07.1966", birthPlace="BERLIN")
         assert main._cache_key(a) == main._cache_key(b)
 
+    def test_cache_key_canonicalizes_date_time_and_mixer(self):
+        a = main.ReadingRequest(birthDate="1.2.1980", birthPlace="München", birthTime="7:05",
+                                mixer={"astro": 33.4, "num": 33.3, "tarot": 33.3})
+        b = main.ReadingRequest(birthDate="1980-02-01", birthPlace="Muenchen", birthTime="07:05",
+                                mixer={"astro": 33.6, "num": 33.2, "tarot": 33.2})
+        assert main._cache_key(a) == main._cache_key(b)
+        c = b.model_copy(update={"mixer": {"astro": 50, "num": 25, "tarot": 25}})
+        assert main._cache_key(a) != main._cache_key(c)
+
+    def test_cache_key_uses_rounded_coordinates_over_the_name(self):
+        a = main.ReadingRequest(birthDate="27.07.1966", birthPlace="Berlin")
+        b = main.ReadingRequest(birthDate="27.07.1966", birthPlace="Berlin, Deutschland")
+        assert main._cache_key(a) != main._cache_key(b)   # ohne Auflösung zählt der Name
+        berlin = main._round_coords(52.52001, 13.40495)
+        assert main._cache_key(a, berlin) == main._cache_key(b, main._round_coords(52.5237, 13.4012))
+        pinned = b.model_copy(update={"coords": {"lat": 52.5199, "lon": 13.4049}})
+        assert main._cache_key(pinned, berlin) == main._cache_key(a, berlin)
+
+    def test_canonical_reading_quantizes_what_gets_computed(self):
+        req = main.ReadingRequest(birthDate="27.07.1966", birthPlace="x",
+                                  coords={"lat": 48.02345, "lon": -0.001},
+                                  mixer={"astro": 33.4, "num": 33.3, "tarot": 33.3})
+        canon, key = asyncio.run(main._canonical_reading(req))
+        assert canon.coords == {"lat": 48.02, "lon": 0.0}
+        assert sum(canon.mixer.values()) == 100
+        assert all(v % main.CACHE_MIXER_STEP == 0 for v in canon.mixer.values())
+        assert key == main._cache_key(canon) == main._cache_key(req)
+
+    def test_form_seed_is_rederived_from_canonical_birth_data(self, monkeypatch):
+        async def fake_geocode(place):
+            return {"lat": 52.5200, "lon": 13.4050}
+        monkeypatch.setattr(main, "geocode", fake_geocode)
+
+        def form(date_field, date, place):  # wie readForm() in src/main.ts
+            return main.ReadingRequest(birthDate=date, birthPlace=place,
+                                       seed=main._form_seed(f"{date_field}|{place}"))
+        a = asyncio.run(main._canonical_reading(form("1.2.1980", "1.2.1980", "Berlin")))
+        b = asyncio.run(main._canonical_reading(form("1980-02-01", "01.02.1980", "Berlin, Deutschland")))
+        assert a[0].seed == b[0].seed and a[1] == b[1]
+        own = main.ReadingRequest(birthDate="1.2.1980", birthPlace="Berlin", seed=42)
+        assert asyncio.run(main._canonical_reading(own))[0].seed == 42  # eigener Seed bleibt
+
+
+# ---------------------------------------------------------------------------
+# Swiss-Ephemeris-Engine
+# ---------------------------------------------------------------------------
+
+@pytest.mark.skipif(not main.HAS_SWE, reason="pyswisseph nicht installiert")
+class TestLease:
+    def test_single_holder_renews_and_takes_over_after_expiry(self, tmp_path):
+        path = str(tmp_path / "lease.sqlite3")
+        a = main._Lease(path, "push", ttl=30, owner="a")
+        b = main._Lease(path, "push", ttl=30, owner="b")
+        assert a.acquire() and a.acquire()  # verlängern geht
+        assert not b.acquire()
+        assert main._Lease(path, "andere", ttl=30, owner="b").acquire()  # je Name eine Lease
+        a._db().execute("UPDATE leases SET expires = 0")  # a ist abgestürzt
+        assert b.acquire() and not a.acquire()
+        b.release()
+        assert a.acquire()
+
+    def test_only_the_leader_runs_the_job_and_hands_over(self, tmp_path):
+        path = str(tmp_path / "lease.sqlite3")
+        running = []
+
+        def job(name):
+            async def run():
+                running.append(name)
+                await asyncio.sleep(3600)
+            return run
+
+        async def scenario():
+            a = asyncio.create_task(main._run_as_leader(main._Lease(path, "push", 0.15, "a"), job("a")))
+            await asyncio.sleep(0.02)
+            b = asyncio.create_task(main._run_as_leader(main._Lease(path, "push", 0.15, "b"), job("b")))
+            await asyncio.sleep(0.2)
+            assert running == ["a"]
+            a.cancel()  # Worker a fährt herunter und gibt die Lease frei
+            await asyncio.gather(a, return_exceptions=True)
+            await asyncio.sleep(0.1)
+            assert running == ["a", "b"]
+            b.cancel()
+            await asyncio.gather(b, return_exceptions=True)
+
+        asyncio.run(scenario())
+
+
+class TestSweEngine:
+    ARGS = (dt.date(1966, 7, 27), dt.time(13, 30), 48.0176, 9.5004, "Europe/Berlin")
+
+    def test_identical_input_is_computed_once(self):
+        main._swe_chart.cache_clear()
+        a = main.swe_compute(*self.ARGS)
+        b = main.swe_compute(dt.date(1966, 7, 27), dt.time(13, 30), 48.01761, 9.50039, "Europe/Berlin")
+        assert a == b
+        info = main._swe_chart.cache_info()
+        assert (info.misses, info.hits) == (1, 1)
+        assert a["planets"]["Sonne"]["sign"] == "Löwe"
+        assert 1 <= a["sunHouse"] <= 12
+
+    def test_callers_cannot_corrupt_the_cache(self):
+        a = main.swe_compute(*self.ARGS)
+        a["planets"]["Sonne"]["sign"] = "kaputt"
+        a["cusps"].clear()
+        b = main.swe_compute(*self.ARGS)
+        assert b["planets"]["Sonne"]["sign"] == "Löwe" and len(b["cusps"]) == 12
+
+    def test_batch_matches_single_calls(self):
+        items = [self.ARGS,
+                 (dt.date(1990, 1, 1), None, 52.5, 13.4, "Europe/Berlin"),
+                 (dt.date(1990, 1, 1), dt.time(6, 0), 52.5, 13.4, "Europe/Berlin", "W"),
+                 self.ARGS]
+        out = main.swe_compute_many(items)
+        assert out[1] is None
+        assert out[0] == out[3] == main.swe_compute(*self.ARGS)
+        assert out[2]["houseSystem"] == "W"
+        assert out[2] == main.swe_compute(*items[2])
+
 
 class TestRoutes:
     def test_reading_route_registered(self):
@@ -399,11 +599,11 @@ class TestChatKwargs:
 # ---------------------------------------------------------------------------
 
 class _FakeOpenAI:
-    """Minimaler OpenAI-Client-Ersatz, der den Prompt zurückspiegelt."""
+    """Minimaler AsyncOpenAI-Client-Ersatz mit fester Antwort."""
     class _C:
         class _Completions:
             @staticmethod
-            def create(**kwargs):
+            async def create(**kwargs):
                 class R:
                     class Choice:
                         class Msg: content = "openai-antwort"
@@ -417,7 +617,7 @@ class _FakeOpenAI:
 class _FakeAnthropic:
     class _Messages:
         @staticmethod
-        def create(**kwargs):
+        async def create(**kwargs):
             class Block:
                 type = "text"
                 text = "anthropic-antwort"
@@ -432,16 +632,16 @@ class TestLLMProvider:
     def test_default_routes_to_openai(self, monkeypatch):
         monkeypatch.setattr(main, "client", _FakeOpenAI())
         monkeypatch.setattr(main, "LLM_PROVIDER", "openai")
-        assert main.llm_text("sys", "user") == "openai-antwort"
+        assert asyncio.run(main.llm_text("sys", "user")) == "openai-antwort"
 
     def test_provider_override_anthropic(self, monkeypatch):
         monkeypatch.setattr(main, "_anthropic_client", _FakeAnthropic())
-        assert main.llm_text("sys", "user", provider="anthropic") == "anthropic-antwort"
+        assert asyncio.run(main.llm_text("sys", "user", provider="anthropic")) == "anthropic-antwort"
 
     def test_anthropic_without_key_raises(self, monkeypatch):
         monkeypatch.setattr(main, "_anthropic_client", None)
         try:
-            main.llm_text("sys", "user", provider="anthropic")
+            asyncio.run(main.llm_text("sys", "user", provider="anthropic"))
             assert False, "sollte RuntimeError werfen"
         except RuntimeError:
             pass
@@ -452,14 +652,14 @@ class TestLLMProvider:
             class _C:
                 class _Completions:
                     @staticmethod
-                    def create(**kwargs):
+                    async def create(**kwargs):
                         seen.update(kwargs)
-                        return _FakeOpenAI._C._Completions.create()
+                        return await _FakeOpenAI._C._Completions.create()
                 completions = _Completions()
             chat = _C()
         monkeypatch.setattr(main, "client", Capture())
         monkeypatch.setattr(main, "LLM_PROVIDER", "openai")
-        main.oa_text("hallo")
+        asyncio.run(main.oa_text("hallo"))
         assert seen["messages"][0]["role"] == "system"
         # Produktstimme (docs/tonalitaet.md): Freundes-Ton in Du-Form
         assert "Freundin" in seen["messages"][0]["content"]
@@ -472,3 +672,532 @@ class TestLLMProvider:
     def test_llm_id_format(self):
         assert main._llm_id("anthropic") == f"anthropic:{main.ANTHROPIC_MODEL}"
         assert main._llm_id("openai") == f"openai:{main.MODEL}"
+
+
+class _CountingOpenAI:
+    """Zählt Calls; antwortet mit einer Nummer je Call."""
+    def __init__(self, delay=0.0):
+        self.calls = []
+        outer = self
+
+        class _Completions:
+            @staticmethod
+            async def create(**kwargs):
+                outer.calls.append(kwargs)
+                await asyncio.sleep(delay)
+                class R:
+                    class Choice:
+                        class Msg: content = f"antwort-{len(outer.calls)}"
+                        message = Msg()
+                    choices = [Choice()]
+                return R()
+        self.chat = type("Chat", (), {"completions": _Completions()})()
+
+
+class TestLLMCache:
+    @pytest.fixture(autouse=True)
+    def _openai(self, monkeypatch):
+        self.fake = _CountingOpenAI(delay=0.01)
+        monkeypatch.setattr(main, "client", self.fake)
+        monkeypatch.setattr(main, "LLM_PROVIDER", "openai")
+        monkeypatch.setattr(main, "MODEL", "gpt-4o-mini")  # mit temperature/seed im Key
+
+    def test_same_prompt_is_paid_once(self):
+        async def run():
+            first = await main.oa_text("prompt", seed=1, endpoint="board_move")
+            again = await main.oa_text("prompt", seed=1, endpoint="resonanz")
+            return first, again
+        assert asyncio.run(run()) == ("antwort-1", "antwort-1")
+        assert len(self.fake.calls) == 1
+        m = main._METRICS["llmCache"]
+        assert m["board_move"] == {"misses": 1} and m["resonanz"] == {"hits": 1}
+
+    def test_key_covers_prompt_seed_sampling_and_system(self):
+        async def run():
+            await main.llm_text("sys", "prompt", seed=1)
+            await main.llm_text("sys", "prompt", seed=2)
+            await main.llm_text("sys", "prompt", seed=1, temperature=0.4)
+            await main.llm_text("anderes sys", "prompt", seed=1)
+            await main.llm_text("sys", "anderer prompt", seed=1)
+        asyncio.run(run())
+        assert len(self.fake.calls) == 5
+
+    def test_concurrent_identical_prompts_share_one_call(self):
+        async def run():
+            return await asyncio.gather(*(main.oa_text("prompt", endpoint="board_move") for _ in range(5)))
+        assert asyncio.run(run()) == ["antwort-1"] * 5
+        assert len(self.fake.calls) == 1
+        assert main._METRICS["llmCache"]["board_move"] == {"misses": 1, "coalesced": 4}
+
+    def test_errors_and_empty_answers_are_not_cached(self, monkeypatch):
+        calls = []
+
+        async def flaky(**kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("503")
+            return await _FakeOpenAI._C._Completions.create()
+        monkeypatch.setattr(self.fake.chat.completions, "create", flaky)
+        with pytest.raises(RuntimeError):
+            asyncio.run(main.oa_text("prompt"))
+        assert asyncio.run(main.oa_text("prompt")) == "openai-antwort"
+        assert len(calls) == 2
+
+    def test_shared_sqlite_backend_and_metrics_route(self, tmp_path, monkeypatch):
+        from fastapi.testclient import TestClient
+        monkeypatch.setattr(main, "_LLM_DISK", main._SqliteKV(str(tmp_path / "llm.sqlite3"), "llm_cache"))
+        asyncio.run(main.oa_text("prompt", endpoint="wochenlesung"))
+        main._LLM_CACHE.clear()  # anderer Worker: leerer RAM, gleiche Datei
+        assert asyncio.run(main.oa_text("prompt", endpoint="wochenlesung")) == "antwort-1"
+        assert len(self.fake.calls) == 1
+        data = TestClient(main.app).get("/metrics").json()["llmCache"]
+        assert data["entries"] == 1 and data["bytes"] > 0
+        assert data["endpoints"]["wochenlesung"] == {"misses": 1, "hits": 1, "hitRate": 0.5}
+
+
+class TestPromptCaching:
+    def test_anthropic_gets_cache_breakpoints_and_reports_cached_tokens(self, monkeypatch):
+        seen = {}
+
+        class _Messages:
+            @staticmethod
+            async def create(**kwargs):
+                seen.update(kwargs)
+                R = await _FakeAnthropic._Messages.create()
+                R.usage = type("U", (), {"input_tokens": 40, "cache_read_input_tokens": 1200,
+                                         "cache_creation_input_tokens": 0})()
+                return R
+        monkeypatch.setattr(main, "_anthropic_client", type("A", (), {"messages": _Messages()})())
+        text = asyncio.run(main.llm_text("system", "daten", provider="anthropic",
+                                         endpoint="board_move", prefix="aufgabe"))
+        assert text == "anthropic-antwort"
+        assert seen["system"] == [{"type": "text", "text": "system", "cache_control": {"type": "ephemeral"}}]
+        assert seen["messages"][0]["content"] == [
+            {"type": "text", "text": "aufgabe", "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": "daten"}]
+        usage = main._METRICS["llmTokens"]["board_move"]
+        assert (usage["calls"], usage["input"], usage["cached"]) == (1, 1240, 1200)
+
+    def test_openai_puts_stable_prefix_first(self, monkeypatch):
+        seen = []
+
+        class _Completions:
+            @staticmethod
+            async def create(**kwargs):
+                seen.append(kwargs)
+                R = await _FakeOpenAI._C._Completions.create()
+                R.usage = type("U", (), {"prompt_tokens": 1500, "prompt_tokens_details":
+                                         type("D", (), {"cached_tokens": 1280})()})()
+                return R
+        monkeypatch.setattr(main, "client", type("C", (), {"chat": type("X", (), {"completions": _Completions()})()})())
+        monkeypatch.setattr(main, "LLM_PROVIDER", "openai")
+
+        async def run():
+            await main.oa_text("Zug A", endpoint="board_move", prefix="aufgabe", tone="coach")
+            await main.oa_text("Zug B", endpoint="board_move", prefix="aufgabe", tone="coach")
+        asyncio.run(run())
+        a, b = seen
+        assert a["messages"][0] == b["messages"][0]  # System: Stimme + Ton
+        assert main._TONE_DIRECTIVES["coach"] in a["messages"][0]["content"]
+        assert a["messages"][1]["content"] == "aufgabe\n\nZug A"
+        assert a["extra_body"]["prompt_cache_key"] == b["extra_body"]["prompt_cache_key"]
+        assert main._METRICS["llmTokens"]["board_move"]["cached"] == 2560
+        from fastapi.testclient import TestClient
+        tokens = TestClient(main.app).get("/metrics").json()["llmTokens"]["board_move"]
+        assert tokens["calls"] == 2 and tokens["cachedShare"] == round(2560 / 3000, 3)
+
+
+class TestLLMHedge:
+    @pytest.fixture(autouse=True)
+    def _providers(self, monkeypatch):
+        self.started, self.cancelled = [], []
+        test = self
+
+        def slow(name, text, delay):
+            async def create(**kwargs):
+                test.started.append(name)
+                try:
+                    await asyncio.sleep(delay[0])
+                except asyncio.CancelledError:
+                    test.cancelled.append(name)
+                    raise
+                if name == "openai":
+                    return await _FakeOpenAI._C._Completions.create()
+                return await _FakeAnthropic._Messages.create()
+            return create
+
+        self.openai_delay, self.anthropic_delay = [0.5], [0.01]
+        openai = type("C", (), {"chat": type("X", (), {"completions": type("P", (), {
+            "create": staticmethod(slow("openai", "openai-antwort", self.openai_delay))})()})()})()
+        anthropic = type("A", (), {"messages": type("M", (), {
+            "create": staticmethod(slow("anthropic", "anthropic-antwort", self.anthropic_delay))})()})()
+        monkeypatch.setattr(main, "client", openai)
+        monkeypatch.setattr(main, "_anthropic_client", anthropic)
+        monkeypatch.setattr(main, "LLM_PROVIDER", "openai")
+        monkeypatch.setattr(main, "LLM_HEDGE", True)
+        monkeypatch.setattr(main, "LLM_HEDGE_MIN_SAMPLES", 10)
+        monkeypatch.setattr(main, "_LLM_LATENCY", {"openai:reading": main.deque([0.05] * 10, maxlen=200)})
+        monkeypatch.setattr(main, "_LLM_HEDGE_CREDIT", {})
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        assert asyncio.run(main.llm_text("sys", "user", endpoint="reading")) == "anthropic-antwort"
+        assert self.started == ["openai", "anthropic"] and self.cancelled == ["openai"]
+        assert main._METRICS["llmHedge"]["reading"] == {"fired": 1, "backupWon": 1}
+        # die Wartezeit des Verlierers zählt als untere Schranke mit
+        assert len(main._LLM_LATENCY["openai:reading"]) == 11
+        # gecacht unter dem Schlüssel des Providers, der geantwortet hat
+        key = lambda p: main._llm_cache_key(p, "sys", "", "user", main._llm_params(p, 0.8, None))
+        assert main._LLM_CACHE.get(key("anthropic")) == "anthropic-antwort"
+        assert main._LLM_CACHE.get(key("openai")) is None
+
+    def test_fast_primary_never_hedges(self):
+        self.openai_delay[0] = 0.0
+        assert asyncio.run(main.llm_text("sys", "user", endpoint="reading")) == "openai-antwort"
+        assert self.started == ["openai"] and "llmHedge" not in main._METRICS
+
+    def test_no_hedge_without_samples_override_or_flag(self, monkeypatch):
+        self.openai_delay[0] = 0.1
+        asyncio.run(main.llm_text("sys", "a", endpoint="board_move"))  # keine Latenzdaten
+        asyncio.run(main.llm_text("sys", "b", endpoint="reading", provider="openai"))  # /compare
+        monkeypatch.setattr(main, "LLM_HEDGE", False)
+        asyncio.run(main.llm_text("sys", "c", endpoint="reading"))
+        assert self.started == ["openai"] * 3
+
+    def test_budget_caps_extra_calls(self, monkeypatch):
+        monkeypatch.setenv("LLM_HEDGE_BUDGET_READING", "0")
+        main._LLM_LATENCY["openai:reading"].extend([0.05] * 90)  # p90 bleibt bei 50 ms
+        self.openai_delay[0] = 0.1
+
+        async def run():
+            return [await main.llm_text("sys", f"u{i}", endpoint="reading") for i in range(4)]
+        # Startguthaben reicht für genau einen Hedge, danach nur noch der Primäre
+        assert asyncio.run(run()) == ["anthropic-antwort"] + ["openai-antwort"] * 3
+        assert self.started.count("anthropic") == 1
+        assert main._METRICS["llmHedge"]["reading"]["overBudget"] == 3
+
+    def test_reading_stages_have_own_latency_but_share_the_budget(self, monkeypatch):
+        monkeypatch.setenv("LLM_HEDGE_BUDGET_READING", "0.3")
+        monkeypatch.setenv("LLM_HEDGE_BUDGET_READING_DEEP", "0")
+        assert main._hedge_budget("reading_outline") == 0.3
+        assert main._hedge_budget("reading_deep") == 0.0
+        self.openai_delay[0] = 0.1
+        # Nur "reading" hat Latenzdaten — die Langtext-Stufe hedgt nicht auf deren p90.
+        asyncio.run(main.llm_text("sys", "user", endpoint="reading_longform"))
+        assert self.started == ["openai"]
+        assert len(main._LLM_LATENCY["openai:reading_longform"]) == 1
+
+    def test_failed_backup_falls_back_to_primary(self, monkeypatch):
+        async def broken(**kwargs):
+            raise RuntimeError("529 overloaded")
+        monkeypatch.setattr(main._anthropic_client.messages, "create", broken)
+        self.openai_delay[0] = 0.1
+        assert asyncio.run(main.llm_text("sys", "user", endpoint="reading")) == "openai-antwort"
+
+
+class TestCircuitBreaker:
+    def test_opens_on_errors_and_recovers_through_one_probe(self, monkeypatch):
+        monkeypatch.setattr(main, "LLM_BREAKER_COOLDOWN", 0.05)
+        b = main._CircuitBreaker("openai")
+        for _ in range(5):
+            b.record(True, 1.0)
+        for _ in range(4):
+            b.record(False, 1.0)
+        assert b.state == "closed"  # 4/9 — und unter der Mindestzahl
+        b.record(False, 1.0)
+        assert b.state == "open" and not b.allow()
+        main.time.sleep(0.06)
+        probe = b.allow()
+        assert probe is not None and b.state == "half_open"
+        assert b.allow() is None  # nur ein Probe-Call gleichzeitig
+        b.record(False, 1.0, probe)
+        assert b.state == "open"
+        main.time.sleep(0.06)
+        probe = b.allow()
+        b.record(True, 1.0, probe)
+        assert b.state == "closed" and b.snapshot()["calls"] == 0
+
+    def test_stale_call_does_not_consume_the_probe(self, monkeypatch):
+        monkeypatch.setattr(main, "LLM_BREAKER_COOLDOWN", 0.0)
+        b = main._CircuitBreaker("openai")
+        stale = b.allow()          # startet, bevor der Breaker auslöst
+        for _ in range(10):
+            b.record(False, 1.0)
+        probe = b.allow()
+        assert b.state == "half_open" and probe is not None
+        b.record(True, 1.0, stale)  # Nachzügler schließt nicht ...
+        assert b.state == "half_open"
+        assert b.allow() is None    # ... und gibt keinen zweiten Probe frei
+        b.record(True, 1.0, probe)
+        assert b.state == "closed"
+
+    def test_slow_calls_trip_and_cancelled_probes_do_not_stick(self, monkeypatch):
+        monkeypatch.setattr(main, "LLM_BREAKER_COOLDOWN", 0.0)
+        b = main._CircuitBreaker("anthropic")
+        for _ in range(10):
+            b.record(True, main.LLM_BREAKER_SLOW_SECONDS + 1)
+        assert b.state == "open"
+        probe = b.allow()
+        b.record(None, ticket=probe)  # Probe abgebrochen → nächster darf proben
+        assert b.allow() is not None
+
+    def test_open_breaker_fails_fast_and_endpoints_fall_back(self, monkeypatch):
+        from fastapi.testclient import TestClient
+        calls = []
+
+        async def never(**kwargs):
+            calls.append(1)
+            raise AssertionError("darf nicht aufgerufen werden")
+        monkeypatch.setattr(main, "client", type("C", (), {"chat": type("X", (), {
+            "completions": type("P", (), {"create": staticmethod(never)})()})()})())
+        monkeypatch.setattr(main, "LLM_PROVIDER", "openai")
+        breaker = main._llm_breaker("openai")
+        breaker._trip()
+        with pytest.raises(main._BreakerOpen):
+            asyncio.run(main.oa_text("prompt"))
+        assert main._METRICS["llmBreaker"]["openai"] == {"rejected": 1}
+        tc = TestClient(main.app)
+        r = tc.post("/resonanz", json={"birthDate": "27.07.1966", "partnerDate": "03.01.1990"})
+        assert r.status_code == 200 and "Lebenszahl" in r.json()["text"]  # deterministischer Fallback
+        assert tc.get("/health").json()["breakers"]["openai"]["state"] == "open"
+        assert calls == []
+
+
+class TestLLMDeadline:
+    def test_remaining_time_reaches_the_sdk_and_caps_the_call(self, monkeypatch):
+        seen = {}
+
+        async def slow(**kwargs):
+            seen.update(kwargs)
+            await asyncio.sleep(1)
+        monkeypatch.setattr(main, "client", type("C", (), {"chat": type("X", (), {
+            "completions": type("P", (), {"create": staticmethod(slow)})()})()})())
+        monkeypatch.setattr(main, "LLM_PROVIDER", "openai")
+
+        @main._with_llm_deadline(lambda: 0.1)
+        async def endpoint():
+            t0 = main.time.monotonic()
+            with pytest.raises(asyncio.TimeoutError):
+                await main.oa_text("prompt")
+            return main.time.monotonic() - t0
+        assert asyncio.run(endpoint()) < 0.5
+        assert 0 < seen["timeout"] <= 0.1
+        assert main._LLM_DEADLINE.get() is None  # nach dem Request wieder frei
+
+    def test_expired_deadline_skips_the_call(self, monkeypatch):
+        @main._with_llm_deadline(lambda: 0.0)
+        async def endpoint():
+            await main.oa_text("prompt")
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(endpoint())
+        assert main._llm_breaker("openai").snapshot()["calls"] == 0
+
+
+class _RateLimited(Exception):
+    """Wie openai.RateLimitError: status_code plus Antwort mit Headern."""
+    status_code = 429
+
+    def __init__(self, retry_ms="10"):
+        super().__init__("429")
+        self.response = type("R", (), {"headers": {"retry-after-ms": retry_ms}})()
+
+
+def _openai_with(create):
+    return type("C", (), {"chat": type("X", (), {
+        "completions": type("P", (), {"create": staticmethod(create)})()})()})()
+
+
+class TestKeyPool:
+    def test_reset_formats_of_both_providers(self):
+        assert main._reset_seconds("6m0s") == 360
+        assert main._reset_seconds("20ms") == pytest.approx(0.02)
+        assert main._reset_seconds("1h2m3.5s") == pytest.approx(3723.5)
+        assert main._reset_seconds("1.5") == 1.5
+        later = (dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=30)).isoformat().replace("+00:00", "Z")
+        assert 25 < main._reset_seconds(later) <= 30
+        assert main._reset_seconds("bald") is None and main._reset_seconds(None) is None
+
+    def test_header_budgets_steer_calls_to_the_key_with_headroom(self):
+        a = main._KeyLane("openai#0", 4, lambda: None)
+        b = main._KeyLane("openai#1", 4, lambda: None)
+        pool = main._KeyPool("openai", [a, b])
+        a.observe(200, {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "2s"})
+        b.observe(200, {"anthropic-ratelimit-requests-remaining": "50",
+                        "anthropic-ratelimit-tokens-remaining": "100",
+                        "anthropic-ratelimit-tokens-reset": "30s"})
+        assert pool._pick(10) is b
+        assert pool._pick(500) is None  # Token-Budget reicht für keinen Key
+        a.requests_reset = 0.0  # Reset erreicht → Budget gilt als erneuert
+        assert pool._pick(10) is a
+
+    def test_aimd_halves_on_429_and_climbs_back(self):
+        lane = main._KeyLane("openai#0", 8, lambda: None)
+        lane.observe(429, {"retry-after": "1"})
+        lane.throttle(1.0)  # dieselbe Welle: nur einmal halbieren
+        assert lane.limit == 4
+        for _ in range(4):
+            lane.succeeded()
+        assert 4.9 < lane.limit < 5  # ≈ +1 je Runde von `limit` Calls
+        for _ in range(30):
+            lane.succeeded()
+        assert lane.limit == 8  # nie über den Deckel
+        lane.blocked_until = 0.0
+        lane.observe(429, {"retry-after-ms": "5000"})
+        assert lane.limit == 4 and not lane.ready(main.time.monotonic(), 1)
+
+    def test_429_moves_the_call_to_another_key(self, monkeypatch):
+        async def limited(**kwargs):
+            raise _RateLimited()
+        monkeypatch.setattr(main, "client", _openai_with(limited))
+        monkeypatch.setattr(main, "LLM_PROVIDER", "openai")
+        spare = main._KeyLane("openai#1", 4, lambda: _FakeOpenAI())
+        pool = main._llm_pool("openai")
+        pool.lanes.append(spare)
+        assert asyncio.run(main.oa_text("prompt")) == "openai-antwort"
+        assert main._METRICS["llmPool"]["openai"]["throttled"] == 1
+        assert pool.lanes[0].limit < pool.lanes[0].ceiling and spare.in_flight == 0
+        assert main._llm_breaker("openai").snapshot()["errorRate"] == 0.0
+
+    def test_callers_queue_for_a_free_lane_instead_of_failing(self, monkeypatch):
+        state = {"active": 0, "peak": 0}
+
+        async def slow(**kwargs):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.02)
+            state["active"] -= 1
+            return await _FakeOpenAI.chat.completions.create()
+        monkeypatch.setattr(main, "client", _openai_with(slow))
+        monkeypatch.setenv("LLM_MAX_CONCURRENCY_OPENAI", "1")
+
+        async def burst():
+            return await asyncio.gather(*(main.llm_text("s", f"u{i}", provider="openai") for i in range(3)))
+        assert asyncio.run(burst()) == ["openai-antwort"] * 3
+        assert state["peak"] == 1
+        assert main._METRICS["llmPool"]["openai"]["queued"] == 2
+
+        main._llm_pool("openai").lanes[0].throttle(60)
+        monkeypatch.setattr(main, "LLM_QUEUE_SECONDS", 0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(main.llm_text("s", "u9", provider="openai"))
+        assert main._METRICS["llmPool"]["openai"]["queueTimeouts"] == 1
+
+
+def _reply(content):
+    msg = type("Msg", (), {"content": content})()
+    return type("R", (), {"choices": [type("Choice", (), {"message": msg})()]})()
+
+
+class TestMicroBatch:
+    @staticmethod
+    def _client(calls, drop=()):
+        async def create(**kwargs):
+            content = kwargs["messages"][-1]["content"]
+            calls.append(content)
+            if not content.startswith(main._MICROBATCH_TASK):
+                return _reply("einzeln")
+            items = [block.split("\n", 1) for block in content.split("\n\n[")[1:]]
+            answer = {n.strip("[]"): f"zu {text}" for n, text in items if n.strip("[]") not in drop}
+            return _reply(json.dumps(answer))
+        return _openai_with(create)
+
+    def _burst(self, n):
+        async def burst():
+            return await asyncio.gather(*(main.oa_text(f"zug {i}", endpoint="board_move",
+                                                       prefix=main._BOARD_MOVE_TASK) for i in range(n)))
+        return asyncio.run(burst())
+
+    def test_prompts_in_one_window_share_a_call(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(main, "client", self._client(calls))
+        monkeypatch.setattr(main, "LLM_PROVIDER", "openai")
+        monkeypatch.setattr(main, "LLM_MICROBATCH_MS", 20)
+        assert self._burst(3) == ["zu zug 0", "zu zug 1", "zu zug 2"]
+        assert len(calls) == 1
+        assert main._METRICS["llmBatch"]["openai"] == {"batches": 1, "items": 3}
+        # Jede Antwort liegt einzeln im LLM-Cache.
+        assert self._burst(3) == ["zu zug 0", "zu zug 1", "zu zug 2"] and len(calls) == 1
+
+    def test_missing_answers_fall_back_to_single_calls(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(main, "client", self._client(calls, drop={"2"}))
+        monkeypatch.setattr(main, "LLM_PROVIDER", "openai")
+        monkeypatch.setattr(main, "LLM_MICROBATCH_MS", 20)
+        monkeypatch.setattr(main, "LLM_MICROBATCH_MAX", 2)
+        assert self._burst(3) == ["zu zug 0", "einzeln", "einzeln"]
+        assert len(calls) == 3  # Batch aus 2 (voll), Nachzügler für Nr. 2, Einzelner im zweiten Fenster
+        assert main._METRICS["llmBatch"]["openai"]["fallbacks"] == 1
+
+
+    def test_a_batch_takes_one_admission_slot(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(main, "client", self._client(calls))
+        monkeypatch.setattr(main, "LLM_PROVIDER", "openai")
+        monkeypatch.setattr(main, "LLM_MICROBATCH_MS", 20)
+        monkeypatch.setattr(main, "LLM_ADMIT_MAX_INFLIGHT", 1)
+        monkeypatch.setattr(main, "LLM_ADMIT_MAX_WAIT", 0.01)
+        # Drei wartende Prompts, ein Platz: nur der echte Call braucht ihn.
+        assert self._burst(3) == ["zu zug 0", "zu zug 1", "zu zug 2"]
+        assert len(calls) == 1
+        assert main._METRICS["llmAdmission"] == {"batch": {"admitted": 1}}
+
+class TestAdmission:
+    def test_free_slots_go_round_robin_across_clients(self, monkeypatch):
+        monkeypatch.setattr(main, "LLM_ADMIT_MAX_INFLIGHT", 1)
+        order = []
+
+        async def scenario():
+            adm = main._Admission()
+            await adm.acquire("holder", "reading")
+
+            async def one(client, n):
+                await adm.acquire(client, "reading")
+                order.append(f"{client}{n}")
+                adm.release()
+            waiters = [asyncio.ensure_future(one("a", i)) for i in range(3)]
+            await asyncio.sleep(0)
+            waiters.append(asyncio.ensure_future(one("b", 0)))
+            await asyncio.sleep(0)
+            assert adm.snapshot()["waiting"] == 4 and adm.snapshot()["clients"] == 2
+            adm.release()
+            await asyncio.gather(*waiters)
+            return adm
+        adm = asyncio.run(scenario())
+        assert order == ["a0", "b0", "a1", "a2"]  # b muss nicht hinter allen a warten
+        assert adm.in_flight == 0 and adm.waiting == 0
+
+    def test_sheds_when_queue_is_full_slow_or_times_out(self, monkeypatch):
+        monkeypatch.setattr(main, "LLM_ADMIT_MAX_INFLIGHT", 1)
+        monkeypatch.setattr(main, "LLM_ADMIT_MAX_QUEUE", 1)
+        monkeypatch.setattr(main, "LLM_ADMIT_MAX_WAIT", 0.05)
+
+        async def scenario():
+            adm = main._Admission()
+            await adm.acquire("a", "board_move")
+            waiter = asyncio.ensure_future(adm.acquire("b", "board_move"))
+            await asyncio.sleep(0)
+            with pytest.raises(main._Overloaded):
+                await adm.acquire("c", "board_move")  # Schlange voll
+            with pytest.raises(main._Overloaded):
+                await waiter  # zu lange gewartet
+            adm.wait_avg = main.LLM_ADMIT_TARGET_WAIT + 1
+            with pytest.raises(main._Overloaded):
+                await adm.acquire("d", "board_move")  # Schlange zuletzt zu langsam
+            adm.release()
+            await adm.acquire("e", "board_move")  # frei: direkt rein, Mittelwert sinkt
+            assert adm.wait_avg < main.LLM_ADMIT_TARGET_WAIT + 1
+        asyncio.run(scenario())
+        assert main._METRICS["llmAdmission"]["board_move"] == {
+            "admitted": 2, "queued": 1, "shedQueueFull": 1, "shedTimeout": 1, "shedSlow": 1}
+
+    def test_shed_calls_degrade_the_response(self, monkeypatch):
+        from fastapi.testclient import TestClient
+
+        async def overloaded(self, client, endpoint):
+            raise main._Overloaded("LLM overloaded (test)")
+        monkeypatch.setattr(main._Admission, "acquire", overloaded)
+        tc = TestClient(main.app)
+        r = tc.post("/resonanz", json={"birthDate": "27.07.1966", "partnerDate": "03.01.1990"})
+        assert r.status_code == 200 and "Lebenszahl" in r.json()["text"]
+        assert r.json()["meta"] == {"degraded": True}
+        assert "meta" not in tc.get("/board/today").json()
+        assert "llmAdmission" in tc.get("/metrics").json()
@@ -1,6 +1,6 @@
 """Integration tests for POST /reading.
 
-The OpenAI client is monkey-patched so the tests never hit the network.
+The (async) OpenAI client is monkey-patched so the tests never hit the network.
 """
 import asyncio
 import json
@@ -24,7 +24,7 @@ class _MockCompletions:
     def __init__(self, content: str):
         self._content = content
 
-    def create(self, **kwargs):
+    async def create(self, **kwargs):
         return _MockResp(self._content)
 
 
@@ -105,7 +105,7 @@ def test_mixer_weights_propagate_to_prompt(mock_openai, monkeypatch):
     seen = {"messages": None, "prompt": None}
 
     class _Capture:
-        def create(self, **kwargs):
+        async def create(self, **kwargs):
             # Classic reading uses oa_text() which passes `prompt=...`.
             seen["prompt"] = kwargs.get("prompt") or (kwargs.get("messages") or [{}])[-1].get("content", "")
             seen["messages"] = kwargs.get("messages")
@@ -194,7 +194,7 @@ def test_second_identical_request_is_served_from_cache(mock_openai):
     call_count = {"n": 0}
 
     class _CountingCompletions:
-        def create(self, **kwargs):
+        async def create(self, **kwargs):
             call_count["n"] += 1
             return _MockResp(json.dumps({"fokus": "f", "beruf": "b", "liebe": "l", "energie": "e"}))
 
@@ -217,6 +217,39 @@ def test_second_identical_request_is_served_from_cache(mock_openai):
     assert r1["sections"][0]["text"] == r2["sections"][0]["text"]
 
 
+def test_spelling_variants_share_one_cached_reading(mock_openai):
+    """Datum mit/ohne führende Null, Ort mit Landeszusatz und ein minimal
+    verschobener Mixer treffen denselben Eintrag; das Echo bleibt das des
+    jeweiligen Aufrufers."""
+    main._READING_CACHE.clear()
+    main._METRICS.pop("readingCache", None)
+    mock_openai(json.dumps({"fokus": "f", "beruf": "b", "liebe": "l", "energie": "e"}))
+    first = main.ReadingRequest(birthDate="1.2.1980", birthPlace="Berlin", birthTime="7:05",
+                                mixer={"astro": 33.4, "num": 33.3, "tarot": 33.3})
+    second = main.ReadingRequest(birthDate="01.02.1980", birthPlace="Berlin, Deutschland", birthTime="07:05",
+                                 mixer={"astro": 33.6, "num": 33.2, "tarot": 33.2})
+    _run(main._reading_impl(first))
+    resp = _run(main._reading_impl(second)).model_dump()
+    assert resp["meta"].get("cacheHit") is True
+    assert resp["meta"]["birthDate"] == "01.02.1980"
+    assert resp["meta"]["birthPlace"] == "Berlin, Deutschland"
+    assert "Ort Berlin, Deutschland" in resp["chips"]
+    assert main.metrics()["readingCache"]["endpoints"]["reading"] == {"misses": 1, "hits": 1, "hitRate": 0.5}
+
+
+def test_reading_job_for_a_cached_variant_echoes_its_own_input(monkeypatch, mock_openai):
+    main._READING_CACHE.clear()
+    monkeypatch.setattr(main, "_JOB_STORE", main._JobStore(":memory:"))
+    mock_openai(json.dumps({"fokus": "f", "beruf": "b", "liebe": "l", "energie": "e"}))
+    _run(main._reading_impl(main.ReadingRequest(birthDate="1.2.1980", birthPlace="Berlin")))
+    variant = main.ReadingRequest(birthDate="01.02.1980", birthPlace="Berlin, Deutschland")
+    job = json.loads(_run(main._reading_job_submit(variant)).body)
+    assert job["status"] == "done"
+    assert job["result"]["meta"]["birthPlace"] == "Berlin, Deutschland"
+    assert job["result"]["meta"]["birthDate"] == "01.02.1980"
+    assert "Ort Berlin, Deutschland" in job["result"]["chips"]
+
+
 def test_classic_meta_includes_enriched_symbols(mock_openai):
     """The enriched meta.mini must carry the new symbols (I-Ging name,
     Tarot card, personal year etc.) so the UI can render rich chips."""
@@ -256,3 +289,302 @@ def test_fallback_on_exception(monkeypatch):
     # The endpoint must not crash
     assert "sections" in data
     assert isinstance(data["sections"], list)
+
+
+def test_llm_calls_run_concurrently_under_the_provider_cap(monkeypatch):
+    """llm_text must not block the event loop: parallel calls overlap, but
+    never more than LLM_MAX_CONCURRENCY per provider at once."""
+    state = {"active": 0, "peak": 0}
+
+    class _Slow:
+        async def create(self, **kwargs):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.05)
+            state["active"] -= 1
+            return _MockResp("ok")
+
+    monkeypatch.setattr(main, "client", type("C", (), {"chat": type("X", (), {"completions": _Slow()})()})())
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY_OPENAI", "3")
+    monkeypatch.setattr(main, "_LLM_POOLS", {})
+
+    async def _many():
+        return await asyncio.gather(*(main.llm_text("s", f"u{i}", provider="openai") for i in range(8)))
+
+    out = _run(_many())
+    assert out == ["ok"] * 8
+    assert state["peak"] == 3
+
+
+def test_identical_concurrent_requests_share_one_pipeline(monkeypatch):
+    """Concurrent duplicates of a reading that is not cached yet must wait
+    for the first request instead of each running the LLM pipeline."""
+    main._READING_CACHE.clear()
+    calls = {"n": 0}
+
+    class _Slow:
+        async def create(self, **kwargs):
+            calls["n"] += 1
+            await asyncio.sleep(0.05)
+            return _MockResp(json.dumps({"fokus": "f", "beruf": "b", "liebe": "l", "energie": "e"}))
+
+    monkeypatch.setattr(main, "client", type("C", (), {"chat": type("X", (), {"completions": _Slow()})()})())
+    req = main.ReadingRequest(birthDate="27.07.1966", birthPlace="Bad Saulgau",
+                              period="day", readingType="classic")
+
+    async def _burst():
+        return await asyncio.gather(*(main._reading_impl(req) for _ in range(5)))
+
+    out = [r.model_dump() for r in _run(_burst())]
+    assert calls["n"] == 2  # outline + longform, exactly once
+    assert sum(1 for r in out if r["meta"].get("coalesced")) == 4
+    assert len({r["sections"][0]["text"] for r in out}) == 1
+    assert main._READING_INFLIGHT == {}
+
+
+@pytest.mark.parametrize("pipeline,expected_calls,expected_peak", [
+    ("serial", 2, 1),
+    ("sections", 4, 4),
+    ("single", 1, 1),
+])
+def test_classic_pipeline_modes(monkeypatch, pipeline, expected_calls, expected_peak):
+    """CLASSIC_PIPELINE picks how the four classic sections are produced;
+    every mode must fill all four sections."""
+    main._READING_CACHE.clear()
+    monkeypatch.setattr(main, "CLASSIC_PIPELINE", pipeline)
+    state = {"calls": 0, "active": 0, "peak": 0}
+    full = {"fokus": "F", "beruf": "B", "liebe": "L", "energie": "E"}
+
+    class _Completions:
+        async def create(self, **kwargs):
+            state["calls"] += 1
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.02)
+            state["active"] -= 1
+            prompt = kwargs["messages"][-1]["content"]
+            for key in full:
+                if f'{{"{key}": "Absatz"}}' in prompt:  # sections mode
+                    return _MockResp(json.dumps({key: full[key]}))
+            return _MockResp(json.dumps(full))
+
+    monkeypatch.setattr(main, "client", type("C", (), {"chat": type("X", (), {"completions": _Completions()})()})())
+    req = main.ReadingRequest(birthDate="27.07.1966", birthPlace="Bad Saulgau",
+                              period="day", readingType="classic")
+    data = _run(main._reading_impl(req)).model_dump()
+    assert [s["text"] for s in data["sections"]] == ["F", "B", "L", "E"]
+    assert data["meta"]["pipeline"] == pipeline
+    assert state["calls"] == expected_calls
+    assert state["peak"] == expected_peak
+
+
+def _sse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_reading_stream_sends_meta_then_sections_then_done(monkeypatch):
+    """/reading/stream: deterministic meta first, one event per section,
+    then the full response — which also lands in the reading cache."""
+    from fastapi.testclient import TestClient
+
+    main._READING_CACHE.clear()
+    texts = {"fokus": "F", "beruf": "B", "liebe": "L", "energie": "E"}
+
+    class _Completions:
+        async def create(self, **kwargs):
+            prompt = kwargs["messages"][-1]["content"]
+            key = next(k for k in texts if f'{{"{k}": "Absatz"}}' in prompt)
+            return _MockResp(json.dumps({key: texts[key]}))
+
+    monkeypatch.setattr(main, "client", type("C", (), {"chat": type("X", (), {"completions": _Completions()})()})())
+    body = {"birthDate": "27.07.1966", "birthPlace": "Bad Saulgau", "period": "day", "readingType": "classic"}
+    with TestClient(main.app) as tc:
+        r = tc.post("/reading/stream", json=body)
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/event-stream")
+        events = _sse_events(r.text)
+        assert [e for e, _ in events] == ["meta"] + ["section"] * 4 + ["done"]
+        meta = events[0][1]["meta"]
+        assert meta["mini"]["sunSignApprox"] and meta["mini"]["tarot"]["name"]
+        by_index = {d["index"]: d["text"] for e, d in events if e == "section"}
+        assert by_index == {0: "F", 1: "B", 2: "L", 3: "E"}
+        assert [s["text"] for s in events[-1][1]["sections"]] == ["F", "B", "L", "E"]
+
+        again = _sse_events(tc.post("/reading/stream", json=body).text)
+        assert again[0][1]["meta"].get("cacheHit") is True
+        assert [s["text"] for s in again[-1][1]["sections"]] == ["F", "B", "L", "E"]
+
+
+def test_reading_compute_emits_meta_before_any_llm_call(monkeypatch):
+    main._READING_CACHE.clear()
+    events = []
+
+    class _Completions:
+        async def create(self, **kwargs):
+            assert events and events[0][0] == "meta"
+            return _MockResp(json.dumps({"titel": "t", "kern": "k"}))
+
+    monkeypatch.setattr(main, "client", type("C", (), {"chat": type("X", (), {"completions": _Completions()})()})())
+    req = main.ReadingRequest(birthDate="27.07.1966", birthPlace="Bad Saulgau",
+                              period="week", readingType="soul_purpose")
+    resp = _run(main._reading_compute(req, main._cache_key(req),
+                                      emit=lambda ev, data: events.append((ev, data))))
+    assert [e for e, _ in events] == ["meta"] + ["section"] * len(resp.sections)
+
+
+def test_classic_prompts_share_a_stable_prefix(monkeypatch):
+    """Zwei Readings mit verschiedenen Geburtsdaten unterscheiden sich erst
+    hinter System-Prompt und Aufgabe — nur so greift der Provider-Cache."""
+    main._READING_CACHE.clear()
+    monkeypatch.setattr(main, "CLASSIC_PIPELINE", "single")
+    seen = []
+
+    class _Completions:
+        async def create(self, **kwargs):
+            seen.append(kwargs["messages"])
+            return _MockResp(json.dumps({"fokus": "f", "beruf": "b", "liebe": "l", "energie": "e"}))
+
+    monkeypatch.setattr(main, "client", type("C", (), {"chat": type("X", (), {"completions": _Completions()})()})())
+    for birth in ("27.07.1966", "03.01.1990"):
+        _run(main._reading_impl(main.ReadingRequest(birthDate=birth, birthPlace="Bad Saulgau",
+                                                    period="day", readingType="classic")))
+    a, b = seen
+    assert a[0] == b[0]
+    assert a[1]["content"].startswith(main._CLASSIC_SINGLE_TASK)
+    assert b[1]["content"].startswith(main._CLASSIC_SINGLE_TASK)
+    assert a[1]["content"] != b[1]["content"]
+
+
+def test_reading_job_returns_meta_at_once_and_result_by_long_poll(monkeypatch):
+    from fastapi.testclient import TestClient
+    main._READING_CACHE.clear()
+    monkeypatch.setattr(main, "_JOB_STORE", main._JobStore(":memory:"))
+    calls = {"n": 0}
+
+    class _Slow:
+        async def create(self, **kwargs):
+            calls["n"] += 1
+            await asyncio.sleep(0.3)
+            return _MockResp(json.dumps({"fokus": "F", "beruf": "B", "liebe": "L", "energie": "E"}))
+
+    monkeypatch.setattr(main, "client", type("C", (), {"chat": type("X", (), {"completions": _Slow()})()})())
+    body = {"birthDate": "27.07.1966", "birthPlace": "Bad Saulgau", "period": "day", "readingType": "classic"}
+    with TestClient(main.app) as tc:
+        r = tc.post("/reading/jobs", json=body)
+        assert r.status_code == 202
+        job = r.json()
+        assert job["status"] == "running" and job["result"] is None
+        assert job["meta"]["mini"]["sunSignApprox"]  # deterministisch, vor dem LLM
+        assert r.headers["location"] == f"/reading/jobs/{job['jobId']}"
+        assert tc.post("/reading/jobs", json=body).json()["jobId"] == job["jobId"]  # Retry = derselbe Job
+
+        done = tc.get(f"/reading/jobs/{job['jobId']}", params={"wait": 5})
+        assert done.status_code == 200 and done.json()["status"] == "done"
+        assert [s["text"] for s in done.json()["result"]["sections"]] == ["F", "B", "L", "E"]
+        assert calls["n"] == 2  # outline + longform, nur einmal
+        assert tc.post("/reading", json=body).json()["meta"].get("cacheHit") is True
+        assert tc.get("/reading/jobs/" + "0" * 32).status_code == 404
+
+
+def test_job_store_hands_each_job_to_one_worker_and_recovers_stale_ones():
+    store = main._JobStore(":memory:")
+    store.submit("a" * 32, "{}")
+    assert store.claim("w1", 0.0) == ("a" * 32, "{}")
+    assert store.claim("w2", 0.0) is None
+    store.requeue("a" * 32, "w2")  # fremder Worker: ohne Wirkung
+    assert store.get("a" * 32)["status"] == "running"
+    assert store.claim("w2", main.time.time() + 1) == ("a" * 32, "{}")  # w1 gilt als verschollen
+    store.finish("a" * 32, "w1", "done", "{}")  # der Verschollene darf nicht mehr schreiben
+    assert store.get("a" * 32)["status"] == "running"
+    store.finish("a" * 32, "w2", "failed", json.dumps({"error": "kaputt"}))
+    assert store.get("a" * 32)["error"] == "kaputt"
+    store.submit("a" * 32, "{}")  # gescheitert → neuer Versuch
+    assert store.get("a" * 32)["status"] == "queued" and store.queued() == 1
+
+
+def test_reading_job_with_error_fallback_fails_and_can_be_retried(monkeypatch):
+    main._READING_CACHE.clear()
+    store = main._JobStore(":memory:")
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("ephemeris kaputt")
+
+    monkeypatch.setattr(main, "swe_compute", broken)
+    raw = main.ReadingRequest(birthDate="27.07.1966", birthPlace="Bad Saulgau").model_dump_json()
+    store.submit("b" * 32, raw)
+    _run(main._run_reading_job(store, "w1", *store.claim("w1", 0.0)))
+    job = store.get("b" * 32)
+    assert job["status"] == "failed" and "ephemeris kaputt" in job["error"]
+    store.submit("b" * 32, raw)
+    assert store.get("b" * 32)["status"] == "queued"
+
+    # Fertiger Job, dessen Ergebnis nicht mehr im Cache liegt: neu rechnen.
+    store.complete("c" * 32, raw, main.ReadingResponse(meta={}, sections=[], disclaimer="d"))
+    store.submit("c" * 32, raw)
+    assert store.get("c" * 32)["status"] == "queued"
+
+
+def test_overloaded_reading_is_degraded_and_not_cached(monkeypatch, mock_openai):
+    from fastapi.testclient import TestClient
+    main._READING_CACHE.clear()
+    mock_openai(json.dumps({"fokus": "F", "beruf": "B", "liebe": "L", "energie": "E"}))
+
+    async def overloaded(self, client, endpoint):
+        raise main._Overloaded("LLM overloaded (test)")
+    admit = main._Admission.acquire
+    monkeypatch.setattr(main._Admission, "acquire", overloaded)
+    body = {"birthDate": "27.07.1966", "birthPlace": "Bad Saulgau", "period": "day", "readingType": "classic"}
+    tc = TestClient(main.app)
+    data = tc.post("/reading", json=body).json()
+    assert data["meta"]["degraded"] is True and data["meta"]["mini"]["tarot"]["name"]
+    assert all(s["text"] for s in data["sections"])  # deterministische Kurztexte statt leer
+    assert data["meta"]["mini"]["tarot"]["name"] in data["sections"][0]["text"]
+
+    monkeypatch.setattr(main._Admission, "acquire", admit)
+    again = tc.post("/reading", json=body).json()
+    assert "degraded" not in again["meta"] and not again["meta"].get("cacheHit")
+    assert [s["text"] for s in again["sections"]] == ["F", "B", "L", "E"]
+
+
+def test_degraded_reading_job_is_not_kept_as_done(monkeypatch, mock_openai):
+    main._READING_CACHE.clear()
+    mock_openai(json.dumps({"fokus": "F", "beruf": "B", "liebe": "L", "energie": "E"}))
+
+    async def overloaded(self, client, endpoint):
+        raise main._Overloaded("LLM overloaded (test)")
+    monkeypatch.setattr(main._Admission, "acquire", overloaded)
+    store = main._JobStore(":memory:")
+    raw = main.ReadingRequest(birthDate="27.07.1966", birthPlace="Bad Saulgau").model_dump_json()
+    store.submit("d" * 32, raw)
+    _run(main._run_reading_job(store, "w1", *store.claim("w1", 0.0)))
+    job = store.get("d" * 32)
+    assert job["status"] == "failed" and job["error"] == "overloaded" and job["meta"]["degraded"] is True
+    store.submit("d" * 32, raw)
+    assert store.get("d" * 32)["status"] == "queued"
+
+def test_tone_or_mixer_change_reuses_the_cached_outline(monkeypatch):
+    main._READING_CACHE.clear()
+    monkeypatch.setattr(main, "CLASSIC_PIPELINE", "serial")
+    prompts = []
+
+    class _Completions:
+        async def create(self, **kwargs):
+            prompt = kwargs["messages"][-1]["content"]
+            prompts.append("outline" if prompt.startswith(main._CLASSIC_OUTLINE_TASK) else "longform")
+            if prompts[-1] == "outline":
+                return _MockResp(json.dumps({k: {"kern": "k", "punkte": ["p"]} for k in main._CLASSIC_SECTIONS}))
+            return _MockResp(json.dumps({"fokus": "F", "beruf": "B", "liebe": "L", "energie": "E"}))
+
+    monkeypatch.setattr(main, "client", type("C", (), {"chat": type("X", (), {"completions": _Completions()})()})())
+    base = dict(birthDate="27.07.1966", birthPlace="Bad Saulgau", period="week", readingType="classic",
+                mixer={"astro": 34, "num": 13, "tarot": 17, "iching": 14, "cn": 11, "tree": 11})
+    _run(main._reading_impl(main.ReadingRequest(**base, tone="mystic_deep")))
+    _run(main._reading_impl(main.ReadingRequest(**base, tone="skeptisch")))
+    nudged = dict(base, mixer={"astro": 39, "num": 15, "tarot": 15, "iching": 11, "cn": 10, "tree": 10})
+    _run(main._reading_impl(main.ReadingRequest(**nudged, tone="skeptisch")))
+    assert prompts == ["outline", "longform", "longform", "longform"]
+    assert main._METRICS["stageCache"]["outline"] == {"misses": 1, "hits": 2}